@@ -0,0 +1,6 @@
+"""
+Benchmarks of compiling and decoding specifications
+
+Run from the repository root, e.g. `python -m benchmarks.compile_time`.
+
+"""
@@ -0,0 +1,120 @@
+"""
+Compile time benchmark of the transformation chain
+
+    struct.expression()
+      -> realize_datatypes -> realize_conditions -> realize_offsets
+      -> parser_datatype -> arithmetic_simplify -> backend("python")
+
+Each pass is timed on the output of the previous pass, starting from
+the expression of the struct which is cached on its class, and the
+number of nodes of its output along with the peak memory allocated by
+the pass are recorded. Specifications are those within `models`
+followed by synthetic specifications (see `benchmarks.specs`) swept
+over union width, nesting depth and vector count.
+
+    python -m benchmarks.compile_time --union-width 1 2 4 8 --json out.json
+
+"""
+import argparse
+import gc
+import itertools
+import json
+import time
+import tracemalloc
+from typing import Dict, List
+
+from bitnest.core import Expression, walk_nodes
+from benchmarks.specs import models, synthetic_struct
+
+PASSES = [
+    ("realize_datatypes", lambda _: _.transform("realize_datatypes")),
+    ("realize_conditions", lambda _: _.transform("realize_conditions")),
+    ("realize_offsets", lambda _: _.transform("realize_offsets")),
+    ("parser_datatype", lambda _: _.transform("parser_datatype")),
+    ("arithmetic_simplify", lambda _: _.transform("arithmetic_simplify")),
+    ("python", lambda _: _.backend("python")),
+]
+
+
+def count_nodes(value) -> int:
+    """Number of nodes within an expression, shared nodes are counted
+    once per reference, or None for other values
+
+    """
+    if isinstance(value, Expression):
+        return sum(1 for _ in walk_nodes(value.expression))
+    return None
+
+
+def measure(struct, repeat: int = 3) -> List[Dict]:
+    """Time, output node count and peak memory of each pass"""
+    results = []
+    value = struct.expression()
+    for name, function in PASSES:
+        durations = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            output = function(value)
+            durations.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        function(value)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append(
+            {
+                "pass": name,
+                "seconds": min(durations),
+                "nodes": count_nodes(output),
+                "peak_bytes": peak,
+            }
+        )
+        value = output
+    return results
+
+
+def specifications(union_widths, nesting_depths, vector_counts):
+    yield from models()
+    for width, depth, vectors in itertools.product(
+        union_widths, nesting_depths, vector_counts
+    ):
+        yield (
+            f"synthetic(union_width={width}, nesting_depth={depth}, "
+            f"vector_count={vectors})",
+            synthetic_struct(width, depth, vectors),
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--union-width", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--nesting-depth", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--vector-count", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, struct in specifications(
+        args.union_width, args.nesting_depth, args.vector_count
+    ):
+        print(name)
+        for row in measure(struct, repeat=args.repeat):
+            nodes = "-" if row["nodes"] is None else row["nodes"]
+            print(
+                f"  {row['pass']:<20} {row['seconds'] * 1e3:>10.3f} ms "
+                f"{nodes:>10} nodes {row['peak_bytes'] / 2 ** 10:>10.1f} KiB"
+            )
+            results.append({"spec": name, **row})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Random messages of any `Struct` built from its realized datatypes
+
+Field values are drawn from the constraints the conditions of each
+datatype place on its fields (see `field_constraints`) and messages
+are written with the generated encoders. Each message is checked
+with the compiled parser and extractors and drawn again unless it
+decodes as the datatype it was generated for and encodes back to the
+same bytes.
+
+"""
+import random
+from typing import List, Sequence, Tuple
+
+from bitnest.analysis.field_constraints import FieldConstraint, field_domain
+from bitnest.backend.python import (
+    _realize,
+    compile_encoders,
+    compile_extractors,
+    compile_parser,
+)
+from bitnest.core import Expression, DATATYPE, FIELD, INTEGER, STRUCT, VECTOR
+
+DEFAULT_MAX_VECTOR_LENGTH = 8
+
+
+def _sample(constraint: FieldConstraint, rng: random.Random) -> int:
+    if constraint.values is not None:
+        return rng.choice(sorted(constraint.allowed_values()))
+    while True:
+        value = rng.randint(constraint.lower, constraint.upper)
+        if constraint.contains(value):
+            return value
+
+
+def random_record(
+    datatype: Expression,
+    constraints,
+    rng: random.Random,
+    max_vector_length: int = DEFAULT_MAX_VECTOR_LENGTH,
+):
+    """Record of raw field values of a realized datatype, see
+    `encoder_record`, drawn from the constraints of each field
+
+    Vectors whose length is a field reference are given a number of
+    elements allowed for that field, at most `max_vector_length` when
+    possible, shared by all vectors with the same length field.
+
+    """
+    limit = FieldConstraint(0, max_vector_length)
+    # length field id -> number of elements
+    counts = {}
+    fields = {_.expression[5]: _ for _ in Expression(datatype).find_symbol(FIELD)}
+
+    def generate(node):
+        symbol = node[0]
+        if symbol == FIELD:
+            if node[5] in constraints:
+                return _sample(constraints[node[5]], rng)
+            return rng.getrandbits(Expression(node[4]).value)
+        elif symbol == STRUCT:
+            return tuple(generate(_) for _ in node[2][1:])
+        elif symbol == VECTOR:
+            length = Expression(node[2])
+            if length.symbol == INTEGER:
+                count = length.value
+            elif length.expression[2] in counts:
+                count = counts[length.expression[2]]
+            else:
+                field_id = length.expression[2]
+                constraint = constraints.get(field_id) or field_domain(fields[field_id])
+                if constraint.intersect(limit).feasible():
+                    constraint = constraint.intersect(limit)
+                count = counts[field_id] = _sample(constraint, rng)
+
+            elements = []
+            for _ in range(count):
+                # lengths given by fields of an element belong to it
+                outer = set(counts)
+                elements.append(generate(node[1]))
+                for field_id in set(counts) - outer:
+                    del counts[field_id]
+            return elements
+        raise ValueError(f"cannot generate node with symbol={symbol}")
+
+    return generate(Expression(datatype).expression[1])
+
+
+def generate_corpus(
+    struct,
+    count: int,
+    weights: Sequence[float] = None,
+    seed: int = 0,
+    max_vector_length: int = DEFAULT_MAX_VECTOR_LENGTH,
+    max_attempts: int = 100,
+    max_message_bytes: int = 2 ** 16,
+) -> Tuple[List[bytes], List[int]]:
+    """`count` random messages of struct and the index of the datatype of
+    each within the datatype mask of `compile_parser`
+
+    Datatypes are chosen with the given weights, one per realized
+    datatype. By default all datatypes are equally likely except those
+    whose conditions are unsatisfiable or whose messages are matched
+    by a preceding datatype first. Raises `ValueError` when no message
+    of a chosen datatype is found within `max_attempts` draws.
+
+    """
+    rng = random.Random(seed)
+    datatypes = _realize(struct).find_symbol(DATATYPE)
+    constraints = [_.analysis("field_constraints") for _ in datatypes]
+    if weights is not None and len(weights) != len(datatypes):
+        raise ValueError(
+            f"expected {len(datatypes)} weights for struct={struct.name} "
+            f"not {len(weights)}"
+        )
+
+    parser = compile_parser(struct, bits_format="bytes")
+    encoders = compile_encoders(struct)
+    extractors = compile_extractors(struct, bits_format="bytes")
+    buffer = bytearray(max_message_bytes)
+
+    def message(i):
+        for _ in range(max_attempts):
+            record = random_record(
+                datatypes[i], constraints[i] or {}, rng, max_vector_length
+            )
+            data = bytes(buffer[: encoders[i](record, buffer, 0)])
+            mask = parser(data)
+            if mask & -mask != 1 << i:
+                continue
+            # values which do not fit their field, e.g. vector lengths
+            stop = encoders[i](extractors[i](data), buffer, 0)
+            if buffer[:stop] == data:
+                return data
+        raise ValueError(
+            f"no message decoding as datatype {i} of struct={struct.name} "
+            f"found within {max_attempts} attempts"
+        )
+
+    if weights is None:
+        weights = []
+        for i, constraint in enumerate(constraints):
+            weight = 0
+            if constraint is not None:
+                try:
+                    message(i)
+                    weight = 1
+                except ValueError:  # matched by preceding datatypes first
+                    pass
+            weights.append(weight)
+    if not any(weights):
+        raise ValueError(f"no datatype of struct={struct.name} to generate")
+
+    indices = rng.choices(range(len(datatypes)), weights=weights, k=count)
+    return [message(i) for i in indices], indices
@@ -0,0 +1,71 @@
+"""
+Specifications to benchmark
+
+`synthetic_struct` generates specifications whose number of datatypes
+and fields grows with its parameters so that scaling is measured
+across a range of sizes.
+
+"""
+import functools
+
+from bitnest.field import FieldReference, Struct, Union, UnsignedInteger, Vector
+
+
+def _struct(name, fields, conditions=()):
+    return type(
+        name.replace(" ", "_"),
+        (Struct,),
+        {"name": name, "fields": list(fields), "conditions": list(conditions)},
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_struct(
+    union_width: int = 2, nesting_depth: int = 1, vector_count: int = 1
+) -> Struct:
+    """Struct with `nesting_depth` levels of unions of `union_width`
+    structs, `union_width ** nesting_depth` datatypes
+
+    Each struct within a union is selected by a tag field and holds
+    `vector_count` vectors whose length is given by a count field.
+
+    """
+    tag_size = max(union_width - 1, 1).bit_length()
+    word = _struct("Word", [UnsignedInteger("value", 16)])
+
+    def level(depth, prefix):
+        alternatives = []
+        for i in range(union_width):
+            name = f"{prefix}{i}"
+            fields = [UnsignedInteger("tag", tag_size), UnsignedInteger("count", 4)]
+            fields.extend(
+                Vector(word, length=FieldReference("count"))
+                for _ in range(vector_count)
+            )
+            if depth > 1:
+                fields.append(level(depth - 1, f"{name}-"))
+            else:
+                fields.append(UnsignedInteger("checksum", 8))
+            alternatives.append(
+                _struct(f"Alternative {name}", fields, [FieldReference("tag") == i])
+            )
+        return Union(*alternatives)
+
+    name = f"Synthetic {union_width}x{nesting_depth}x{vector_count}"
+    return _struct(name, [UnsignedInteger("length", 16), level(nesting_depth, "")])
+
+
+def models():
+    """(name, struct) of the specifications within `models`"""
+    from models.chapter10 import MILSTD_1553_Data_Packet_Format_1
+    from models.simple import MILSTD_1553_Message
+    from models.test import StructA
+
+    return [
+        ("models.test.StructA", StructA),
+        ("models.simple.MILSTD_1553_Message", MILSTD_1553_Message),
+        (
+            "models.chapter10.MILSTD_1553_Data_Packet_Format_1",
+            MILSTD_1553_Data_Packet_Format_1,
+        ),
+    ]
@@ -0,0 +1,192 @@
+"""
+Decode throughput benchmark over random message corpora
+
+A corpus of random messages is generated for each specification (see
+`benchmarks.corpus`) and decoded by the compiled decoder
+
+- single: one call per message, latency of each call
+- loop: one call per message timed over batches of messages, latency
+  of each batch
+- batch: the numpy batch decoder of each datatype (see
+  `bitnest.backend.numpy`) over batches of the concatenated messages
+  of that datatype, latency of each batch, when numpy is installed and
+  all datatypes have a fixed layout
+- stream: the concatenated messages fed to a `PushParser` in chunks,
+  latency of each chunk
+
+reporting messages and megabytes per second along with latency
+percentiles.
+
+    python -m benchmarks.throughput --count 100000 --json out.json
+
+"""
+import argparse
+import collections
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+from bitnest.backend.python import compile_decoder, compile_sizers
+from bitnest.io.push import PushParser
+from benchmarks.corpus import generate_corpus
+from benchmarks.specs import models, synthetic_struct
+
+PERCENTILES = [50, 90, 99]
+
+
+def percentiles(durations: List[float]) -> Dict[str, float]:
+    durations = sorted(durations)
+    return {
+        f"p{_}": durations[min(len(durations) - 1, len(durations) * _ // 100)]
+        for _ in PERCENTILES
+    }
+
+
+def _result(mode, durations, messages, size, unit):
+    total = sum(durations)
+    return {
+        "mode": mode,
+        "messages_per_second": messages / total,
+        "megabytes_per_second": size / total / 1e6,
+        "latency_unit": unit,
+        **percentiles(durations),
+    }
+
+
+def _measure_batch(struct, corpus, datatypes, batch_size) -> Optional[List[float]]:
+    """Durations of the numpy batch decoders over the messages of each
+    datatype, None when they are not available
+
+    """
+    if datatypes is None:
+        return None
+    try:
+        from bitnest.backend.numpy import compile_batch_decoder
+    except ImportError:
+        return None
+
+    messages = collections.defaultdict(list)
+    for message, datatype in zip(corpus, datatypes):
+        messages[datatype].append(message)
+    try:
+        decoders = {_: compile_batch_decoder(struct, _) for _ in messages}
+    except ValueError:  # datatypes without a fixed layout
+        return None
+
+    perf_counter = time.perf_counter
+    durations = []
+    for datatype, _messages in messages.items():
+        decoder = decoders[datatype]
+        for i in range(0, len(_messages), batch_size):
+            buffer = b"".join(_messages[i : i + batch_size])
+            start = perf_counter()
+            decoder(buffer)
+            durations.append(perf_counter() - start)
+    return durations
+
+
+def measure(
+    struct,
+    corpus: List[bytes],
+    batch_size: int = 1000,
+    chunk_size: int = 4096,
+    datatypes: Optional[Sequence[int]] = None,
+) -> List[Dict]:
+    """Throughput and latency percentiles in seconds of each mode
+
+    datatypes are the indices of the datatype of each message returned
+    by `generate_corpus` and are required by the batch mode.
+
+    """
+    decoder = compile_decoder(struct, bits_format="bytes")
+    size = sum(len(_) for _ in corpus)
+    perf_counter = time.perf_counter
+    results = []
+
+    durations = []
+    for message in corpus:
+        start = perf_counter()
+        decoder(message)
+        durations.append(perf_counter() - start)
+    results.append(_result("single", durations, len(corpus), size, "message"))
+
+    durations = []
+    for i in range(0, len(corpus), batch_size):
+        batch = corpus[i : i + batch_size]
+        start = perf_counter()
+        [decoder(_) for _ in batch]
+        durations.append(perf_counter() - start)
+    results.append(_result("loop", durations, len(corpus), size, "batch"))
+
+    durations = _measure_batch(struct, corpus, datatypes, batch_size)
+    if durations is not None:
+        results.append(_result("batch", durations, len(corpus), size, "batch"))
+
+    try:
+        compile_sizers(struct, bits_format="bytes")
+    except ValueError:  # messages without a size known from fixed offsets
+        return results
+
+    stream = b"".join(corpus)
+    parser = PushParser(struct)
+    durations = []
+    count = 0
+    for i in range(0, len(stream), chunk_size):
+        chunk = stream[i : i + chunk_size]
+        start = perf_counter()
+        count = count + len(parser.feed(chunk))
+        durations.append(perf_counter() - start)
+    count = count + len(parser.close())
+    if count != len(corpus):
+        raise ValueError(f"stream decoded {count} of {len(corpus)} messages")
+    results.append(_result("stream", durations, len(corpus), size, "chunk"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--union-width", type=int, default=4)
+    parser.add_argument("--nesting-depth", type=int, default=2)
+    parser.add_argument("--vector-count", type=int, default=1)
+    parser.add_argument("--json", help="write results to path")
+    args = parser.parse_args(argv)
+
+    specifications = models() + [
+        (
+            f"synthetic(union_width={args.union_width}, "
+            f"nesting_depth={args.nesting_depth}, "
+            f"vector_count={args.vector_count})",
+            synthetic_struct(args.union_width, args.nesting_depth, args.vector_count),
+        )
+    ]
+
+    results = []
+    for name, struct in specifications:
+        corpus, datatypes = generate_corpus(struct, args.count, seed=args.seed)
+        print(
+            f"{name} {len(corpus)} messages {sum(map(len, corpus))} bytes "
+            f"{len(set(datatypes))} datatypes"
+        )
+        for row in measure(struct, corpus, args.batch_size, args.chunk_size, datatypes):
+            latencies = " ".join(
+                f"p{_}={row[f'p{_}'] * 1e6:.1f}us" for _ in PERCENTILES
+            )
+            print(
+                f"  {row['mode']:<8} {row['messages_per_second']:>12.0f} msg/s "
+                f"{row['megabytes_per_second']:>8.2f} MB/s "
+                f"per {row['latency_unit']} {latencies}"
+            )
+            results.append({"spec": name, **row})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Analysis of the values each field may take given the conditions
+within a datatype
+
+Conditions are reduced to per field constraints: a closed range,
+an optional set of allowed values, and a set of excluded
+values. Conditions that cannot be expressed this way are ignored
+which keeps the analysis conservative. A datatype is infeasible if
+the constraints on any field cannot be satisfied.
+
+"""
+import math
+from typing import Dict, Optional
+
+from bitnest.core import (
+    Expression,
+    ENUM,
+    EQ,
+    FIELD_REFERENCE,
+    FLOAT,
+    GE,
+    GT,
+    INTEGER,
+    LE,
+    LOGICAL_AND,
+    LOGICAL_OR,
+    LT,
+    NE,
+)
+
+
+class FieldConstraint:
+    __slots__ = ("lower", "upper", "values", "excluded")
+
+    def __init__(self, lower=None, upper=None, values=None, excluded=frozenset()):
+        self.lower = lower
+        self.upper = upper
+        self.values = values
+        self.excluded = excluded
+
+    def __repr__(self):
+        return f"<FieldConstraint lower={self.lower} upper={self.upper} values={self.values} excluded={set(self.excluded)}>"
+
+    def intersect(self, other: "FieldConstraint") -> "FieldConstraint":
+        def bound(a, b, select):
+            return b if a is None else a if b is None else select(a, b)
+
+        if self.values is None:
+            values = other.values
+        elif other.values is None:
+            values = self.values
+        else:
+            values = self.values & other.values
+
+        return FieldConstraint(
+            bound(self.lower, other.lower, max),
+            bound(self.upper, other.upper, min),
+            values,
+            self.excluded | other.excluded,
+        )
+
+    def union(self, other: "FieldConstraint") -> Optional["FieldConstraint"]:
+        """Only unions of value sets are representable"""
+        if self.values is None or other.values is None:
+            return None
+        return FieldConstraint(
+            values=frozenset(self.allowed_values()) | frozenset(other.allowed_values())
+        )
+
+    def contains(self, value) -> bool:
+        return (
+            (self.lower is None or value >= self.lower)
+            and (self.upper is None or value <= self.upper)
+            and (self.values is None or value in self.values)
+            and value not in self.excluded
+        )
+
+    def allowed_values(self):
+        return [_ for _ in self.values if self.contains(_)]
+
+    def feasible(self) -> bool:
+        if self.values is not None:
+            return bool(self.allowed_values())
+        elif self.lower is None or self.upper is None:
+            return True
+        excluded = len([_ for _ in self.excluded if self.lower <= _ <= self.upper])
+        return self.upper - self.lower + 1 > excluded
+
+
+def field_domain(field) -> FieldConstraint:
+    """All raw values representable by the bits of a field"""
+    size = Expression(Expression(field).size).value
+    return FieldConstraint(0, 2 ** size - 1)
+
+
+def _constant(node):
+    if isinstance(node, tuple) and node[0] in {INTEGER, FLOAT}:
+        return node[1]
+    elif isinstance(node, tuple) and node[0] == ENUM:
+        return node[1].value
+    return None
+
+
+def _field_id(node):
+    if isinstance(node, tuple) and node[0] == FIELD_REFERENCE:
+        return node[2]
+    return None
+
+
+# field values are integers so bounds are rounded to the nearest
+# integer within them
+COMPARISONS = {
+    EQ: lambda c: FieldConstraint(values=frozenset([c])),
+    NE: lambda c: FieldConstraint(excluded=frozenset([c])),
+    LT: lambda c: FieldConstraint(upper=math.ceil(c) - 1),
+    LE: lambda c: FieldConstraint(upper=math.floor(c)),
+    GT: lambda c: FieldConstraint(lower=math.floor(c) + 1),
+    GE: lambda c: FieldConstraint(lower=math.ceil(c)),
+}
+
+# (op constant field) is equivalent to (swapped[op] field constant)
+SWAPPED_COMPARISONS = {
+    EQ: EQ,
+    NE: NE,
+    LT: GT,
+    LE: GE,
+    GT: LT,
+    GE: LE,
+}
+
+
+def merge_constraints(left: Dict, right: Dict) -> Dict:
+    """Intersect two mappings of field id to constraint"""
+    if not right:
+        return left
+    merged = dict(left)
+    for id, constraint in right.items():
+        merged[id] = merged[id].intersect(constraint) if id in merged else constraint
+    return merged
+
+
+def is_feasible(constraints: Dict, domains: Dict = None) -> bool:
+    domains = domains or {}
+    for id, constraint in constraints.items():
+        if id in domains:
+            constraint = constraint.intersect(domains[id])
+        if not constraint.feasible():
+            return False
+    return True
+
+
+def condition_constraints(condition) -> Dict[int, FieldConstraint]:
+    """Reduce a condition with resolved field references to per field
+    constraints. Unsupported conditions produce no constraints.
+
+    """
+    condition = Expression(condition).expression
+    symbol = condition[0]
+
+    if symbol in COMPARISONS:
+        left, right = condition[1:]
+        if _field_id(left) is not None and _constant(right) is not None:
+            return {_field_id(left): COMPARISONS[symbol](_constant(right))}
+        elif _field_id(right) is not None and _constant(left) is not None:
+            symbol = SWAPPED_COMPARISONS[symbol]
+            return {_field_id(right): COMPARISONS[symbol](_constant(left))}
+    elif symbol == LOGICAL_AND:
+        constraints = {}
+        for arg in condition[1:]:
+            constraints = merge_constraints(constraints, condition_constraints(arg))
+        return constraints
+    elif symbol == LOGICAL_OR:
+        constraints = [condition_constraints(_) for _ in condition[1:]]
+        ids = {id for _ in constraints for id in _}
+        if len(ids) == 1 and all(constraints):
+            (id,) = ids
+            union = constraints[0][id]
+            for constraint in constraints[1:]:
+                if union is None:
+                    break
+                union = union.union(constraint[id])
+            if union is not None:
+                return {id: union}
+    return {}
+
+
+def field_constraints(datatype: Expression) -> Optional[Dict[int, FieldConstraint]]:
+    """Constraints on each field within a realized datatype with
+    resolved conditions. Returns None when the datatype is infeasible.
+
+    """
+    _datatype, fields, conditions, regions = Expression(datatype).analysis(
+        "inspect_datatypes"
+    )[0]
+
+    constraints = {}
+    for condition in conditions:
+        constraints = merge_constraints(constraints, condition_constraints(condition))
+
+    domains = {Expression(_).id: field_domain(_) for _ in fields}
+    if not is_feasible(constraints, domains):
+        return None
+    return {
+        id: constraint.intersect(domains[id]) if id in domains else constraint
+        for id, constraint in constraints.items()
+    }
@@ -1,6 +1,6 @@
 from typing import List
 
-from bitnest.core import Expression, Symbol
+from bitnest.core import Expression, is_stream, DATATYPE, FIELD, STRUCT, VECTOR
 
 
 def _inspect_datatype(datatype: Expression):
@@ -14,18 +14,18 @@ def _inspect_datatype(datatype: Expression):
         nonlocal depth
         nonlocal regions
 
-        if symbol == Symbol("field"):
+        if symbol == FIELD:
             symbol, args = yield (symbol, *args)
             fields.append((symbol, *args))
             yield (symbol, *args)
-        elif symbol == Symbol("vector"):
+        elif symbol == VECTOR:
             depth = depth + 1
             start = len(fields)
             symbol, args = yield (symbol, *args)
             depth = depth - 1
             regions[(depth, start, len(fields))] = (symbol, *args)
             yield (symbol, *args)
-        elif symbol == Symbol("struct"):
+        elif symbol == STRUCT:
             depth = depth + 1
             start = len(fields)
             symbol, args = yield (symbol, *args)
@@ -43,9 +43,12 @@ def _inspect_datatype(datatype: Expression):
 
 
 def inspect_datatypes(path: Expression) -> List:
+    if is_stream(path):
+        return (_inspect_datatype(Expression(_)) for _ in path)
+
     _path = Expression(path)
 
-    datatypes = _path.find_symbol(Symbol("datatype"))
+    datatypes = _path.find_symbol(DATATYPE)
     datatype_regions = []
 
     for datatype in datatypes:
@@ -0,0 +1,142 @@
+"""Analysis of the offsets of the fields and vectors of a datatype
+for random access
+
+`realize_offsets` gives offsets relative to the current element of
+each enclosing vector and the size of a vector as `length *
+element_size`, which for elements of varying size is that of one
+element. The plan instead names every position by the loop variable
+of a vector: within the elements of a vector it is the absolute
+offset of the current element and after the vector the absolute
+offset following it. Vectors whose elements have a fixed size are
+located from their start with a static stride, offsets following
+other vectors depend on their end which is found once per message by
+measuring the elements, see `bitnest.view`.
+
+"""
+import collections
+from typing import Optional
+
+from bitnest.core import (
+    Expression,
+    ADD,
+    DATATYPE,
+    FIELD,
+    INTEGER,
+    STRUCT,
+    TUPLE,
+    VECTOR,
+)
+from bitnest.pipeline import Rule, fused_replace
+from bitnest.transform.arithmetic_simplify import arithmetic_simplify_rule
+
+FieldPlan = collections.namedtuple("FieldPlan", ["scope", "offset"])
+FieldPlan.__doc__ = """Absolute offset of a field within the elements
+of the vectors named by scope, outermost first"""
+
+VectorPlan = collections.namedtuple(
+    "VectorPlan", ["scope", "start", "length", "stride", "end"]
+)
+VectorPlan.__doc__ = """Absolute start and number of elements of a
+vector within the elements of the vectors named by scope. stride is
+the size of an element in bits when fixed, otherwise end is the
+offset following the element at the loop variable."""
+
+OffsetPlan = collections.namedtuple("OffsetPlan", ["fields", "vectors"])
+OffsetPlan.__doc__ = """Plans of the fields of a datatype by field id
+and of its vectors by the name of their loop variable"""
+
+
+def fixed_size(node) -> Optional[int]:
+    """Size in bits of a node of a realized datatype or None when it
+    depends on the values of fields
+
+    """
+    symbol = node[0]
+    if symbol == FIELD:
+        return Expression(node[4]).value
+    elif symbol == STRUCT:
+        sizes = [fixed_size(_) for _ in node[2][1:]]
+        return None if None in sizes else sum(sizes)
+    elif symbol == VECTOR:
+        length = Expression(node[2])
+        element_size = fixed_size(node[1])
+        if length.symbol != INTEGER or element_size is None:
+            return None
+        return length.value * element_size
+    raise ValueError(f"cannot size node with symbol={symbol}")
+
+
+def _end(node):
+    """Offset following the last field or vector of a struct node"""
+    for child in reversed(node[2][1:]):
+        if child[0] == FIELD:
+            return (ADD, child[3], child[4])
+        elif child[0] == VECTOR:
+            return (ADD, child[4], child[5])
+        end = _end(child)
+        if end is not None:
+            return end
+    return None
+
+
+def offset_plan(datatype: Expression) -> OffsetPlan:
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"offset_plan expects a datatype not {_datatype.symbol}")
+
+    # id(loop variable or size) -> loop variable of vector, offsets from
+    # realize_offsets share the nodes start + loop variable and start +
+    # size of every vector
+    positions = {}
+    for node in _datatype.find_symbol(VECTOR):
+        vector = node.expression
+        positions[id(vector[3])] = vector[3]
+        if fixed_size(vector[1]) is None:
+            positions[id(vector[5])] = vector[3]
+
+    def handle_add(symbol, args):
+        # before children as sizes contain the sizes of nested vectors
+        position = positions.get(id(args[1]))
+        symbol, args = yield (symbol, *args) if position is None else position
+        yield (symbol, *args)
+
+    # field id or loop variable name -> (scope, ...) with indices of offsets
+    fields, vectors = {}, {}
+    offsets = []
+
+    def plan(node, scope):
+        for child in node[2][1:]:
+            if child[0] == FIELD:
+                fields[child[5]] = (scope, len(offsets))
+                offsets.append(child[3])
+            elif child[0] == STRUCT:
+                plan(child, scope)
+            elif child[0] == VECTOR:
+                name = Expression(child[3]).name
+                stride = fixed_size(child[1])
+                vectors[name] = (scope, len(offsets), child[2], stride)
+                offsets.append(child[4])
+                if stride is None:
+                    offsets.append(_end(child[1]) or child[3])
+                plan(child[1], (*scope, name))
+
+    plan(_datatype.expression[1], ())
+    rules = [Rule({ADD: handle_add}), arithmetic_simplify_rule()]
+    offsets = [Expression(_) for _ in fused_replace((TUPLE, *offsets), rules)[1:]]
+
+    return OffsetPlan(
+        {
+            field_id: FieldPlan(scope, offsets[index])
+            for field_id, (scope, index) in fields.items()
+        },
+        {
+            name: VectorPlan(
+                scope,
+                offsets[index],
+                Expression(length),
+                stride,
+                None if stride is not None else offsets[index + 1],
+            )
+            for name, (scope, index, length, stride) in vectors.items()
+        },
+    )
@@ -0,0 +1,85 @@
+"""
+Reading bit fields directly from bytes like buffers
+
+Buffers (bytes, bytearray, mmap, memoryview) are accessed through a
+memoryview so slicing never copies. Fields are read most significant
+bit first.
+
+"""
+
+
+def read(buffer: memoryview, offset: int, size: int) -> int:
+    """Unsigned integer of `size` bits starting at bit `offset`, bits
+    past the end of buffer read as zeros
+
+    """
+    stop = offset + size
+    start, end = offset // 8, (stop + 7) // 8
+    data = buffer[start:end]
+    value = int.from_bytes(data, "big") << (8 * (end - start - len(data)))
+    return (value >> (-stop % 8)) & ((1 << size) - 1)
+
+
+def view(buffer: memoryview, offset: int, size: int) -> memoryview:
+    """Bytes of a field with a size of whole bytes
+
+    Byte aligned fields are a slice of buffer. Unaligned fields are
+    shifted into new bytes.
+
+    """
+    start, remainder = divmod(offset, 8)
+    if not remainder:
+        return buffer[start : start + size // 8]
+    return memoryview(read(buffer, offset, size).to_bytes(size // 8, "big"))
+
+
+class DecodeError(ValueError):
+    """Input matching no datatype of a struct or ending before the
+    datatype it matches
+
+    """
+
+
+def check(length: int, stop: int):
+    """Raise `DecodeError` when an input of `length` bits ends before bit
+    `stop`
+
+    """
+    if length < stop:
+        raise DecodeError(f"input of {length} bits ends before bit {stop}")
+
+
+class BitReader:
+    """Bit addressed access to a bytes like buffer
+
+    Slicing a reader reads an unsigned integer so readers can be
+    passed to parsers compiled with bits_format "bits". As with
+    bits_format "bytes" bits past the end of the buffer read as zeros.
+
+    """
+
+    __slots__ = ("buffer",)
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer).cast("B")
+
+    def __len__(self):
+        return len(self.buffer) * 8
+
+    def __getitem__(self, index: slice) -> int:
+        # slices are not clamped to the buffer, see `read`
+        if index.step not in (None, 1):
+            raise ValueError("bit slices must be contiguous")
+        start = 0 if index.start is None else index.start
+        stop = len(self) if index.stop is None else index.stop
+        if start < 0 or stop < 0:
+            raise ValueError("bit slices must not be negative")
+        return read(self.buffer, start, max(stop - start, 0))
+
+    def read(self, offset: int, size: int) -> int:
+        return read(self.buffer, offset, size)
+
+    def view(self, offset: int, size: int) -> memoryview:
+        if size % 8:
+            raise ValueError(f"size={size} bits is not a whole number of bytes")
+        return view(self.buffer, offset, size)
@@ -0,0 +1,166 @@
+"""
+Batch decoding of datatypes with a fixed layout into numpy arrays
+
+A datatype has a fixed layout when it contains no vectors so that
+after `realize_offsets` and `arithmetic_simplify` every field offset
+is an integer. A buffer of N contiguous records is viewed as an
+(N, record bytes) array and each field is extracted for all records
+at once with shifts and masks.
+
+"""
+from typing import Callable, List
+
+import numpy as np
+
+from bitnest.backend.python import _realize, memoize
+from bitnest.core import Expression, DATATYPE, FIELD, INTEGER, STRUCT, VECTOR
+
+
+def _field_paths(datatype: Expression) -> List:
+    """(path, field) for each field in order of appearance where path
+    joins the names of enclosing structs below the root with "."
+
+    """
+    paths = []
+    struct = Expression(datatype).expression[1]
+    stack = [(struct, "")]
+    while stack:
+        node, prefix = stack.pop()
+        if node[0] == FIELD:
+            paths.append((prefix + node[2], node))
+        elif node[0] == STRUCT:
+            _prefix = prefix + node[1] + "." if node is not struct else ""
+            stack.extend(reversed([(_, _prefix) for _ in node[2][1:]]))
+        elif node[0] == VECTOR:
+            raise ValueError("datatype with vectors does not have a fixed layout")
+    return paths
+
+
+def _unsigned_dtype(size: int):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if size <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"fields of size={size} bits are larger than 64 bits")
+
+
+def _extract(array, offset: int, size: int):
+    """Unsigned values of `size` bits at bit `offset` of each row"""
+    start, stop = offset // 8, (offset + size + 7) // 8
+    shift = 7 - (offset + size + 7) % 8
+
+    if stop - start == 1:
+        value = array[:, start] >> np.uint8(shift)
+    else:
+        value = np.zeros(len(array), dtype=np.uint64)
+        for i in range(start, min(stop, start + 8)):
+            value = (value << np.uint64(8)) | array[:, i]
+        if stop - start > 8:
+            # 9 bytes span a 64 bit field which is not byte aligned
+            value = (value << np.uint64(8 - shift)) | (array[:, stop - 1] >> shift)
+        else:
+            value = value >> np.uint64(shift)
+
+    dtype = _unsigned_dtype(size)
+    mask = dtype(2 ** size - 1)
+    return value.astype(dtype, copy=False) & mask
+
+
+def _convert(value, field):
+    field_type, size = field[1], Expression(field[4]).value
+    if field_type == "boolean":
+        return value.astype(np.bool_)
+    elif field_type == "signed_integer":
+        dtype = np.dtype(_unsigned_dtype(size)).str.replace("u", "i")
+        # subtract 2 ** size when the sign bit is set, wrapping for
+        # fields filling the whole integer
+        sign = value.dtype.type(2 ** (size - 1))
+        return value.astype(dtype) - ((value & sign).astype(dtype) << 1)
+    # bits_enum values are kept as integers
+    return value
+
+
+def numpy(datatype: Expression, record_bytes: int = None) -> Callable:
+    """Batch decoder for a realized datatype with integer offsets
+
+    The decoder takes a bytes like buffer of contiguous records and
+    returns a structured array with one field per decoded field named
+    by its path, e.g. "Block Status Word.bus_id". Repeated paths are
+    numbered. Records start every `record_bytes` bytes which defaults
+    to the size of the datatype rounded up to whole bytes. Raises
+    `ValueError` for datatypes without a fixed layout.
+
+    """
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"numpy backend expects a datatype not {_datatype.symbol}")
+
+    paths = _field_paths(_datatype)
+    layout = []
+    record_size = 0
+    for path, field in paths:
+        offset, size = Expression(field[3]), Expression(field[4])
+        if offset.symbol != INTEGER or size.symbol != INTEGER:
+            raise ValueError(f"field={path} does not have a fixed offset and size")
+        layout.append((offset.value, size.value, field))
+        record_size = max(record_size, offset.value + size.value)
+
+    if record_bytes is None:
+        record_bytes = (record_size + 7) // 8
+    elif record_bytes * 8 < record_size:
+        raise ValueError(
+            f"record_bytes={record_bytes} is smaller than {record_size} bits"
+        )
+
+    columns = []
+    names = set()
+    for (path, field), (offset, size, _) in zip(paths, layout):
+        name, count = path, 0
+        while name in names:
+            count = count + 1
+            name = f"{path}_{count}"
+        names.add(name)
+        columns.append((name, offset, size, field))
+
+    def decoder(buffer, count: int = -1, offset: int = 0) -> np.ndarray:
+        array = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=offset)
+        if len(array) % record_bytes:
+            raise ValueError(
+                f"buffer of {len(array)} bytes is not a whole number of records"
+            )
+        array = array.reshape(-1, record_bytes)
+        values = [
+            _convert(_extract(array, offset, size), field)
+            for name, offset, size, field in columns
+        ]
+        result = np.empty(
+            len(array),
+            dtype=[(column[0], value.dtype) for column, value in zip(columns, values)],
+        )
+        for column, value in zip(columns, values):
+            result[column[0]] = value
+        return result
+
+    decoder.record_bytes = record_bytes
+    return decoder
+
+
+@memoize
+def compile_batch_decoder(
+    struct, datatype: int = None, record_bytes: int = None
+) -> Callable:
+    """Batch decoder for a realized datatype of a `Struct`, see `numpy`
+
+    datatype is the index of the datatype within the datatype mask of
+    `compile_parser` and may be omitted for structs with a single
+    datatype.
+
+    """
+    # the realization shared with the datatype mask of the parser
+    datatypes = _realize(struct).transform("arithmetic_simplify").find_symbol(DATATYPE)
+    if datatype is None:
+        if len(datatypes) != 1:
+            raise ValueError(
+                f"struct={struct.name} has {len(datatypes)} datatypes, select one"
+            )
+        datatype = 0
+    return numpy(datatypes[datatype], record_bytes=record_bytes)
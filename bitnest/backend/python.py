@@ -1,54 +1,130 @@
 import ast
+import builtins
 import functools
+from typing import Callable, Dict, List
 
 import astor
 
-from bitnest.core import Symbol, Expression
+from bitnest import cache, view
+from bitnest.backend.bitreader import DecodeError
+from bitnest.core import (
+    Expression,
+    ADD,
+    ASSIGN,
+    ATTRIBUTE,
+    BIT_AND,
+    BIT_OR,
+    CALL,
+    DATATYPE,
+    ENUM,
+    EQ,
+    FIELD,
+    FLOAT,
+    FLOORDIV,
+    FOR,
+    FROM_BYTES,
+    GE,
+    GT,
+    IF,
+    INDEX,
+    ITEM,
+    INTEGER,
+    LE,
+    LIST,
+    LOGICAL_AND,
+    LOGICAL_OR,
+    LSHIFT,
+    LT,
+    MOD,
+    MUL,
+    NE,
+    NOT,
+    RSHIFT,
+    STATEMENTS,
+    STRUCT,
+    SUB,
+    TRUEDIV,
+    TUPLE,
+    VARIABLE,
+    VECTOR,
+)
+from bitnest.pipeline import Pipeline
+from bitnest.transform.parser_record import struct_record_type
 
 
 def binary_operation(symbol, args):
     operation_map = {
-        Symbol("add"): ast.Add,
-        Symbol("sub"): ast.Sub,
-        Symbol("mul"): ast.Mult,
-        Symbol("floordiv"): ast.FloorDiv,
-        Symbol("truediv"): ast.Div,
+        ADD: ast.Add,
+        SUB: ast.Sub,
+        MUL: ast.Mult,
+        FLOORDIV: ast.FloorDiv,
+        TRUEDIV: ast.Div,
     }
     return functools.reduce(
         lambda left, right: ast.BinOp(left, operation_map[symbol](), right), args
     )
 
 
+def statement_list(statements):
+    statements = statements if isinstance(statements, list) else [statements]
+    # expressions evaluated for their side effects e.g. calls
+    return [ast.Expr(_) if isinstance(_, ast.expr) else _ for _ in statements]
+
+
 DEFAULT_SYMBOL_MAPPING = {
-    Symbol("not"): lambda symbol, args: ast.UnaryOp(ast.Not(), args[0]),
-    Symbol("logical_and"): lambda symbol, args: ast.BoolOp(
-        ast.And(), [args[0], args[1]]
+    NOT: lambda symbol, args: ast.UnaryOp(ast.Not(), args[0]),
+    LOGICAL_AND: lambda symbol, args: ast.BoolOp(ast.And(), [args[0], args[1]]),
+    LOGICAL_OR: lambda symbol, args: ast.BoolOp(ast.Or(), [args[0], args[1]]),
+    BIT_AND: lambda symbol, args: ast.BinOp(args[0], ast.BitAnd(), args[1]),
+    BIT_OR: lambda symbol, args: ast.BinOp(args[0], ast.BitOr(), args[1]),
+    MOD: lambda symbol, args: ast.BinOp(args[0], ast.Mod(), args[1]),
+    LSHIFT: lambda symbol, args: ast.BinOp(args[0], ast.LShift(), args[1]),
+    RSHIFT: lambda symbol, args: ast.BinOp(args[0], ast.RShift(), args[1]),
+    FROM_BYTES: lambda symbol, args: ast.Call(
+        func=ast.Attribute(ast.Name("int", ast.Load()), "from_bytes", ast.Load()),
+        args=[args[0], ast.Constant("big")],
+        keywords=[],
+    ),
+    ADD: binary_operation,
+    SUB: binary_operation,
+    MUL: binary_operation,
+    FLOORDIV: binary_operation,
+    TRUEDIV: binary_operation,
+    EQ: lambda symbol, args: ast.Compare(args[0], [ast.Eq()], [args[1]]),
+    NE: lambda symbol, args: ast.Compare(args[0], [ast.NotEq()], [args[1]]),
+    LT: lambda symbol, args: ast.Compare(args[0], [ast.Lt()], [args[1]]),
+    GT: lambda symbol, args: ast.Compare(args[0], [ast.Gt()], [args[1]]),
+    LE: lambda symbol, args: ast.Compare(args[0], [ast.LtE()], [args[1]]),
+    GE: lambda symbol, args: ast.Compare(args[0], [ast.GtE()], [args[1]]),
+    VARIABLE: lambda symbol, args: ast.Name(args[0], ast.Load()),
+    INTEGER: lambda symbol, args: ast.Constant(args[0]),
+    FLOAT: lambda symbol, args: ast.Constant(args[0]),
+    ENUM: lambda symbol, args: ast.Constant(args[0].value),
+    INDEX: lambda symbol, args: ast.Subscript(
+        value=args[0], slice=ast.Slice(lower=args[1], upper=args[2]), ctx=ast.Load()
+    ),
+    ITEM: lambda symbol, args: ast.Subscript(
+        value=args[0], slice=args[1], ctx=ast.Load()
+    ),
+    ASSIGN: lambda symbol, args: ast.Assign(
+        targets=[ast.Name(args[0].id, ast.Store())], value=args[1]
+    ),
+    IF: lambda symbol, args: ast.If(
+        test=args[0],
+        body=statement_list(args[1]),
+        orelse=statement_list(args[2]) if len(args) > 2 else [],
     ),
-    Symbol("logical_or"): lambda symbol, args: ast.BoolOp(ast.Or(), [args[0], args[1]]),
-    Symbol("bit_and"): lambda symbol, args: ast.BinOp(args[0], ast.BitAnd(), args[1]),
-    Symbol("bit_or"): lambda symbol, args: ast.BinOp(args[0], ast.BitOr(), args[1]),
-    Symbol("mod"): lambda symbol, args: ast.BinOp(args[0], ast.Mod(), args[1]),
-    Symbol("add"): binary_operation,
-    Symbol("sub"): binary_operation,
-    Symbol("mul"): binary_operation,
-    Symbol("floordiv"): binary_operation,
-    Symbol("truediv"): binary_operation,
-    Symbol("eq"): lambda symbol, args: ast.Compare(args[0], [ast.Eq()], [args[1]]),
-    Symbol("ne"): lambda symbol, args: ast.Compare(args[0], [ast.NotEq()], [args[1]]),
-    Symbol("lt"): lambda symbol, args: ast.Compare(args[0], [ast.Lt()], [args[1]]),
-    Symbol("gt"): lambda symbol, args: ast.Compare(args[0], [ast.Gt()], [args[1]]),
-    Symbol("le"): lambda symbol, args: ast.Compare(args[0], [ast.LtE()], [args[1]]),
-    Symbol("ge"): lambda symbol, args: ast.Compare(args[0], [ast.GtE()], [args[1]]),
-    Symbol("variable"): lambda symbol, args: ast.Name(args[0]),
-    Symbol("integer"): lambda symbol, args: ast.Constant(args[0]),
-    Symbol("float"): lambda symbol, args: ast.Constant(args[0]),
-    Symbol("enum"): lambda symbol, args: ast.Constant(args[0].value),
-    Symbol("index"): lambda symbol, args: ast.Subscript(
-        value=args[0], slice=ast.Slice(lower=args[1], upper=args[2])
+    FOR: lambda symbol, args: ast.For(
+        target=ast.Name(args[0].id, ast.Store()),
+        iter=args[1],
+        body=statement_list(args[2]),
+        orelse=[],
     ),
-    Symbol("assign"): lambda symbol, args: ast.Assign(targets=[args[0]], value=args[1]),
-    Symbol("if"): lambda symbol, args: ast.If(test=args[0], body=[args[1]], orelse=[]),
-    Symbol("statements"): lambda symbol, args: [_ for _ in args],
+    CALL: lambda symbol, args: ast.Call(func=args[0], args=list(args[1:]), keywords=[]),
+    ATTRIBUTE: lambda symbol, args: ast.Attribute(args[0], args[1], ast.Load()),
+    LIST: lambda symbol, args: ast.List(list(args), ast.Load()),
+    TUPLE: lambda symbol, args: ast.Tuple(list(args), ast.Load()),
+    STATEMENTS: lambda symbol, args: statement_list(list(args)),
 }
 
 
@@ -63,6 +139,489 @@ def python(expression: Expression) -> str:
 
     # terminate statements which render as lists in ast
     if isinstance(expression_ast, list):
-        expression_ast = ast.Module(expression_ast)
+        expression_ast = ast.Module(expression_ast, type_ignores=[])
 
     return astor.to_source(expression_ast)
+
+
+def free_variables(expression: Expression, bound=()) -> List[str]:
+    """Names of all variables read but never assigned within expression"""
+    _expression = Expression(expression)
+    assigned = {
+        Expression(_.target).name
+        for _ in _expression.find(lambda symbol, args: symbol in (ASSIGN, FOR))
+    }
+    names = []
+    for variable in _expression.find_symbol(VARIABLE):
+        name = variable.name
+        if name not in assigned and name not in bound and name not in names:
+            names.append(name)
+    return names
+
+
+def compile_function(
+    expression: Expression,
+    name: str,
+    arguments: List[str],
+    result: str,
+    filename: str = "<bitnest>",
+    namespace: Dict = None,
+) -> Callable:
+    """Compile statements into a python function returning `result`
+
+    Free variables not listed in `arguments` (vector loop variables)
+    become keyword arguments defaulting to zero. Names defined in
+    `namespace` or builtins are not free.
+
+    """
+    namespace = {} if namespace is None else namespace
+    body = to_python_ast(expression)
+    if not isinstance(body, list):
+        body = [body]
+    body.append(ast.Return(ast.Name(result, ast.Load())))
+
+    defaults = free_variables(
+        expression, bound={*arguments, *namespace, *vars(builtins)}
+    )
+    function = ast.FunctionDef(
+        name=name,
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(_) for _ in arguments + defaults],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[ast.Constant(0) for _ in defaults],
+        ),
+        body=body,
+        decorator_list=[],
+    )
+    module = ast.fix_missing_locations(ast.Module([function], type_ignores=[]))
+
+    exec(compile(module, filename, "exec"), namespace)
+    return namespace[name]
+
+
+def memoize(function: Callable) -> Callable:
+    """Memoize a function of a `Struct` and hashable options until the
+    expression of the struct changes, e.g. when its fields are
+    reassigned (see `Struct.expression`)
+
+    """
+    results = {}
+
+    @functools.wraps(function)
+    def memoized(struct, *args, **kwargs):
+        key = (struct, args, tuple(kwargs.items()))
+        expression = struct.expression().expression
+        result = results.get(key)
+        if result is None or result[0] is not expression:
+            result = results[key] = (expression, function(struct, *args, **kwargs))
+        return result[1]
+
+    memoized.cache_clear = results.clear
+    return memoized
+
+
+@memoize
+def compile_parser(
+    struct,
+    bits_name: str = "__bits",
+    datatype_mask_name: str = "__datatype_mask",
+    strategy: str = "sequential",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
+) -> Callable:
+    """Compile a `Struct` into a callable returning the datatype mask
+
+    The python ast is compiled directly without rendering source
+    text. Compiled parsers are memoized per struct and options until
+    the expression of the struct changes and stored on disk when
+    `bitnest.cache` has a directory. See `parser_datatype` for the
+    available strategies.
+
+    bits_format selects the input of the parser, see
+    `bit_extraction`. "bits" and "bytes" parsers take the input
+    alone while "int" parsers take the integer followed by its
+    length in bits, e.g. `parser(int.from_bytes(data, "big"),
+    len(data) * 8)`.
+
+    """
+    options = dict(
+        bits_name=bits_name,
+        datatype_mask_name=datatype_mask_name,
+        strategy=strategy,
+        bits_format=bits_format,
+        length_name=length_name,
+    )
+
+    def build():
+        expression = (
+            _realize(struct)
+            .transform("parser_datatype", **options)
+            .transform("arithmetic_simplify")
+        )
+        arguments = [bits_name, length_name] if bits_format == "int" else [bits_name]
+        return [
+            compile_function(
+                expression,
+                name="parser",
+                arguments=arguments,
+                result=datatype_mask_name,
+                filename=f"<bitnest {struct.name}>",
+            )
+        ]
+
+    return cache.cached(struct, "parser", options, build)[0]
+
+
+REALIZE = Pipeline(["realize_datatypes", "realize_conditions", "realize_offsets"])
+
+
+def _realize(struct) -> Expression:
+    return REALIZE(struct.expression())
+
+
+@memoize
+def compile_extractors(
+    struct,
+    bits_name: str = "__bits",
+    record_name: str = "__record",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
+    payload_views: bool = False,
+) -> List[Callable]:
+    """Compile a `Struct` into one callable per realized datatype
+    returning the record of all decoded fields
+
+    Extractors are in the order of bits within the datatype mask of
+    `compile_parser` and take the same arguments. See `parser_record`.
+
+    """
+    options = dict(
+        bits_name=bits_name,
+        record_name=record_name,
+        bits_format=bits_format,
+        length_name=length_name,
+        payload_views=payload_views,
+    )
+
+    def build():
+        arguments = [bits_name, length_name] if bits_format == "int" else [bits_name]
+        namespace = {}
+        extractors = []
+        for i, datatype in enumerate(_realize(struct).find_symbol(DATATYPE)):
+            expression = datatype.transform(
+                "parser_record", namespace=namespace, **options
+            ).transform("arithmetic_simplify")
+            extractors.append(
+                compile_function(
+                    expression,
+                    name=f"extract_{i}",
+                    arguments=arguments,
+                    result=record_name,
+                    filename=f"<bitnest {struct.name} datatype {i}>",
+                    namespace=namespace,
+                )
+            )
+        return extractors
+
+    return cache.cached(struct, "extractors", options, build)
+
+
+@memoize
+def compile_sizers(
+    struct,
+    bits_name: str = "__bits",
+    size_name: str = "__size",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
+) -> List[Callable]:
+    """Compile a `Struct` into one callable per realized datatype
+    returning its size in bits, see `parser_size`
+
+    Sizers are in the order of bits within the datatype mask of
+    `compile_parser` and take the input followed by its length in
+    bits for every bits_format, e.g. `sizer(data, len(data) * 8)`.
+
+    """
+    options = dict(
+        bits_name=bits_name,
+        size_name=size_name,
+        bits_format=bits_format,
+        length_name=length_name,
+    )
+
+    def build():
+        namespace = {}
+        sizers = []
+        for i, datatype in enumerate(_realize(struct).find_symbol(DATATYPE)):
+            expression = datatype.transform("parser_size", **options).transform(
+                "arithmetic_simplify"
+            )
+            sizers.append(
+                compile_function(
+                    expression,
+                    name=f"size_{i}",
+                    arguments=[bits_name, length_name],
+                    result=size_name,
+                    filename=f"<bitnest {struct.name} datatype {i}>",
+                    namespace=namespace,
+                )
+            )
+        return sizers
+
+    return cache.cached(struct, "sizers", options, build)
+
+
+@memoize
+def compile_decoder(
+    struct,
+    bits_format: str = "bits",
+    strategy: str = "sequential",
+    payload_views: bool = False,
+    lazy: bool = False,
+) -> Callable:
+    """Compile a `Struct` into a callable returning the record of the
+    first datatype matching the input
+
+    Takes the same arguments as `compile_parser` and raises
+    `DecodeError`, a `ValueError`, when no datatype matches or when
+    the input ends before the matching datatype. See `parser_record` for
+    payload_views. With lazy the callable returns a view decoding
+    fields on access instead (see `compile_views`), which requires
+    bits_format "bytes" and does not check the length of the input.
+
+    """
+    if lazy and (bits_format != "bytes" or payload_views):
+        raise ValueError("lazy requires bits_format bytes without payload_views")
+    parser = compile_parser(struct, strategy=strategy, bits_format=bits_format)
+    if lazy:
+        views = compile_views(struct)
+
+        def lazy_decoder(data):
+            datatype_mask = parser(data)
+            if not datatype_mask:
+                raise DecodeError(f"no datatype of struct={struct.name} matches")
+            return views[(datatype_mask & -datatype_mask).bit_length() - 1](data)
+
+        return lazy_decoder
+
+    extractors = compile_extractors(
+        struct, bits_format=bits_format, payload_views=payload_views
+    )
+
+    def decoder(*args):
+        datatype_mask = parser(*args)
+        if not datatype_mask:
+            raise DecodeError(f"no datatype of struct={struct.name} matches")
+        return extractors[(datatype_mask & -datatype_mask).bit_length() - 1](*args)
+
+    return decoder
+
+
+@memoize
+def compile_views(
+    struct,
+    bits_name: str = "__bits",
+    value_name: str = "__value",
+) -> List[type]:
+    """Compile a `Struct` into one view class per realized datatype,
+    see `bitnest.view`
+
+    View classes are in the order of bits within the datatype mask of
+    `compile_parser` and take a bytes like buffer. Each field and the
+    length, start and element ends of each vector have their own
+    function, see `parser_view` and `offset_plan`.
+
+    """
+    options = dict(bits_name=bits_name, value_name=value_name)
+
+    def build():
+        namespace = {}
+        getters = []
+        for i, datatype in enumerate(_realize(struct).find_symbol(DATATYPE)):
+            plan = datatype.analysis("offset_plan")
+            for kind, key, scope in view.view_nodes(datatype.expression[1]):
+                expression = datatype.transform(
+                    "parser_view",
+                    kind=kind,
+                    key=key,
+                    plan=plan,
+                    bits_name=bits_name,
+                    result_name=value_name,
+                    namespace=namespace,
+                ).transform("arithmetic_simplify")
+                getters.append(
+                    compile_function(
+                        expression,
+                        name=f"view_{i}_{len(getters)}",
+                        arguments=[bits_name, *scope],
+                        result=value_name,
+                        filename=f"<bitnest {struct.name} datatype {i}>",
+                        namespace=namespace,
+                    )
+                )
+        return getters
+
+    getters = iter(cache.cached(struct, "views", options, build))
+    # views only depend on the names and sizes of fields
+    datatypes = struct.expression().transform("realize_datatypes")
+    views = []
+    for i, datatype in enumerate(datatypes.find_symbol(DATATYPE)):
+        view_type = view.view_type(datatype.expression[1], getters)
+        view_type._datatype = i
+        views.append(view_type)
+    return views
+
+
+@memoize
+def compile_encoders(
+    struct,
+    record_name: str = "__record",
+    buffer_name: str = "__buffer",
+    position_name: str = "__position",
+) -> List[Callable]:
+    """Compile a `Struct` into one callable per realized datatype
+    writing a record into a bytearray, see `encoder_record`
+
+    Encoders are in the order of bits within the datatype mask of
+    `compile_parser` and take the record, the bytearray and the byte
+    position to write at, returning the position following the
+    record.
+
+    """
+    options = dict(
+        record_name=record_name,
+        buffer_name=buffer_name,
+        position_name=position_name,
+    )
+
+    def build():
+        namespace = {}
+        encoders = []
+        for i, datatype in enumerate(_realize(struct).find_symbol(DATATYPE)):
+            expression = datatype.transform(
+                "encoder_record", namespace=namespace, **options
+            ).transform("arithmetic_simplify")
+            encoders.append(
+                compile_function(
+                    expression,
+                    name=f"encode_{i}",
+                    arguments=[record_name, buffer_name, position_name],
+                    result=position_name,
+                    filename=f"<bitnest {struct.name} datatype {i}>",
+                    namespace=namespace,
+                )
+            )
+        return encoders
+
+    return cache.cached(struct, "encoders", options, build)
+
+
+def _record_shape(node) -> Callable:
+    """Callable telling whether a value holds the record types of the
+    structs of a node of a realized datatype, or plain tuples for the
+    nested structs
+
+    """
+    symbol = node[0]
+    if symbol == STRUCT:
+        record_type = struct_record_type(node)
+        children = [
+            (index, _record_shape(child))
+            for index, child in enumerate(node[2][1:])
+            if child[0] != FIELD
+        ]
+
+        def shape(value, nested=False):
+            # nested records may be given as plain tuples
+            if type(value) is not record_type and not (nested and type(value) is tuple):
+                return False
+            return all(matches(value[index], True) for index, matches in children)
+
+    elif symbol == VECTOR:
+        element = _record_shape(node[1])
+
+        def shape(value, nested=True):
+            return all(element(_, True) for _ in value)
+
+    else:
+        raise ValueError(f"cannot match records of node with symbol={symbol}")
+    return shape
+
+
+def _record_layout(node):
+    """Record types of the structs of a node of a realized datatype
+    along with the types and sizes of its fields and the lengths of
+    its vectors, datatypes with the same layout encode records alike
+
+    """
+    symbol = node[0]
+    if symbol == FIELD:
+        return (FIELD, node[1], node[4], node[6].get("mapping"))
+    elif symbol == STRUCT:
+        return (
+            struct_record_type(node),
+            tuple(_record_layout(_) for _ in node[2][1:]),
+        )
+    elif symbol == VECTOR:
+        return (VECTOR, node[2], _record_layout(node[1]))
+    raise ValueError(f"cannot lay out node with symbol={symbol}")
+
+
+def _record_types(layout):
+    """Layout without the fields and vector lengths, see `_record_layout`"""
+    if layout[0] == FIELD:
+        return None
+    elif layout[0] == VECTOR:
+        return (VECTOR, _record_types(layout[2]))
+    return (layout[0], tuple(_record_types(_) for _ in layout[1]))
+
+
+@memoize
+def compile_encoder(struct) -> Callable:
+    """Compile a `Struct` into a callable writing a record returned by
+    `compile_decoder` into a bytearray
+
+    The encoder takes the record, the bytearray and the byte position
+    to write at, defaulting to zero, and returns the position
+    following the record. The datatype is selected by the types of
+    the record and of the records nested within it, the first
+    datatype matching them when several do, e.g. records with empty
+    vectors or plain tuples. Raises `ValueError` for other records or when the
+    bytearray is too small, and when compiling a struct whose
+    datatypes share the types of all their records but are laid out
+    differently.
+
+    """
+    datatypes = struct.expression().transform("realize_datatypes")
+    # record type -> [(shape, encoder)] in datatype order
+    encoders = {}
+    layouts = {}
+    for i, (datatype, encode) in enumerate(
+        zip(datatypes.find_symbol(DATATYPE), compile_encoders(struct))
+    ):
+        node = datatype.expression[1]
+        layout = _record_layout(node)
+        record_types = _record_types(layout)
+        j, other = layouts.setdefault(record_types, (i, layout))
+        if other != layout:
+            raise ValueError(
+                f"datatypes {j} and {i} of struct={struct.name} have records "
+                "of the same types with different layouts"
+            )
+        elif j == i:
+            encoders.setdefault(struct_record_type(node), []).append(
+                (_record_shape(node), encode)
+            )
+
+    def encoder(record, buffer: bytearray, position: int = 0) -> int:
+        for shape, encode in encoders.get(type(record), ()):
+            if shape(record):
+                return encode(record, buffer, position)
+        raise ValueError(
+            f"record of type {type(record).__name__} does not match a "
+            f"datatype of struct={struct.name}"
+        )
+
+    return encoder
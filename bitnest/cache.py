@@ -0,0 +1,150 @@
+"""
+On-disk cache of functions compiled from structs
+
+Functions compiled by `bitnest.backend.python` are stored as
+marshalled code objects along with the values they use from their
+namespace, e.g. enum lookups and record constructors. Entries are
+keyed by the fingerprint of the struct (see `bitnest.core.fingerprint`),
+the bitnest and python versions and the compile options so loading
+them skips every transformation:
+
+    bitnest.cache.set_directory("~/.cache/bitnest")
+    decoder = compile_decoder(MILSTD_1553_Message)
+
+The directory defaults to the environment variable BITNEST_CACHE_DIR
+and nothing is cached without one. Namespaces are pickled and code is
+executed when loaded so only use directories whose files are trusted.
+
+"""
+import builtins
+import hashlib
+import importlib.util
+import io
+import marshal
+import os
+import pickle
+import tempfile
+import types
+from typing import Callable, Dict, List, Optional
+
+import bitnest
+from bitnest import record
+
+directory: Optional[str] = os.environ.get("BITNEST_CACHE_DIR") or None
+
+
+def set_directory(path: Optional[str]):
+    """Cache compiled functions within path, None disables the cache"""
+    global directory
+    directory = None if path is None else os.path.expanduser(os.fspath(path))
+
+
+def key(expression, kind: str, options: Dict) -> str:
+    """Name of the entry of the functions of kind compiled from an
+    expression with the given options
+
+    """
+    hasher = hashlib.sha256()
+    for part in (
+        expression.fingerprint(),
+        bitnest.__version__,
+        importlib.util.MAGIC_NUMBER.hex(),
+        kind,
+        repr(sorted(options.items())),
+    ):
+        hasher.update(part.encode())
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(directory, f"{key}.bitnest")
+
+
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        # record types are created at runtime, see `bitnest.record`
+        if (
+            isinstance(obj, type)
+            and obj.__module__ == record.__name__
+            and "_name" in obj.__dict__
+        ):
+            return (record.record_type, (obj._name, obj._fields))
+        return NotImplemented
+
+
+def load(key: str) -> Optional[List[Callable]]:
+    """Functions of an entry or None when there is no valid entry"""
+    if directory is None:
+        return None
+    try:
+        with open(_path(key), "rb") as f:
+            codes, defaults, data = marshal.load(f)
+        namespace = pickle.loads(data)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    except (AttributeError, ImportError):  # pickled values no longer exist
+        return None
+
+    namespace["__builtins__"] = builtins
+    functions = []
+    for code, _defaults in zip(codes, defaults):
+        function = types.FunctionType(code, namespace, code.co_name, _defaults)
+        namespace[code.co_name] = function
+        functions.append(function)
+    return functions
+
+
+def store(key: str, functions: List[Callable]):
+    """Write an entry for functions compiled within a shared namespace
+
+    Functions whose namespace cannot be pickled, e.g. enums defined
+    within a function, are not cached.
+
+    """
+    if directory is None:
+        return
+    names = {_.__name__ for _ in functions}
+    namespace = {
+        name: value
+        for name, value in functions[0].__globals__.items()
+        if name != "__builtins__" and name not in names
+    }
+    buffer = io.BytesIO()
+    try:
+        _Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(namespace)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return
+    data = marshal.dumps(
+        (
+            tuple(_.__code__ for _ in functions),
+            tuple(_.__defaults__ for _ in functions),
+            buffer.getvalue(),
+        )
+    )
+
+    # entries are replaced atomically for concurrent processes
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temporary, _path(key))
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def cached(struct, kind: str, options: Dict, compile: Callable) -> List[Callable]:
+    """Functions of kind compiled from struct loaded from the cache, or
+    returned by `compile()` and stored when there is no entry
+
+    """
+    if directory is None:
+        return compile()
+    _key = key(struct.expression(), kind, options)
+    functions = load(_key)
+    if functions is None:
+        functions = compile()
+        store(_key, functions)
+    return functions
@@ -1,57 +1,383 @@
 import enum
-import itertools
+import hashlib
+import operator
 from typing import Callable, Dict, Generator, List, Optional
 import importlib
 
 
 class Symbol:
-    def __init__(self, name: str):
-        self._name = name
+    """Interned symbol, there is exactly one instance for each name
+
+    Equality and hashing use object identity.
+
+    """
+
+    __slots__ = ("_name",)
+
+    _symbols: Dict[str, "Symbol"] = {}
+
+    def __new__(cls, name: str):
+        symbol = cls._symbols.get(name)
+        if symbol is None:
+            symbol = super().__new__(cls)
+            symbol._name = name
+            symbol = cls._symbols.setdefault(name, symbol)
+        return symbol
 
     @property
     def name(self):
         return self._name
 
-    def __hash__(self):
-        return hash(self._name)
-
-    def __eq__(self, other):
-        return isinstance(other, type(self)) and other._name == self._name
-
     def __copy__(self):
-        return type(self)(self._name)
+        return self
 
     def __deepcopy__(self, memo):
-        return self.__copy__()
+        return self
+
+    def __reduce__(self):
+        return (type(self), (self._name,))
 
     def __repr__(self):
         return f"{self._name}"
 
 
+QUOTE = Symbol("quote")
+LIST = Symbol("list")
+TUPLE = Symbol("tuple")
+STATEMENTS = Symbol("statements")
+ASSIGN = Symbol("assign")
+IF = Symbol("if")
+FOR = Symbol("for")
+CALL = Symbol("call")
+ATTRIBUTE = Symbol("attribute")
+INDEX = Symbol("index")
+ITEM = Symbol("item")
+VARIABLE = Symbol("variable")
+INTEGER = Symbol("integer")
+FLOAT = Symbol("float")
+ENUM = Symbol("enum")
+NOT = Symbol("not")
+LOGICAL_AND = Symbol("logical_and")
+LOGICAL_OR = Symbol("logical_or")
+BIT_AND = Symbol("bit_and")
+BIT_OR = Symbol("bit_or")
+LSHIFT = Symbol("lshift")
+RSHIFT = Symbol("rshift")
+FROM_BYTES = Symbol("from_bytes")
+ADD = Symbol("add")
+SUB = Symbol("sub")
+MUL = Symbol("mul")
+FLOORDIV = Symbol("floordiv")
+TRUEDIV = Symbol("truediv")
+MOD = Symbol("mod")
+EQ = Symbol("eq")
+NE = Symbol("ne")
+LT = Symbol("lt")
+GT = Symbol("gt")
+LE = Symbol("le")
+GE = Symbol("ge")
+DATATYPE = Symbol("datatype")
+STRUCT = Symbol("struct")
+FIELD = Symbol("field")
+FIELD_REFERENCE = Symbol("field_reference")
+VECTOR = Symbol("vector")
+UNION = Symbol("union")
+
+
+# number of nodes visited by `replace_nodes` and `replace_mapping`,
+# see `nodes_visited`
+_nodes_visited = 0
+
+# callable run(kind, name, function, expression, args, kwargs)
+# wrapping every pass while set, see `bitnest.profile`
+pass_runner: Optional[Callable] = None
+
+
+def nodes_visited() -> int:
+    """Total number of nodes visited by tree traversals"""
+    return _nodes_visited
+
+
+def unchanged(result, node):
+    """node if result is a rebuilt tuple with identical children"""
+    if (
+        result is not node
+        and type(result) is tuple
+        and len(result) == len(node)
+        and all(map(operator.is_, result, node))
+    ):
+        return node
+    return result
+
+
 def replace_nodes(node, replacement_function: Generator):
+    """Traverse node replacing each visited node
+
+    replacement_function(symbol, args) is a generator called for each
+    node. The first value yielded (pre-order) is the node whose
+    children are traversed. It is then sent (symbol, args) with the
+    replaced children and the second value yielded (post-order)
+    replaces the node.
+
+    Traversal uses an explicit stack of (generator, original node,
+    node, remaining children, replaced children) frames so deep trees
+    do not recurse. Nodes rebuilt with identical children are
+    returned by identity.
+
+    """
+    global _nodes_visited
     generator = replacement_function(node[0], node[1:])
-    node = generator.send(None)
+    original, node = node, generator.send(None)
+    children = iter(node)
+    next(children)
+    stack = [(generator, original, node, children, [])]
+    visited = 1
+
+    while True:
+        generator, original, node, children, args = stack[-1]
+        for arg in children:
+            if isinstance(arg, tuple):
+                visited += 1
+                generator = replacement_function(arg[0], arg[1:])
+                node = generator.send(None)
+                children = iter(node)
+                next(children)
+                stack.append((generator, arg, node, children, []))
+                break
+            args.append(arg)
+        else:
+            stack.pop()
+            result = generator.send((node[0], args))
+            result = unchanged(unchanged(result, node), original)
+            if not stack:
+                _nodes_visited += visited
+                return result
+            stack[-1][4].append(result)
+
+
+def replace_mapping(node, replacement_mapping: Dict, order: str = "post_order"):
+    """Copy-on-write replacement of nodes by symbol
+
+    replacement_mapping[symbol](symbol, args) is called for each node
+    with a matching symbol either before (pre_order) or after
+    (post_order) its children are replaced. A node is only rebuilt
+    when one of its children changed, otherwise the original node is
+    returned by identity. `quote` nodes are never traversed.
+
+    Frames on the explicit stack are [original node, node, next child
+    index, replaced children] where replaced children is None until a
+    child differs from the original.
+
+    """
+    pre_order = order == "pre_order"
+    post_order = order == "post_order"
+
+    def enter(original):
+        symbol = original[0]
+        if symbol is QUOTE:
+            return None, original
+        node = original
+        if pre_order and symbol in replacement_mapping:
+            node = unchanged(
+                replacement_mapping[symbol](symbol, original[1:]), original
+            )
+            if not isinstance(node, tuple):
+                return None, node
+        return [original, node, 1, None], None
+
+    def leave(frame):
+        original, node, index, args = frame
+        symbol = node[0]
+        if post_order and symbol in replacement_mapping:
+            result = replacement_mapping[symbol](
+                symbol, list(node[1:]) if args is None else args
+            )
+            return unchanged(result, node)
+        elif args is not None:
+            return (symbol, *args)
+        return node
+
+    global _nodes_visited
+    _nodes_visited += 1
+    frame, result = enter(node)
+    if frame is None:
+        return result
+    stack = [frame]
+    visited = 0
+
+    while True:
+        frame = stack[-1]
+        original, node, index, args = frame
+        length = len(node)
+        while index < length:
+            arg = node[index]
+            index += 1
+            if isinstance(arg, tuple):
+                visited += 1
+                child_frame, result = enter(arg)
+                if child_frame is not None:
+                    frame[2] = index
+                    frame[3] = args
+                    stack.append(child_frame)
+                    break
+                if result is not arg and args is None:
+                    args = list(node[1 : index - 1])
+                if args is not None:
+                    args.append(result)
+            elif args is not None:
+                args.append(arg)
+        else:
+            frame[3] = args
+            stack.pop()
+            result = leave(frame)
+            if not stack:
+                _nodes_visited += visited
+                return result
+
+            parent = stack[-1]
+            if result is not original and parent[3] is None:
+                parent[3] = list(parent[1][1 : parent[2] - 1])
+            if parent[3] is not None:
+                parent[3].append(result)
+
+
+def walk_nodes(node):
+    """Iterate over all nodes in pre-order without recursion"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed([_ for _ in node[1:] if isinstance(_, tuple)]))
+
+
+def _leaf_key(value):
+    if isinstance(value, dict):
+        return (dict, tuple((k, _leaf_key(v)) for k, v in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return (type(value), id(value))
+    return (type(value), value)
+
+
+class InternTable:
+    """Hash-consing of expression nodes
 
-    args = []
-    for arg in node[1:]:
-        if isinstance(arg, tuple):
-            arg = replace_nodes(arg, replacement_function)
-        args.append(arg)
+    Structurally identical nodes interned within the same table are
+    replaced by a single shared tuple whose structural hash is
+    computed once. Comparing interned nodes is an identity check.
 
-    return generator.send((node[0], args))
+    """
+
+    def __init__(self):
+        self._nodes = {}  # key -> canonical node
+        self._entries = {}  # id(canonical node) -> (canonical node, hash)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        entry = self._entries.get(id(node))
+        return entry is not None and entry[0] is node
+
+    def intern(self, node):
+        if not isinstance(node, tuple) or node in self:
+            return node
+
+        children = tuple(self.intern(_) for _ in node)
+        key = tuple(id(_) if isinstance(_, tuple) else _leaf_key(_) for _ in children)
+        canonical = self._nodes.get(key)
+        if canonical is None:
+            canonical = (
+                node if all(a is b for a, b in zip(node, children)) else children
+            )
+            structural_hash = hash(
+                tuple(
+                    self._entries[id(_)][1] if isinstance(_, tuple) else _leaf_key(_)
+                    for _ in children
+                )
+            )
+            self._nodes[key] = canonical
+            self._entries[id(canonical)] = (canonical, structural_hash)
+        return canonical
+
+    def structural_hash(self, node) -> int:
+        return self._entries[id(self.intern(node))][1]
+
+    def equal(self, left, right) -> bool:
+        return self.intern(left) is self.intern(right)
+
+
+def _leaf_text(value) -> str:
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return f"{type(value).__name__}:{value!r}"
+    elif isinstance(value, Symbol):
+        return f"symbol:{value.name}"
+    elif isinstance(value, enum.Enum):
+        cls = type(value)
+        return f"enum:{cls.__module__}.{cls.__qualname__}.{value.name}={value.value!r}"
+    elif isinstance(value, type) and issubclass(value, enum.Enum):
+        members = ",".join(_leaf_text(_) for _ in value)
+        return f"enum_type:{value.__module__}.{value.__qualname__}[{members}]"
+    raise ValueError(f"cannot fingerprint value of type={type(value).__name__}")
+
+
+def fingerprint(node) -> str:
+    """Hex digest of the structure of an expression
+
+    Unlike `InternTable.structural_hash` the digest is the same in
+    every process and python version, enums are identified by their
+    qualified name and members. Shared nodes are hashed once.
+
+    """
+    digests = {}  # id(node) -> digest, nodes are alive during hashing
+
+    def digest(value) -> bytes:
+        if isinstance(value, Expression):
+            value = value.expression
+        if isinstance(value, tuple):
+            result = digests.get(id(value))
+            if result is None:
+                hasher = hashlib.sha256(b"tuple:%d" % len(value))
+                for _ in value:
+                    hasher.update(digest(_))
+                result = digests[id(value)] = hasher.digest()
+            return result
+        elif isinstance(value, dict):
+            hasher = hashlib.sha256(b"dict:%d" % len(value))
+            for text, _value in sorted((_leaf_text(k), v) for k, v in value.items()):
+                hasher.update(hashlib.sha256(text.encode()).digest())
+                hasher.update(digest(_value))
+            return hasher.digest()
+        return hashlib.sha256(_leaf_text(value).encode()).digest()
+
+    return digest(node).hex()
 
 
 ATTRIBUTE_MAPPING = {
-    Symbol("integer"): ["symbol", "value"],
-    Symbol("float"): ["symbol", "value"],
-    Symbol("enum"): ["symbol", "value"],
-    Symbol("variable"): ["symbol", "name"],
-    Symbol("index"): ["symbol", "value", "start", "stop"],
-    Symbol("assign"): ["symbol", "target", "value"],
-    Symbol("if"): ["symbol", "condition", "expr"],
+    INTEGER: ["symbol", "value"],
+    FLOAT: ["symbol", "value"],
+    ENUM: ["symbol", "value"],
+    VARIABLE: ["symbol", "name"],
+    INDEX: ["symbol", "value", "start", "stop"],
+    ITEM: ["symbol", "value", "index"],
+    ASSIGN: ["symbol", "target", "value"],
+    IF: ["symbol", "condition", "expr", "orelse"],
+    FOR: ["symbol", "target", "iterable", "body"],
+    CALL: ["symbol", "function"],
+    ATTRIBUTE: ["symbol", "value", "name"],
 }
 
 
+def is_stream(expression) -> bool:
+    """Whether expression is an iterable of datatypes, e.g. the
+    generator from `iter_realize_datatypes`, rather than a single
+    expression
+
+    """
+    return not isinstance(expression, (Expression, tuple))
+
+
 class Expression:
     def __init__(self, expression):
         # check if expression is already an `Expression`
@@ -66,7 +392,14 @@ class Expression:
                 arg = arg.expression
             args.append(arg)
 
-        self.expression = tuple(args)
+        # tuples are immutable so keep the node itself when possible
+        # which preserves identity for shared and cached expressions
+        if isinstance(expression, tuple) and all(
+            a is b for a, b in zip(args, expression)
+        ):
+            self.expression = expression
+        else:
+            self.expression = tuple(args)
 
     def __str__(self) -> str:
         return str(self.expression)
@@ -121,146 +454,154 @@ class Expression:
         order: str = "post_order",
         replacement_function: Generator = None,
     ):
-        def _replacement_function(symbol, args):
-            if symbol == Symbol("quote"):
-                yield (symbol, *args)
-
-            if symbol in replacement_mapping and order == "pre_order":
-                symbol, args = yield replacement_mapping[symbol](symbol, args)
-            else:
-                symbol, args = yield (symbol, *args)
+        if replacement_function is None:
+            self.expression = replace_mapping(
+                self.expression, replacement_mapping, order=order
+            )
+        else:
+            self.expression = replace_nodes(self.expression, replacement_function)
 
-            if symbol in replacement_mapping and order == "post_order":
-                yield replacement_mapping[symbol](symbol, args)
-            else:
-                yield (symbol, *args)
+    def intern(self, table: InternTable = None) -> "Expression":
+        """Share structurally identical nodes, see `InternTable`"""
+        table = InternTable() if table is None else table
+        self.expression = table.intern(self.expression)
+        return self
 
-        self.expression = replace_nodes(
-            self.expression, replacement_function or _replacement_function
-        )
+    def fingerprint(self) -> str:
+        """Structural digest stable across processes, see `fingerprint`"""
+        return fingerprint(self.expression)
 
     def find(self, match_function: Callable) -> List["Expression"]:
-        nodes = []
-
-        def find_function(symbol, args):
-            if match_function(symbol, args):
-                nodes.append(Expression((symbol, *args)))
-            symbol, args = yield (symbol, *args)
-            yield (symbol, *args)
-
-        replace_nodes(self.expression, replacement_function=find_function)
-        return nodes
+        return [
+            Expression(node)
+            for node in walk_nodes(self.expression)
+            if match_function(node[0], node[1:])
+        ]
 
     def find_symbol(self, symbol: Symbol, order="post_order") -> List["Expression"]:
-        def match_function(_symbol, args):
-            return symbol == _symbol
-
-        return self.find(match_function)
+        return [
+            Expression(node)
+            for node in walk_nodes(self.expression)
+            if node[0] == symbol
+        ]
+
+    def _run_pass(self, kind, name, args, kwargs):
+        module = importlib.import_module(f"bitnest.{kind}.{name}")
+        function = getattr(module, name)
+        if pass_runner is not None:
+            return pass_runner(kind, name, function, self, args, kwargs)
+        return function(self, *args, **kwargs)
 
     def transform(self, transform_name, *args, **kwargs):
-        module = importlib.import_module(f"bitnest.transform.{transform_name}")
-        return getattr(module, transform_name)(self, *args, **kwargs)
+        return self._run_pass("transform", transform_name, args, kwargs)
 
     def backend(self, backend_name, *args, **kwargs):
-        module = importlib.import_module(f"bitnest.backend.{backend_name}")
-        return getattr(module, backend_name)(self, *args, **kwargs)
+        return self._run_pass("backend", backend_name, args, kwargs)
 
     def analysis(self, analysis_name, *args, **kwargs):
-        module = importlib.import_module(f"bitnest.analysis.{analysis_name}")
-        return getattr(module, analysis_name)(self, *args, **kwargs)
+        return self._run_pass("analysis", analysis_name, args, kwargs)
 
     # for list of special python methods to overload (not all are needed)
     # https://docs.python.org/3/reference/datamodel.html#special-method-names
     def __invert__(self) -> "Expression":  # logical not
-        return self._lazy_op(Symbol("not"), self)
+        return self._lazy_op(NOT, self)
 
     def __and__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("logical_and"), self, other)
+        return self._lazy_op(LOGICAL_AND, self, other)
 
     def __or__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("logical_or"), self, other)
+        return self._lazy_op(LOGICAL_OR, self, other)
 
     def __add__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("add"), self, other)
+        return self._lazy_op(ADD, self, other)
 
     def __sub__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("sub"), self, other)
+        return self._lazy_op(SUB, self, other)
 
     def __mul__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("mul"), self, other)
+        return self._lazy_op(MUL, self, other)
 
     def __floordiv__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("floordiv"), self, other)
+        return self._lazy_op(FLOORDIV, self, other)
 
     def __truediv__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("truediv"), self, other)
+        return self._lazy_op(TRUEDIV, self, other)
 
     def __mod__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("mod"), self, other)
+        return self._lazy_op(MOD, self, other)
 
     def __eq__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("eq"), self, other)
+        return self._lazy_op(EQ, self, other)
 
     def __ne__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("ne"), self, other)
+        return self._lazy_op(NE, self, other)
 
     def __lt__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("lt"), self, other)
+        return self._lazy_op(LT, self, other)
 
     def __gt__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("gt"), self, other)
+        return self._lazy_op(GT, self, other)
 
     def __le__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("le"), self, other)
+        return self._lazy_op(LE, self, other)
 
     def __ge__(self, other) -> "Expression":
-        return self._lazy_op(Symbol("ge"), self, other)
+        return self._lazy_op(GE, self, other)
 
 
 def quote(value) -> Expression:
-    return Expression((Symbol("quote"), value))
+    return Expression((QUOTE, value))
 
 
 def list_(*values) -> Expression:
-    return Expression((Symbol("list"), *values))
+    return Expression((LIST, *values))
+
+
+def tuple_(*values) -> Expression:
+    return Expression((TUPLE, *values))
 
 
 def assign(target: Expression, value: Expression):
-    return Expression((Symbol("assign"), target, value))
+    return Expression((ASSIGN, target, value))
 
 
-def if_(condition: Expression, expr: Expression):
-    return Expression((Symbol("if"), condition, expr))
+def if_(condition: Expression, expr: Expression, orelse: Expression = None):
+    if orelse is None:
+        return Expression((IF, condition, expr))
+    return Expression((IF, condition, expr, orelse))
 
 
-def statements(*exprs):
-    return Expression((Symbol("statements"), *exprs))
+def for_(target: Expression, iterable: Expression, body: Expression):
+    return Expression((FOR, target, iterable, body))
 
 
-def Variable(name: str) -> Expression:
-    return Expression((Symbol("variable"), name))
+def call(function: Expression, *args):
+    return Expression((CALL, function, *args))
 
 
-__UNIQUE_VARIABLE_PREFIX = "__"
-__UNIQUE_VARIABLE_COUNTER = itertools.count()
+def attribute(value: Expression, name: str):
+    return Expression((ATTRIBUTE, value, name))
 
 
-def UniqueVariable() -> Expression:
-    return Expression(
-        (
-            Symbol("variable"),
-            f"{__UNIQUE_VARIABLE_PREFIX}{next(__UNIQUE_VARIABLE_COUNTER)}",
-        )
-    )
+def item(value: Expression, index: Expression):
+    return Expression((ITEM, value, index))
+
+
+def statements(*exprs):
+    return Expression((STATEMENTS, *exprs))
+
+
+def Variable(name: str) -> Expression:
+    return Expression((VARIABLE, name))
 
 
 def Integer(value: int) -> Expression:
-    return Expression((Symbol("integer"), value))
+    return Expression((INTEGER, value))
 
 
 def Float(value: int) -> Expression:
-    return Expression((Symbol("float"), value))
+    return Expression((FLOAT, value))
 
 
 def Enum(value: enum.Enum) -> Expression:
-    return Expression((Symbol("enum"), value))
+    return Expression((ENUM, value))
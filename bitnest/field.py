@@ -2,19 +2,23 @@ from typing import List
 
 
 from bitnest.core import (
-    Symbol,
-    UniqueVariable,
+    Variable,
     Expression,
     list_,
     Integer,
     ATTRIBUTE_MAPPING,
+    FIELD,
+    FIELD_REFERENCE,
+    STRUCT,
+    UNION,
+    VECTOR,
 )
 
 
 ATTRIBUTE_MAPPING.update(
     {
-        Symbol("field_reference"): ["symbol", "name", "id"],
-        Symbol("field"): [
+        FIELD_REFERENCE: ["symbol", "name", "id"],
+        FIELD: [
             "symbol",
             "field_type",
             "name",
@@ -23,23 +27,21 @@ ATTRIBUTE_MAPPING.update(
             "id",
             "additional",
         ],
-        Symbol("struct"): ["symbol", "name", "fields", "conditions", "additional"],
-        Symbol("vector"): ["symbol", "struct", "length", "loop_variable"],
+        STRUCT: ["symbol", "name", "fields", "conditions", "additional"],
+        VECTOR: ["symbol", "struct", "length", "loop_variable", "offset", "size"],
     }
 )
 
 
 def FieldReference(field_name: str, id: int = None):
-    return Expression((Symbol("field_reference"), field_name, id))
+    return Expression((FIELD_REFERENCE, field_name, id))
 
 
 def Field(name: str, size: int, field_type: str, offset=None, id=None, **additional):
     if "." in name:
         raise ValueError(f'invalid field name={name} cannot have "." within name')
 
-    return Expression(
-        (Symbol("field"), field_type, name, offset, Integer(size), id, additional)
-    )
+    return Expression((FIELD, field_type, name, offset, Integer(size), id, additional))
 
 
 def UnsignedInteger(name: str, size: int, **kwargs):
@@ -72,17 +74,51 @@ class Struct:
 
     conditions = []
 
+    @classmethod
+    def _cached_expression(cls):
+        """Cached expression tuple if still valid otherwise None
+
+        The cache belongs to the class itself (not its bases) and is
+        invalidated when `name`, `fields` or `conditions` are
+        reassigned on the class or any base, or when the expression
+        of a child struct changes.
+
+        """
+        cache = cls.__dict__.get("_expression_cache")
+        if cache is None:
+            return None
+
+        name, fields, conditions, doc, children, expression = cache
+        if (
+            name != cls.name
+            or fields is not cls.fields
+            or conditions is not cls.conditions
+            or doc != cls.__doc__
+        ):
+            return None
+
+        for child, child_expression in children:
+            if child.expression().expression is not child_expression:
+                return None
+        return expression
+
     @classmethod
     def expression(cls) -> Expression:
+        expression = cls._cached_expression()
+        if expression is not None:
+            return Expression(expression)
+
         if "." in cls.name:
             raise ValueError(
                 f'invalid struct name={cls.name} cannot have "." within name'
             )
 
         fields = []
+        children = []
         for field in cls.fields:
             if isinstance(field, type) and issubclass(field, Struct):
                 fields.append(field.expression().expression)
+                children.append((field, fields[-1]))
             elif isinstance(field, Expression):
                 fields.append(field.expression)
             else:
@@ -95,22 +131,34 @@ class Struct:
             else:
                 conditions.append(condition)
 
-        return Expression(
+        expression = Expression(
             (
-                Symbol("struct"),
+                STRUCT,
                 cls.name,
                 list_(*fields),
                 list_(*cls.conditions),
                 {"help": cls.__doc__ or ""},
             )
+        ).expression
+
+        cls._expression_cache = (
+            cls.name,
+            cls.fields,
+            cls.conditions,
+            cls.__doc__,
+            children,
+            expression,
         )
+        return Expression(expression)
 
 
 def Union(*structs: List[Struct]) -> Expression:
-    return Expression((Symbol("union"), *tuple(s.expression() for s in structs)))
+    return Expression((UNION, *tuple(s.expression() for s in structs)))
 
 
 def Vector(struct: Struct, length: Expression) -> Expression:
+    # loop variables are named uniquely by `realize_datatypes` so that
+    # expressions do not depend on the order structs are built in
     return Expression(
-        (Symbol("vector"), struct.expression(), length.expression, UniqueVariable())
+        (VECTOR, struct.expression(), length.expression, Variable("__loop"), None, None)
     )
@@ -0,0 +1,55 @@
+"""
+Decoding messages from an `asyncio.StreamReader`
+
+Records are produced by a `PushParser` one read at a time. Nothing is
+read until the consumer asks for more records, so a slow consumer
+leaves data within the stream reader whose buffer limit pauses the
+transport. Reads larger than a threshold are decoded within an
+executor to keep the event loop responsive.
+
+"""
+import asyncio
+import concurrent.futures
+from typing import AsyncIterator
+
+from bitnest.io.push import PushParser
+
+DEFAULT_READ_SIZE = 2 ** 16
+DEFAULT_EXECUTOR_THRESHOLD = 2 ** 14
+
+
+async def decode_stream(
+    reader: asyncio.StreamReader,
+    struct,
+    read_size: int = DEFAULT_READ_SIZE,
+    executor_threshold: int = DEFAULT_EXECUTOR_THRESHOLD,
+    executor: concurrent.futures.Executor = None,
+    payload_views: bool = False,
+) -> AsyncIterator:
+    """Yield the record of each message of `struct` read from reader
+
+    At most `read_size` bytes are read at once. Reads of at least
+    `executor_threshold` bytes are decoded within executor, the loop's
+    default executor when None. Raises `ValueError` when a message
+    does not match any datatype or the stream ends within a message,
+    see `PushParser`.
+
+    """
+    parser = PushParser(struct, payload_views=payload_views)
+    loop = asyncio.get_running_loop()
+
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            break
+
+        if len(data) >= executor_threshold:
+            records = await loop.run_in_executor(executor, parser.feed, data)
+        else:
+            records = parser.feed(data)
+
+        for record in records:
+            yield record
+
+    for record in parser.close():
+        yield record
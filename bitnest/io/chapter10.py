@@ -0,0 +1,160 @@
+"""
+Streaming reader for IRIG 106 Chapter 10 recordings
+
+The file is memory mapped and packets are found by following the
+packet length within each 24 byte packet header. Packet data is
+handed out as `memoryview` slices of the mapping so nothing is copied
+and only the pages being parsed are resident.
+
+https://www.irig106.org/docs/106-07/chapter10.pdf
+
+"""
+import collections
+import mmap
+import struct
+from typing import Iterator
+
+from bitnest.backend.bitreader import DecodeError
+from bitnest.backend.python import compile_decoder
+
+PACKET_SYNC_PATTERN = 0xEB25
+MILSTD_1553_FORMAT_1 = 0x19
+
+# sync pattern, channel id, packet length, data length, data type
+# version, sequence number, packet flags, data type, relative time
+# counter, header checksum
+PACKET_HEADER = struct.Struct("<HHIIBBBB6sH")
+SECONDARY_HEADER_SIZE = 12
+SECONDARY_HEADER_FLAG = 0x80
+
+Packet = collections.namedtuple(
+    "Packet",
+    [
+        "offset",
+        "channel_id",
+        "data_type",
+        "sequence_number",
+        "flags",
+        "relative_time",
+        "data",
+    ],
+)
+Packet.__doc__ = """Chapter 10 packet where data is a memoryview of the
+channel specific data word and the data that follows"""
+
+
+class Chapter10Reader:
+    """Iterate over the packets of a Chapter 10 file
+
+    Packets hold memoryview slices of the memory mapped file. The
+    mapping is closed with the reader unless slices are still
+    referenced in which case it is closed once they are released.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # packets which could not be decoded, see `decode`
+        self.skipped = 0
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files cannot be mapped
+            self._mmap = None
+        else:
+            if hasattr(self._mmap, "madvise"):
+                self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._mmap if self._mmap is not None else b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:  # packets still reference the mapping
+                pass
+        self._file.close()
+
+    def __iter__(self) -> Iterator[Packet]:
+        return self.packets()
+
+    def packets(self, data_types=None, start=0, stop=None) -> Iterator[Packet]:
+        """Packets in file order optionally filtered by data type
+
+        start and stop restrict packets to a range of the file where
+        start must be the offset of a packet.
+
+        """
+        view = self._view
+        size = len(view)
+        stop = size if stop is None else stop
+        offset = start
+        while offset < stop and offset + PACKET_HEADER.size <= size:
+            (
+                sync_pattern,
+                channel_id,
+                packet_length,
+                data_length,
+                _version,
+                sequence_number,
+                flags,
+                data_type,
+                relative_time,
+                _checksum,
+            ) = PACKET_HEADER.unpack_from(view, offset)
+
+            if sync_pattern != PACKET_SYNC_PATTERN:
+                raise ValueError(f"missing packet sync pattern at offset={offset}")
+            elif packet_length < PACKET_HEADER.size or offset + packet_length > size:
+                raise ValueError(
+                    f"invalid packet length={packet_length} at offset={offset}"
+                )
+
+            if data_types is None or data_type in data_types:
+                start = offset + PACKET_HEADER.size
+                if flags & SECONDARY_HEADER_FLAG:
+                    start = start + SECONDARY_HEADER_SIZE
+                yield Packet(
+                    offset,
+                    channel_id,
+                    data_type,
+                    sequence_number,
+                    flags,
+                    int.from_bytes(relative_time, "little"),
+                    view[start : start + data_length],
+                )
+            offset = offset + packet_length
+
+    def decode(
+        self,
+        struct,
+        data_type=MILSTD_1553_FORMAT_1,
+        payload_views=False,
+        start=0,
+        stop=None,
+    ):
+        """(packet, record) for each packet of `data_type` decoded as
+        `struct`, e.g. `models.chapter10.MILSTD_1553_Data_Packet_Format_1`
+
+        Packets matching no datatype of struct or ending before it are
+        skipped and counted by `skipped`. With payload_views `bits`
+        fields are memoryviews of the file. See `packets` for start
+        and stop.
+
+        """
+        decoder = compile_decoder(
+            struct, bits_format="bytes", payload_views=payload_views
+        )
+        for packet in self.packets(data_types={data_type}, start=start, stop=stop):
+            try:
+                record = decoder(packet.data)
+            except DecodeError:
+                self.skipped = self.skipped + 1
+                continue
+            yield packet, record
@@ -0,0 +1,110 @@
+"""
+Parallel decoding of Chapter 10 recordings across processes
+
+A framing pre-scan follows the packet lengths within the packet
+headers to split the file into chunks at packet boundaries. Chunks
+are decoded by a `ProcessPoolExecutor` where each worker memory maps
+the file and compiles the decoder once. Results are yielded in file
+order while a bounded number of chunks are in flight.
+
+"""
+import collections
+import concurrent.futures
+import itertools
+import os
+from typing import Callable, Iterator, List, Tuple
+
+from bitnest.backend.python import compile_decoder
+from bitnest.io.chapter10 import Chapter10Reader, MILSTD_1553_FORMAT_1
+
+DEFAULT_CHUNK_SIZE = 64 * 2 ** 20
+
+# path -> reader held by each worker process
+_readers = {}
+
+
+def scan_chunks(path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """(start, stop) byte ranges of at least `chunk_size` bytes, except
+    the last, starting and ending at packet boundaries
+
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with Chapter10Reader(path) as reader:
+        for packet in reader.packets():
+            if packet.offset - start >= chunk_size:
+                chunks.append((start, packet.offset))
+                start = packet.offset
+    if start < size or not chunks:
+        chunks.append((start, size))
+    return chunks
+
+
+def packet_record(packet, record):
+    """Default result for each decoded packet"""
+    return packet.offset, record
+
+
+def _decode_chunk(path, start, stop, struct, data_type, function):
+    """Results of the packets of a chunk and the number of skipped packets"""
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = Chapter10Reader(path)
+    skipped = reader.skipped
+    results = [
+        function(packet, record)
+        for packet, record in reader.decode(
+            struct, data_type=data_type, start=start, stop=stop
+        )
+    ]
+    return results, reader.skipped - skipped
+
+
+def _initialize(struct):
+    compile_decoder(struct, bits_format="bytes")
+
+
+def decode_file(
+    path,
+    struct,
+    data_type: int = MILSTD_1553_FORMAT_1,
+    function: Callable = packet_record,
+    max_workers: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    skipped: Callable[[int], None] = None,
+) -> Iterator:
+    """Decode all packets of `data_type` with `struct`, see
+    `Chapter10Reader.decode`, yielding `function(packet, record)` in
+    file order
+
+    function runs within the workers and must be picklable as must
+    its results. The default yields (packet offset, record). skipped
+    is called with the number of packets of each chunk which could
+    not be decoded.
+
+    """
+    path = os.fspath(path)
+    chunks = scan_chunks(path, chunk_size)
+    max_workers = max_workers or os.cpu_count()
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_initialize, initargs=(struct,)
+    ) as executor:
+
+        def submit(chunk):
+            start, stop = chunk
+            return executor.submit(
+                _decode_chunk, path, start, stop, struct, data_type, function
+            )
+
+        chunks = iter(chunks)
+        pending = collections.deque(
+            submit(_) for _ in itertools.islice(chunks, 2 * max_workers)
+        )
+        while pending:
+            results, count = pending.popleft().result()
+            pending.extend(submit(_) for _ in itertools.islice(chunks, 1))
+            if skipped is not None and count:
+                skipped(count)
+            yield from results
@@ -0,0 +1,114 @@
+"""
+Incremental decoding of messages received in arbitrary chunks
+
+Chunks are appended to a single buffer and complete messages are
+decoded in place from a memoryview of it. Only the unconsumed tail is
+kept. A message that is not yet complete is classified once as far
+as the buffered bytes allow and the parser remembers how many bytes
+it is waiting for, so small chunks do not rescan the buffer.
+
+"""
+from typing import List
+
+from bitnest.backend.bitreader import DecodeError
+from bitnest.backend.python import compile_extractors, compile_sizers
+
+
+class PushParser:
+    """Decode a stream of messages of a `Struct` fed in chunks
+
+    Each message starts on a byte boundary and is the first datatype,
+    in the order of `compile_parser`, whose conditions hold. Sizes of
+    datatypes are found with `compile_sizers` so vectors whose length
+    is given by a field, e.g. `number_of_words`, are measured before
+    the whole message has arrived.
+
+    A datatype is only ruled out once enough bytes are buffered to
+    evaluate its conditions, so a short message may wait for bytes of
+    the following message. `close` decodes such messages at the end
+    of the stream.
+
+    """
+
+    def __init__(self, struct, payload_views: bool = False):
+        self.struct = struct
+        self.payload_views = payload_views
+        self._sizers = compile_sizers(struct, bits_format="bytes")
+        self._extractors = compile_extractors(
+            struct, bits_format="bytes", payload_views=payload_views
+        )
+        self._buffer = bytearray()
+        # first datatype which may match the message at the start of
+        # the buffer and the bytes required to continue
+        self._datatype = 0
+        self._required = 1
+
+    @property
+    def pending(self) -> int:
+        """Number of bytes buffered which are not yet decoded"""
+        return len(self._buffer)
+
+    def feed(self, data) -> List:
+        """Buffer data and return the records of all complete messages"""
+        self._buffer += data
+        if len(self._buffer) < self._required:
+            return []
+        return self._decode(final=False)
+
+    def close(self) -> List:
+        """Return the records of the buffered messages at the end of the
+        stream, raising `ValueError` for a truncated message
+
+        """
+        records = self._decode(final=True)
+        if self._buffer:
+            raise ValueError(
+                f"stream ended within a message, {len(self._buffer)} bytes pending"
+            )
+        return records
+
+    def _decode(self, final: bool) -> List:
+        buffer = self._buffer
+        records = []
+        offset = 0
+        try:
+            with memoryview(buffer) as view:
+                while offset < len(buffer):
+                    size = self._measure(view[offset:], final)
+                    if size is None:
+                        break
+
+                    with view[offset : offset + size] as message:
+                        if self.payload_views:
+                            # views must not pin the buffer which is resized
+                            message = bytes(message)
+                        records.append(self._extractors[self._datatype](message))
+                    offset = offset + size
+                    self._datatype, self._required = 0, 1
+        finally:
+            del buffer[:offset]
+        return records
+
+    def _measure(self, bits: memoryview, final: bool):
+        """Size in bytes of the message at the start of bits or None when
+        more bytes are required
+
+        """
+        available = len(bits)
+        try:
+            for i in range(self._datatype, len(self._sizers)):
+                size = self._sizers[i](bits, available * 8)
+                if size < 0 and final:
+                    continue  # the message cannot extend past the stream
+                elif size < 0:
+                    self._datatype, self._required = i, (7 - size) // 8
+                    return None
+                elif size:
+                    self._datatype, self._required = i, (size + 7) // 8
+                    return None if self._required > available else self._required
+        finally:
+            bits.release()
+
+        if final:
+            return None
+        raise DecodeError(f"no datatype of struct={self.struct.name} matches")
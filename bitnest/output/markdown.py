@@ -1,11 +1,21 @@
 import textwrap
 import base64
 
-from bitnest.core import Symbol, Expression
+from bitnest.core import Expression, FIELD, STRUCT, UNION, VECTOR
+from bitnest.pipeline import Pipeline
 
 # from bitnest.core import realize_paths, realize_offsets
 import bitnest.output.visualize
 
+REALIZE = Pipeline(
+    [
+        "realize_datatypes",
+        "realize_conditions",
+        "realize_offsets",
+        "arithmetic_simplify",
+    ]
+)
+
 
 def markdown_table(header, rows):
     column_length = [len(_) for _ in rows]
@@ -66,9 +76,9 @@ def datatype_table_html(fields, regions):
             current_column = start
 
         expression = Expression(regions[position])
-        if expression.symbol == Symbol("vector"):
+        if expression.symbol == VECTOR:
             row_string += f'<td colspan="{end - start}">vector</td>'
-        elif expression.symbol == Symbol("struct"):
+        elif expression.symbol == STRUCT:
             row_string += f'<td colspan="{end - start}">{expression.name}</td>'
 
         current_column = end
@@ -125,7 +135,7 @@ def markdown_struct(struct):
 
     for field in struct.fields[1:]:
         field = Expression(field)
-        if field.symbol == Symbol("field"):
+        if field.symbol == FIELD:
             rows.append(
                 [
                     field.name,
@@ -134,11 +144,11 @@ def markdown_struct(struct):
                     field.additional.get("help", ""),
                 ]
             )
-        elif field.symbol == Symbol("vector"):
+        elif field.symbol == VECTOR:
             rows.append(["", "vector", "", markdown_section_link(field.struct[1])])
-        elif field.symbol == Symbol("struct"):
+        elif field.symbol == STRUCT:
             rows.append([field.name, "", "", markdown_section_link(field.name)])
-        elif field.symbol == Symbol("union"):
+        elif field.symbol == UNION:
             symbol, *structs = field.expression
             rows.append(
                 [
@@ -178,23 +188,14 @@ def markdown(root_struct, visualize=True, realize=True):
         )
 
     visited_structs = set()
-    for struct in root_struct.expression().find_symbol(
-        Symbol("struct"), order="pre_order"
-    ):
+    for struct in root_struct.expression().find_symbol(STRUCT, order="pre_order"):
         struct = Expression(struct)
         if struct.name not in visited_structs:
             text += markdown_struct(struct)
             visited_structs.add(struct.name)
 
     if realize:
-        datatypes = (
-            root_struct.expression()
-            .transform("realize_datatypes")
-            .transform("realize_conditions")
-            .transform("realize_offsets")
-            .transform("arithmetic_simplify")
-            .analysis("inspect_datatypes")
-        )
+        datatypes = REALIZE(root_struct.expression()).analysis("inspect_datatypes")
         text += "\n# Realized Structures\n"
         for i, (datatype, fields, conditions, regions) in enumerate(datatypes, start=1):
             html_table = datatype_table_html(fields, regions)
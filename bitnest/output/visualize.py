@@ -1,6 +1,6 @@
 import graphviz
 
-from bitnest.core import Symbol, Expression
+from bitnest.core import Expression, FIELD, STRUCT, UNION, VECTOR
 
 
 def node_label(struct):
@@ -25,15 +25,15 @@ def node_label(struct):
 
     for i, field in enumerate(struct.fields[1:], start=1):
         field = Expression(field)
-        if field.symbol == Symbol("field"):
+        if field.symbol == FIELD:
             rows.append(field_format.format(field.name, field.field_type, field.size))
-        elif field.symbol == Symbol("vector"):
+        elif field.symbol == VECTOR:
             rows.append(struct_format.format(i, field.struct[1]))
             edges.add((f"{struct.name}:{i}", field.struct[1] + ":0"))
-        elif field.symbol == Symbol("struct"):
+        elif field.symbol == STRUCT:
             rows.append(struct_format.format(i, field.name))
             edges.add((f"{struct.name}:{i}", field.name + ":0"))
-        elif field.symbol == Symbol("union"):
+        elif field.symbol == UNION:
             symbol, *structs = field.expression
             rows.append(struct_format.format(i, "union"))
             for _struct in structs:
@@ -49,9 +49,7 @@ def visualize(root_struct):
     visited_nodes = set()
     visited_edges = set()
 
-    for struct in root_struct.expression().find_symbol(
-        Symbol("struct"), order="pre_order"
-    ):
+    for struct in root_struct.expression().find_symbol(STRUCT, order="pre_order"):
         if struct.name not in visited_nodes:
             node, edges = node_label(struct)
             graph.node(*node)
@@ -0,0 +1,258 @@
+"""
+Pass manager fusing node level transforms into single traversals
+
+A transform module `bitnest.transform.<name>` may define
+`<name>_rule(**kwargs)` returning a fresh `Rule`. Consecutive
+transforms with rules run in one traversal where every node is
+passed through the rules in order, other transforms and `BARRIER`
+run on their own:
+
+    realize = Pipeline(
+        ["realize_datatypes", "realize_conditions", "realize_offsets"]
+    )
+    datatypes = realize(MILSTD_1553_Message.expression())
+
+walks the realized datatypes once for both `realize_conditions` and
+`realize_offsets`. Within a fused traversal
+
+- children a rule adds before traversing the children of a node are
+  only traversed by the following rules, as they would be when
+  running the transforms one after another
+- rules after the children of a node see the children as replaced by
+  all rules and the node as replaced by the preceding rules
+- children a rule adds after traversing the children of a node, e.g.
+  the size of a vector, are traversed by the following rules in a
+  separate traversal so those rules must not depend on the order
+  nodes are visited in and should be idempotent
+
+Transforms which do not hold under these conditions must be
+separated by a `BARRIER`.
+
+"""
+import collections
+import importlib
+from typing import List
+
+from bitnest import core
+from bitnest.core import Expression, is_stream, unchanged, QUOTE
+
+BARRIER = object()
+
+Rule = collections.namedtuple(
+    "Rule", ["replacement_functions", "replacement_mapping"], defaults=[{}, {}]
+)
+Rule.__doc__ = """Node level transform keyed by symbol
+
+replacement_functions[symbol](symbol, args) are generators with the
+protocol of `replace_nodes` replacing nodes before and after their
+children while replacement_mapping[symbol](symbol, args) replaces
+nodes after their children as `replace_mapping` does and must only
+depend on its arguments. Nodes with other symbols are left to the
+following rules."""
+
+
+def fused_replace(node, rules: List[Rule], start: int = 0):
+    """Traverse node once replacing each node by `rules[start:]` in order
+
+    Traversal is copy-on-write with an explicit stack of frames
+    [original node, node, next child index, replaced children or None
+    while unchanged, generators by rule index, index of the first
+    rule of each added child, first rule, outputs] where outputs keep
+    the nodes returned by each rule alive so the ids of added children
+    are unique. Nodes whose children are unchanged are returned by
+    identity and `quote` nodes are never traversed. Mappings are pure
+    so nodes left to mappings alone are replaced once per traversal.
+
+    """
+    count = len(rules)
+    functions = [_.replacement_functions for _ in rules]
+    mappings = [_.replacement_mapping for _ in rules]
+    # symbols with functions and symbols with any replacement within rules[i:]
+    entering = [set().union(*functions[i:]) for i in range(count)]
+    leaving = [entering[i].union(*mappings[i:]) for i in range(count)]
+
+    def enter(original, start):
+        node = original
+        symbol = node[0]
+        generators = starts = outputs = None
+        if symbol not in entering[start]:
+            return [original, node, 1, None, None, None, start, None]
+        for i in range(start, count):
+            function = functions[i].get(symbol)
+            if function is None:
+                continue
+            generator = function(symbol, node[1:])
+            output = generator.send(None)
+            if generators is None:
+                generators = {}
+            generators[i] = generator
+            if output is not node:
+                inputs = {id(_) for _ in node[1:]}
+                for child in output[1:]:
+                    if isinstance(child, tuple) and id(child) not in inputs:
+                        if starts is None:
+                            starts, outputs = {}, []
+                        starts.setdefault(id(child), i + 1)
+                if outputs is not None:
+                    outputs.append(output)
+                node = output
+                symbol = node[0]
+        return [original, node, 1, None, generators, starts, start, outputs]
+
+    def leave(frame):
+        original, node, _, args, generators, _, start, _ = frame
+        symbol = node[0]
+        if generators is None and symbol not in leaving[start]:
+            return node if args is None else (symbol, *args)
+
+        result = node
+        for i in range(start, count):
+            if generators is not None and i in generators:
+                if args is None:
+                    args = list(node[1:])
+                output = generators[i].send((symbol, args))
+            elif symbol in mappings[i]:
+                if args is None:
+                    args = list(node[1:])
+                output = mappings[i][symbol](symbol, args)
+            else:
+                continue
+            if type(output) is not tuple:
+                return output  # leaves are not passed to the following rules
+            if i + 1 < count:
+                # children added after traversal by the following rules
+                inputs = {id(_) for _ in args}
+                output = unchanged(
+                    tuple(
+                        fused_replace(_, rules, i + 1)
+                        if isinstance(_, tuple) and id(_) not in inputs
+                        else _
+                        for _ in output
+                    ),
+                    output,
+                )
+            node = result = output
+            symbol, args = node[0], None
+        if result is frame[1] and args is not None:
+            result = (symbol, *args)
+        result = unchanged(result, frame[1])
+        if frame[1] is not original:
+            result = unchanged(result, original)
+        return result
+
+    if start >= count or node[0] is QUOTE:
+        return node
+    # id(node) -> (node, result) of nodes replaced by mappings alone
+    memo = {}
+    stack = [enter(node, start)]
+    visited = 1
+
+    while True:
+        frame = stack[-1]
+        _, node, index, args, _, starts, _start, _ = frame
+        length = len(node)
+        while index < length:
+            arg = node[index]
+            index += 1
+            if isinstance(arg, tuple) and arg[0] is not QUOTE:
+                child_start = _start
+                if starts is not None:
+                    child_start = starts.get(id(arg), _start)
+                if child_start < count:
+                    entry = memo.get(id(arg))
+                    if entry is None:
+                        visited += 1
+                        frame[2], frame[3] = index, args
+                        stack.append(enter(arg, child_start))
+                        break
+                    if entry[1] is not arg and args is None:
+                        args = list(node[1 : index - 1])
+                    arg = entry[1]
+            if args is not None:
+                args.append(arg)
+        else:
+            frame[3] = args
+            stack.pop()
+            result = leave(frame)
+            if not entering[frame[6]]:
+                memo[id(frame[0])] = (frame[0], result)
+            if not stack:
+                core._nodes_visited += visited
+                return result
+
+            parent = stack[-1]
+            child = parent[1][parent[2] - 1]
+            if result is not child and parent[3] is None:
+                parent[3] = list(parent[1][1 : parent[2] - 1])
+            if parent[3] is not None:
+                parent[3].append(result)
+
+
+class Pipeline:
+    """Sequence of transforms given by name, (name, kwargs) or
+    `BARRIER` run with as few traversals as possible
+
+    Transforms run alone are run through `Expression.transform`,
+    fused transforms are reported to `core.pass_runner` as a single
+    transform named by joining their names with "+".
+
+    """
+
+    def __init__(self, passes: List):
+        # [(name, kwargs, rule or None)] of each traversal
+        self.stages = []
+        group = []
+        for _pass in passes:
+            if _pass is BARRIER:
+                self._close(group)
+                continue
+            name, kwargs = (_pass, {}) if isinstance(_pass, str) else _pass
+            module = importlib.import_module(f"bitnest.transform.{name}")
+            rule = getattr(module, f"{name}_rule", None)
+            if rule is None:
+                self._close(group)
+                self.stages.append([(name, kwargs, None)])
+            else:
+                group.append((name, kwargs, rule))
+        self._close(group)
+
+    def _close(self, group):
+        if group:
+            self.stages.append(list(group))
+            group.clear()
+
+    @property
+    def names(self) -> List[str]:
+        """Name of each traversal"""
+        return ["+".join(_[0] for _ in stage) for stage in self.stages]
+
+    def __call__(self, expression):
+        for stage in self.stages:
+            if len(stage) == 1:
+                name, kwargs, _ = stage[0]
+                if is_stream(expression):
+                    module = importlib.import_module(f"bitnest.transform.{name}")
+                    expression = getattr(module, name)(expression, **kwargs)
+                else:
+                    expression = Expression(expression).transform(name, **kwargs)
+            elif is_stream(expression):
+                expression = (_fused(_, stage) for _ in expression)
+            elif core.pass_runner is not None:
+                expression = core.pass_runner(
+                    "transform",
+                    "+".join(_[0] for _ in stage),
+                    _fused,
+                    Expression(expression),
+                    (stage,),
+                    {},
+                )
+            else:
+                expression = _fused(expression, stage)
+        return expression
+
+
+def _fused(expression, stage) -> Expression:
+    rules = [rule(**kwargs) for _, kwargs, rule in stage]
+    _expression = Expression(expression)
+    _expression.expression = fused_replace(_expression.expression, rules)
+    return _expression
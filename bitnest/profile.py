@@ -0,0 +1,195 @@
+"""
+Instrumentation of transformation, analysis and backend passes
+
+Hooks registered with `add_hook` receive a `PassProfile` after every
+pass run through `Expression.transform`, `.analysis` or `.backend`.
+`Profiler` collects them into a report:
+
+    with Profiler() as profiler:
+        compile_parser(MILSTD_1553_Message)
+    print(profiler.format())
+
+Passes called by other passes are nested within them and their
+numbers are included in those of the calling pass. Without hooks
+passes run without any instrumentation.
+
+"""
+import collections
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from bitnest import core
+from bitnest.core import Expression, walk_nodes, DATATYPE
+
+PassProfile = collections.namedtuple(
+    "PassProfile",
+    [
+        "kind",
+        "name",
+        "depth",
+        "seconds",
+        "nodes_visited",
+        "nodes_allocated",
+        "peak_memory",
+        "input_datatypes",
+        "output_datatypes",
+    ],
+)
+PassProfile.__doc__ = """Numbers of a pass, `kind` is "transform", "analysis" or
+"backend" and `depth` the number of enclosing passes. nodes_visited
+counts nodes traversed by `replace_nodes` and `replace_mapping`,
+nodes_allocated the nodes of the output not within the input and
+peak_memory the peak traced memory in bytes above that at the start
+of the pass. Numbers which do not apply, e.g. peak_memory without
+tracemalloc tracing or node counts of outputs which are not
+expressions, are None."""
+
+_hooks: List[Callable] = []
+# [peak traced memory before and within finished children] of each
+# running pass, children reset the peak when they start
+_running: List[List[int]] = []
+
+
+def add_hook(hook: Callable[[PassProfile], None]):
+    """Call hook with the `PassProfile` of every following pass"""
+    _hooks.append(hook)
+    core.pass_runner = _run
+
+
+def remove_hook(hook: Callable[[PassProfile], None]):
+    _hooks.remove(hook)
+    if not _hooks:
+        core.pass_runner = None
+
+
+def _nodes(value):
+    if isinstance(value, Expression):
+        value = value.expression
+    if isinstance(value, tuple):
+        return list(walk_nodes(value))
+    return None
+
+
+def _datatypes(nodes):
+    return None if nodes is None else sum(1 for _ in nodes if _[0] == DATATYPE)
+
+
+def _run(kind, name, function, expression, args, kwargs):
+    input_nodes = _nodes(expression)
+    tracing = tracemalloc.is_tracing()
+    depth = len(_running)
+    if tracing:
+        start_memory, peak = tracemalloc.get_traced_memory()
+        if _running:
+            _running[-1][0] = max(_running[-1][0], peak)
+        tracemalloc.reset_peak()
+    frame = [0]
+    _running.append(frame)
+    visited = core.nodes_visited()
+
+    start = time.perf_counter()
+    try:
+        result = function(expression, *args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _running.pop()
+
+    peak_memory = None
+    if tracing:
+        peak = max(tracemalloc.get_traced_memory()[1], frame[0])
+        peak_memory = peak - start_memory
+        if _running:
+            _running[-1][0] = max(_running[-1][0], peak)
+    visited = core.nodes_visited() - visited
+
+    output_nodes = _nodes(result)
+    allocated = None
+    if input_nodes is not None and output_nodes is not None:
+        existing = {id(_) for _ in input_nodes}
+        allocated = sum(1 for _ in output_nodes if id(_) not in existing)
+
+    profile = PassProfile(
+        kind,
+        name,
+        depth,
+        seconds,
+        visited,
+        allocated,
+        peak_memory,
+        _datatypes(input_nodes),
+        _datatypes(output_nodes),
+    )
+    for hook in list(_hooks):
+        hook(profile)
+    return result
+
+
+class Profiler:
+    """Collect the `PassProfile` of every pass run within a with block
+
+    With memory, tracemalloc traces allocations within the block
+    unless it is already tracing. Tracing slows passes down
+    considerably so compare times of profiles with the same setting.
+
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.profiles: List[PassProfile] = []
+        self._tracing = False
+
+    def __enter__(self):
+        self._tracing = self.memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        add_hook(self.profiles.append)
+        return self
+
+    def __exit__(self, *args):
+        remove_hook(self.profiles.append)
+        if self._tracing:
+            tracemalloc.stop()
+
+    def report(self) -> List[Dict]:
+        """Profiles as dictionaries in order of completion, nested
+        passes precede the pass calling them
+
+        """
+        return [_._asdict() for _ in self.profiles]
+
+    def format(self) -> str:
+        """Table of profiles with nested passes indented below the pass
+        calling them
+
+        """
+        # profiles complete after the passes they call
+        pending = collections.defaultdict(list)
+        for profile in self.profiles:
+            children = pending.pop(profile.depth + 1, [])
+            pending[profile.depth].append((profile, children))
+
+        def optional(value):
+            return "-" if value is None else value
+
+        lines = [
+            f"{'pass':<40} {'ms':>10} {'visited':>9} {'allocated':>9} "
+            f"{'peak KiB':>9} {'datatypes':>11}"
+        ]
+        stack = [(0, _) for _ in reversed(pending[min(pending, default=0)])]
+        while stack:
+            indent, (profile, children) = stack.pop()
+            name = " " * indent + f"{profile.kind}.{profile.name}"
+            peak = profile.peak_memory
+            datatypes = (
+                f"{optional(profile.input_datatypes)}->"
+                f"{optional(profile.output_datatypes)}"
+            )
+            lines.append(
+                f"{name:<40} {profile.seconds * 1e3:>10.3f} "
+                f"{profile.nodes_visited:>9} {optional(profile.nodes_allocated):>9} "
+                f"{optional(None if peak is None else round(peak / 2 ** 10, 1)):>9} "
+                f"{datatypes:>11}"
+            )
+            stack.extend((indent + 2, _) for _ in reversed(children))
+        return "\n".join(lines)
@@ -0,0 +1,52 @@
+"""Records holding decoded field values
+
+A record is a named tuple with one attribute for each field of a
+struct in order. Nested structs are records themselves and vectors
+are lists of records. Names are made valid identifiers and repeated
+names are numbered, e.g. `reserved`, `reserved_1`.
+
+Record types are created at runtime so records pickle by their name
+and field names, which finds or recreates the type when unpickled.
+
+"""
+import collections
+import functools
+import keyword
+import re
+from typing import List, Tuple
+
+
+def identifier(name: str) -> str:
+    """Valid python identifier for a field or struct name"""
+    name = re.sub(r"\W", "_", name)
+    if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_"):
+        name = f"field_{name}"
+    return name
+
+
+def record_field_names(names: List[str]) -> Tuple[str]:
+    field_names = []
+    for name in map(identifier, names):
+        _name, count = name, 0
+        while _name in field_names:
+            count = count + 1
+            _name = f"{name}_{count}"
+        field_names.append(_name)
+    return tuple(field_names)
+
+
+def _rebuild_record(name: str, field_names: Tuple[str], values: Tuple):
+    return tuple.__new__(record_type(name, field_names), values)
+
+
+def _reduce_record(record):
+    return (_rebuild_record, (record._name, record._fields, tuple(record)))
+
+
+@functools.lru_cache(maxsize=None)
+def record_type(name: str, field_names: Tuple[str]) -> type:
+    """Record class for a struct, shared by structs of the same shape"""
+    record = collections.namedtuple(identifier(name), field_names, module=__name__)
+    record._name = name
+    record.__reduce__ = _reduce_record
+    return record
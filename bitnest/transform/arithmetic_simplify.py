@@ -2,30 +2,53 @@
 Transformation to simplify arithmetic expressions within AST
 
 """
-from bitnest.core import Expression, Symbol, Integer, Float
+import functools
+import operator
+
+from bitnest.core import (
+    Expression,
+    Integer,
+    Float,
+    is_stream,
+    ADD,
+    BIT_AND,
+    BIT_OR,
+    FLOAT,
+    FLOORDIV,
+    INTEGER,
+    LSHIFT,
+    MOD,
+    MUL,
+    RSHIFT,
+    SUB,
+)
+from bitnest.pipeline import Rule, fused_replace
 
 
 def simplify_add(symbol, args):
     # expand (+ (+ _1 ...) _2 ...) -> (+ _1 ... _2 ...)
     _args = []
     for arg in args:
-        if isinstance(arg, tuple) and arg[0] == Symbol("add"):
+        if isinstance(arg, tuple) and arg[0] == ADD:
             _args.extend(arg[1:])
         else:
             _args.append(arg)
 
     # simplify (+ _1 _2 (integer 3) (integer 4)) -> (+ _1 _2 (integer 7))
     __args = []
+    constants = []
     accumulator = 0
     for arg in _args:
-        if isinstance(arg, tuple) and arg[0] == Symbol("integer"):
-            accumulator += arg[1]
-        elif isinstance(arg, tuple) and arg[0] == Symbol("float"):
+        if isinstance(arg, tuple) and arg[0] in (INTEGER, FLOAT):
             accumulator += arg[1]
+            constants.append(arg)
         else:
             __args.append(arg)
 
-    if accumulator != 0:
+    if len(constants) == 1 and accumulator != 0:
+        # already folded, reuse the node so unchanged trees are kept
+        __args.append(constants[0])
+    elif accumulator != 0:
         if isinstance(accumulator, int):
             __args.append(Integer(accumulator).expression)
         else:  # float
@@ -38,14 +61,53 @@ def simplify_add(symbol, args):
     return (symbol, *__args)
 
 
+CONSTANT_OPERATIONS = {
+    SUB: operator.sub,
+    MUL: operator.mul,
+    FLOORDIV: operator.floordiv,
+    MOD: operator.mod,
+    BIT_AND: operator.and_,
+    BIT_OR: operator.or_,
+    LSHIFT: operator.lshift,
+    RSHIFT: operator.rshift,
+}
+
+
+def simplify_constant(symbol, args):
+    # drop shifts by zero (>> _1 (integer 0)) -> _1
+    if symbol in (LSHIFT, RSHIFT) and args[1] == (INTEGER, 0):
+        return args[0]
+
+    # fold (// (integer 147) (integer 8)) -> (integer 18)
+    if not all(isinstance(arg, tuple) and arg[0] == INTEGER for arg in args):
+        return (symbol, *args)
+    try:
+        value = functools.reduce(CONSTANT_OPERATIONS[symbol], [arg[1] for arg in args])
+    except ZeroDivisionError:  # left for the generated code to raise
+        return (symbol, *args)
+    return Integer(value).expression
+
+
 DEFAULT_SIMPLIFY_MAPPING = {
-    Symbol("add"): simplify_add,
+    ADD: simplify_add,
+    **{symbol: simplify_constant for symbol in CONSTANT_OPERATIONS},
 }
 
 
+def arithmetic_simplify_rule(simplify_mapping=DEFAULT_SIMPLIFY_MAPPING) -> Rule:
+    """Rule simplifying arithmetic, see `bitnest.pipeline`"""
+    return Rule(replacement_mapping=simplify_mapping)
+
+
 def arithmetic_simplify(
     expression: Expression, simplify_mapping=DEFAULT_SIMPLIFY_MAPPING
 ) -> Expression:
+    if is_stream(expression):
+        return (arithmetic_simplify(_, simplify_mapping) for _ in expression)
+
+    # shared subtrees, e.g. offsets, are simplified once
     _expression = Expression(expression)
-    _expression.replace(replacement_mapping=simplify_mapping)
+    _expression.expression = fused_replace(
+        _expression.expression, [arithmetic_simplify_rule(simplify_mapping)]
+    )
     return _expression
@@ -0,0 +1,187 @@
+"""
+Transformation generating statements which encode a record of a
+realized datatype into a bytearray
+
+"""
+import enum
+import itertools
+
+from bitnest.core import (
+    Expression,
+    Integer,
+    Variable,
+    assign,
+    call,
+    for_,
+    if_,
+    item,
+    statements,
+    walk_nodes,
+    BIT_AND,
+    BIT_OR,
+    DATATYPE,
+    EQ,
+    FIELD,
+    FIELD_REFERENCE,
+    INTEGER,
+    LSHIFT,
+    MOD,
+    STRUCT,
+    SUB,
+    VECTOR,
+)
+from bitnest.transform.parser_record import _bind
+
+
+def _integer(value) -> int:
+    """Raw value of enums and bytes like values of bits fields"""
+    if isinstance(value, int):
+        return value
+    elif isinstance(value, enum.Enum):
+        return value.value
+    return int.from_bytes(value, "big")
+
+
+def _write(buffer: bytearray, position: int, value: int, size: int) -> int:
+    """Write `size` bits of value padded to whole bytes at byte
+    `position` of buffer returning the following position
+
+    """
+    length = (size + 7) // 8
+    stop = position + length
+    if stop > len(buffer):
+        raise ValueError(f"buffer of {len(buffer)} bytes is too small")
+    buffer[position:stop] = (value << (-size % 8)).to_bytes(length, "big")
+    return stop
+
+
+def encoder_record(
+    datatype: Expression,
+    record_name: str = "__record",
+    buffer_name: str = "__buffer",
+    position_name: str = "__position",
+    namespace=None,
+) -> Expression:
+    """Generate statements writing the record of a datatype into the
+    bytearray `buffer_name` starting at byte `position_name`
+
+    Records are the tuples of `parser_record` accessed by position so
+    any nested tuples of the same shape may be encoded. Fields are
+    accumulated into a single integer which is written whenever a
+    vector element ends on a byte boundary and at the end of the
+    datatype, padded to whole bytes. Fields given as the length of a
+    vector by a field reference are set to the number of elements of
+    the vector. Values are truncated to the size of their field,
+    conditions of the datatype are not checked. `position_name` is
+    left one past the last byte written.
+
+    """
+    namespace = {} if namespace is None else namespace
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"encoder_record expects a datatype not {_datatype.symbol}")
+
+    buffer = Variable(buffer_name)
+    position = Variable(position_name)
+    value = Variable("__value")
+    size = Variable("__size")
+    to_integer = _bind(namespace, "__integer_", _integer)
+    write = _bind(namespace, "__write_", _write)
+    counter = itertools.count()
+
+    # record and element variable of each vector
+    vectors = {}
+
+    def locate(node, access):
+        if node[0] == STRUCT:
+            for i, _node in enumerate(node[2][1:]):
+                locate(_node, item(access, Integer(i)))
+        elif node[0] == VECTOR:
+            element = Variable(f"__element_{next(counter)}")
+            vectors[id(node)] = (access, element)
+            locate(node[1], element)
+
+    locate(_datatype.expression[1], Variable(record_name))
+
+    # field id -> vector whose length the field holds
+    length_fields = {}
+    for node in walk_nodes(_datatype.expression):
+        if node[0] == VECTOR and Expression(node[2]).symbol == FIELD_REFERENCE:
+            length_fields.setdefault(node[2][2], node)
+
+    pending = 0
+
+    def accumulate(body):
+        nonlocal pending
+        if pending:
+            body.append(assign(size, Expression(size) + pending))
+            pending = 0
+
+    def write_value(body):
+        body.append(
+            assign(position, call(Variable(write), buffer, position, value, size))
+        )
+
+    def encode(node, access, body):
+        nonlocal pending
+        symbol = node[0]
+        if symbol == FIELD:
+            field_type, field_size, field_id = node[1], node[4], node[5]
+            if field_id in length_fields:
+                access, _ = vectors[id(length_fields[field_id])]
+                raw = call(Variable("len"), access)
+            elif field_type in ("bits", "bits_enum"):
+                raw = call(Variable(to_integer), access)
+            else:
+                raw = Expression(access)
+
+            if Expression(field_size).symbol == INTEGER:
+                mask = Integer(2 ** Expression(field_size).value - 1).expression
+            else:
+                mask = (SUB, (LSHIFT, Integer(1).expression, field_size), (INTEGER, 1))
+            body.append(
+                assign(
+                    value,
+                    Expression(
+                        (
+                            BIT_OR,
+                            (LSHIFT, value.expression, field_size),
+                            (BIT_AND, raw.expression, mask),
+                        )
+                    ),
+                )
+            )
+            if Expression(field_size).symbol == INTEGER:
+                pending = pending + Expression(field_size).value
+            else:
+                accumulate(body)
+                body.append(assign(size, Expression(size) + field_size))
+        elif symbol == STRUCT:
+            for i, _node in enumerate(node[2][1:]):
+                encode(_node, item(access, Integer(i)), body)
+        elif symbol == VECTOR:
+            access, element = vectors[id(node)]
+            accumulate(body)
+            element_body = []
+            encode(node[1], element, element_body)
+            accumulate(element_body)
+            aligned = []
+            write_value(aligned)
+            aligned.extend([assign(value, Integer(0)), assign(size, Integer(0))])
+            element_body.append(
+                if_(
+                    Expression(
+                        (EQ, (MOD, size.expression, (INTEGER, 8)), (INTEGER, 0))
+                    ),
+                    statements(*aligned),
+                )
+            )
+            body.append(for_(element, access, statements(*element_body)))
+        else:
+            raise ValueError(f"cannot encode node with symbol={symbol}")
+
+    body = [assign(value, Integer(0)), assign(size, Integer(0))]
+    encode(_datatype.expression[1], Variable(record_name), body)
+    accumulate(body)
+    write_value(body)
+    return statements(*body)
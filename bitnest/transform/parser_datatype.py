@@ -1,20 +1,265 @@
+import collections
 import functools
 
-from bitnest.core import Expression, Symbol, Variable, if_, assign, statements, Integer
+from bitnest.core import (
+    Expression,
+    Variable,
+    if_,
+    assign,
+    statements,
+    Integer,
+    is_stream,
+    ADD,
+    BIT_AND,
+    BIT_OR,
+    ENUM,
+    EQ,
+    FIELD_REFERENCE,
+    FLOORDIV,
+    FROM_BYTES,
+    INDEX,
+    INTEGER,
+    LOGICAL_AND,
+    LOGICAL_OR,
+    LSHIFT,
+    MOD,
+    NE,
+    NOT,
+    RSHIFT,
+    SUB,
+)
+from bitnest.analysis.inspect_datatypes import inspect_datatypes
+
+
+BITS_FORMATS = {"bits", "int", "bytes"}
+
+
+def bit_extraction(
+    bits: Expression,
+    offset: Expression,
+    size: Expression,
+    bits_format: str = "bits",
+    length: Expression = None,
+) -> Expression:
+    """Unsigned integer value of `size` bits starting at bit `offset`
+
+    bits_format "bits" slices a bit sequence. "int" shifts and masks
+    a single integer holding `length` bits with the first bit most
+    significant. "bytes" converts only the bytes spanning the field
+    of a bytes like buffer (bytes, bytearray, memoryview). With "int"
+    and "bytes" bits past the end of the input read as zeros.
+
+    """
+    bits, offset, size = [Expression(_).expression for _ in (bits, offset, size)]
+    stop = (ADD, offset, size)
+
+    if size[0] == INTEGER:
+        mask = (INTEGER, 2 ** size[1] - 1)
+    else:
+        mask = (SUB, (LSHIFT, (INTEGER, 1), size), (INTEGER, 1))
+
+    if bits_format == "bits":
+        return Expression((INDEX, bits, offset, stop))
+    elif bits_format == "int":
+        # shifting left first keeps both shifts positive for fields
+        # ending past the input, e.g. those tested by other datatypes
+        value = (RSHIFT, (LSHIFT, bits, stop), Expression(length).expression)
+    elif bits_format == "bytes":
+        # bytes [offset // 8, (stop + 7) // 8) hold the field which
+        # ends 7 - (stop + 7) % 8 bits before the last byte boundary
+        byte_stop = (ADD, stop, (INTEGER, 7))
+        value = (
+            RSHIFT,
+            (
+                FROM_BYTES,
+                (
+                    INDEX,
+                    bits,
+                    (FLOORDIV, offset, (INTEGER, 8)),
+                    (FLOORDIV, byte_stop, (INTEGER, 8)),
+                ),
+            ),
+            (SUB, (INTEGER, 7), (MOD, byte_stop, (INTEGER, 8))),
+        )
+    else:
+        raise ValueError(f"unknown bits_format={bits_format}")
+    return Expression((BIT_AND, value, mask))
+
+
+def _constant(node):
+    if isinstance(node, tuple) and node[0] == INTEGER:
+        return node[1]
+    elif isinstance(node, tuple) and node[0] == ENUM:
+        return node[1].value
+    return None
+
+
+def _equality(condition):
+    """Split `(eq operand constant)` into (operand, value) if possible"""
+    if not (isinstance(condition, tuple) and condition[0] == EQ):
+        return None
+    left, right = condition[1:]
+    if _constant(right) is not None:
+        return left, _constant(right)
+    elif _constant(left) is not None:
+        return right, _constant(left)
+    return None
+
+
+def evaluate_condition(condition, known, facts):
+    """Evaluate condition given known test outcomes and known operand
+    values. Returns True/False or None when the outcome is unknown.
+
+    """
+    if condition in known:
+        return known[condition]
+
+    symbol = condition[0]
+    if symbol in (EQ, NE):
+        equality = _equality((EQ, *condition[1:]))
+        if equality is not None and equality[0] in facts:
+            result = facts[equality[0]] == equality[1]
+            return result if symbol == EQ else not result
+    elif symbol == NOT:
+        result = evaluate_condition(condition[1], known, facts)
+        return None if result is None else not result
+    elif symbol in (LOGICAL_AND, LOGICAL_OR):
+        short_circuit = symbol == LOGICAL_OR
+        results = [evaluate_condition(_, known, facts) for _ in condition[1:]]
+        if short_circuit in results:
+            return short_circuit
+        elif None not in results:
+            return not short_circuit
+    return None
+
+
+def _conjuncts(condition):
+    if isinstance(condition, tuple) and condition[0] == LOGICAL_AND:
+        return [_ for arg in condition[1:] for _ in _conjuncts(arg)]
+    return [condition]
+
+
+def _decision_tree(rules, known, facts, datatype_assignment):
+    """Build nested if/else statements classifying each rule
+
+    rules is a list of (datatype index, conditions). At each level
+    the condition shared by the most remaining rules is tested once
+    and its outcome (along with any implied operand value) is
+    propagated to both branches. Only rules with conditions decided
+    by the test are classified within the branches, the others follow
+    the test so that independent conditions do not multiply the
+    branches.
+
+    """
+    _statements = []
+    remaining = []
+    for index, conditions in rules:
+        _conditions = []
+        for condition in conditions:
+            result = evaluate_condition(condition, known, facts)
+            if result is False:
+                break
+            elif result is None:
+                _conditions.append(condition)
+        else:
+            if _conditions:
+                remaining.append((index, _conditions))
+            else:
+                _statements.append(datatype_assignment(index))
+
+    if remaining:
+        counter = collections.Counter(
+            c for _, conditions in remaining for c in conditions
+        )
+        test = max(counter, key=counter.get)
+
+        true_known, false_known = {**known, test: True}, {**known, test: False}
+        true_facts = dict(facts)
+        equality = _equality(test)
+        if equality is not None:
+            true_facts[equality[0]] = equality[1]
+
+        dependent, independent = [], []
+        for rule in remaining:
+            decided = any(
+                evaluate_condition(c, true_known, true_facts) is not None
+                or evaluate_condition(c, false_known, facts) is not None
+                for c in rule[1]
+            )
+            (dependent if decided else independent).append(rule)
+
+        true_branch = _decision_tree(
+            dependent, true_known, true_facts, datatype_assignment
+        )
+        false_branch = _decision_tree(
+            dependent, false_known, facts, datatype_assignment
+        )
+
+        if true_branch and false_branch:
+            _statements.append(
+                if_(test, statements(*true_branch), statements(*false_branch))
+            )
+        elif true_branch:
+            _statements.append(if_(test, statements(*true_branch)))
+        elif false_branch:
+            _statements.append(if_((NOT, test), statements(*false_branch)))
+
+        _statements.extend(
+            _decision_tree(independent, known, facts, datatype_assignment)
+        )
+
+    return _statements
 
 
 def parser_datatype(
     expression: Expression,
     bits_name: str = "__bits",
     datatype_mask_name: str = "__datatype_mask",
+    strategy: str = "sequential",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
 ) -> Expression:
-    _expression = Expression(expression)
+    """Generate statements computing the mask of matching datatypes
+
+    strategy "sequential" emits one `if` per datatype testing all of
+    its conditions. "decision_tree" tests each distinct condition at
+    most once along any path and uses equalities on the same bit
+    slice to rule out contradicting datatypes.
+
+    Fields are read according to `bits_format`, see
+    `bit_extraction`. For "int" the number of bits is read from the
+    variable `length_name`.
+
+    expression may also be a stream of datatypes in which case only
+    the conditions of each datatype are retained.
+
+    """
+    if strategy not in {"sequential", "decision_tree"}:
+        raise ValueError(f"unknown parser_datatype strategy={strategy}")
+    if bits_format not in BITS_FORMATS:
+        raise ValueError(f"unknown bits_format={bits_format}")
 
     _statements = [
         assign(Variable(datatype_mask_name), Integer(0)),
     ]
-    datatypes = _expression.analysis("inspect_datatypes")
+    if is_stream(expression):
+        datatypes = inspect_datatypes(expression)
+    else:
+        datatypes = Expression(expression).analysis("inspect_datatypes")
+
+    def datatype_assignment(i):
+        return assign(
+            Variable(datatype_mask_name),
+            Expression(
+                (
+                    BIT_OR,
+                    Variable(datatype_mask_name),
+                    Integer(2 ** i),
+                )
+            ),
+        )
 
+    rules = []
     for i, (datatype, fields, conditions, regions) in enumerate(datatypes):
         field_mapping = {}
         for field in fields:
@@ -23,18 +268,16 @@ def parser_datatype(
 
         def handle_field_reference(symbol, args, field_mapping):
             name, id = args
-            size = Expression(field_mapping[id].size)
-            offset = Expression(field_mapping[id].offset)
-
-            return (
-                Symbol("index"),
-                Variable(bits_name).expression,
-                offset.expression,
-                (offset + size).expression,
-            )
+            return bit_extraction(
+                Variable(bits_name),
+                field_mapping[id].offset,
+                field_mapping[id].size,
+                bits_format=bits_format,
+                length=Variable(length_name),
+            ).expression
 
         replacement_mapping = {
-            Symbol("field_reference"): functools.partial(
+            FIELD_REFERENCE: functools.partial(
                 handle_field_reference, field_mapping=field_mapping
             )
         }
@@ -47,30 +290,24 @@ def parser_datatype(
             )
             _conditions.append(condition_expression)
 
-        datatype_assignment = assign(
-            Variable(datatype_mask_name),
-            Expression(
-                (
-                    Symbol("bit_or"),
-                    Variable(datatype_mask_name),
-                    Integer(2 ** i),
-                )
-            ),
-        )
-
-        if _conditions:
+        if strategy == "decision_tree":
+            rules.append(
+                (i, [c for _ in _conditions for c in _conjuncts(_.expression)])
+            )
+        elif _conditions:
             _statements.append(
                 if_(
                     functools.reduce(
-                        lambda left, right: Expression(
-                            (Symbol("logical_and"), left, right)
-                        ),
+                        lambda left, right: Expression((LOGICAL_AND, left, right)),
                         _conditions,
                     ),
-                    datatype_assignment,
+                    datatype_assignment(i),
                 )
             )
         else:
-            _statements.append(datatype_assignment)
+            _statements.append(datatype_assignment(i))
+
+    if strategy == "decision_tree":
+        _statements.extend(_decision_tree(rules, {}, {}, datatype_assignment))
 
     return Expression(statements(*_statements))
@@ -0,0 +1,240 @@
+"""
+Transformation generating statements which decode every field of a
+realized datatype with offsets into a record
+
+"""
+import functools
+import itertools
+
+from bitnest.core import (
+    Expression,
+    Integer,
+    Variable,
+    assign,
+    attribute,
+    call,
+    for_,
+    list_,
+    statements,
+    tuple_,
+    walk_nodes,
+    BIT_AND,
+    DATATYPE,
+    EQ,
+    FIELD,
+    FIELD_REFERENCE,
+    INTEGER,
+    LSHIFT,
+    MUL,
+    STRUCT,
+    SUB,
+    VECTOR,
+)
+from bitnest.backend import bitreader
+from bitnest.record import record_field_names, record_type
+from bitnest.transform.parser_datatype import bit_extraction
+from bitnest.transform.parser_size import _end
+
+
+@functools.lru_cache(maxsize=None)
+def _enum_lookup(mapping):
+    return {_.value: _ for _ in mapping}.get
+
+
+@functools.lru_cache(maxsize=None)
+def _record_constructor(record):
+    # avoids the python level __new__ of named tuples
+    return functools.partial(tuple.__new__, record)
+
+
+def _bind(namespace, prefix, value):
+    """Name bound to value within namespace, binding it if needed"""
+    for name, _value in namespace.items():
+        if _value is value and name.startswith(prefix):
+            return name
+    name = f"{prefix}{len(namespace)}"
+    namespace[name] = value
+    return name
+
+
+def _name(node):
+    if node[0] == VECTOR:
+        return node[1][1]
+    elif node[0] == STRUCT:
+        return node[1]
+    return node[2]
+
+
+def struct_record_type(node) -> type:
+    """Record type of a struct node, see `bitnest.record`"""
+    return record_type(node[1], record_field_names([_name(_) for _ in node[2][1:]]))
+
+
+def field_value(field, variable, namespace):
+    """Value of a field given the variable holding its raw bits"""
+    field_type, size, additional = field[1], field[4], field[6]
+    variable = Expression(variable).expression
+
+    if field_type == "boolean":
+        return Expression((EQ, variable, Integer(1)))
+    elif field_type == "signed_integer":
+        # subtract 2 ** size when the sign bit is set
+        sign = Integer(2 ** (Expression(size).value - 1)).expression
+        return Expression(
+            (SUB, variable, (LSHIFT, (BIT_AND, variable, sign), Integer(1).expression))
+        )
+    elif field_type == "bits_enum":
+        # unknown values are kept as integers
+        lookup = _bind(namespace, "__enum_", _enum_lookup(additional["mapping"]))
+        return call(Variable(lookup), variable, variable)
+    return Expression(variable)
+
+
+def parser_record(
+    datatype: Expression,
+    bits_name: str = "__bits",
+    record_name: str = "__record",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
+    namespace=None,
+    payload_views: bool = False,
+) -> Expression:
+    """Generate statements assigning the record of a datatype to
+    `record_name`
+
+    Fields are read in order of appearance at the offsets from
+    `realize_offsets`. Each vector is decoded by a loop advancing its
+    loop variable by the size of each element and the final loop
+    variable replaces the size of the vector in all following offsets,
+    so fields after vectors whose elements vary in size are located
+    exactly. Record types (see `bitnest.record`) and enum lookups are
+    bound within `namespace`.
+
+    With payload_views `bits` fields of whole bytes are memoryviews of
+    the input, see `bitnest.backend.bitreader.view`, which requires
+    bits_format "bytes". `ValueError` is raised when the input ends
+    before the datatype does, bits past the end would otherwise read
+    as zeros. The length of "bits" input is its `len`.
+
+    """
+    if payload_views and bits_format != "bytes":
+        raise ValueError("payload_views requires bits_format bytes")
+    namespace = {} if namespace is None else namespace
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"parser_record expects a datatype not {_datatype.symbol}")
+
+    bits = Variable(bits_name)
+    length = Variable(length_name)
+    fields = {_[5]: _ for _ in walk_nodes(_datatype.expression) if _[0] == FIELD}
+    # field id -> variable holding raw bits
+    field_variables = {}
+    # id(element size) -> (element size, loop variable of decoded vector)
+    vector_sizes = {}
+    counter = itertools.count()
+
+    def handle_field_reference(symbol, args):
+        name, id = args
+        if id in field_variables:
+            return field_variables[id].expression
+        field = fields[id]
+        return bit_extraction(
+            bits, field[3], field[4], bits_format=bits_format, length=length
+        ).expression
+
+    def handle_size(symbol, args):
+        vector_size = vector_sizes.get(id(args[1]))
+        if vector_size is not None and vector_size[0] is args[1]:
+            return vector_size[1].expression
+        return (symbol, *args)
+
+    def resolve(node):
+        _node = Expression(node)
+        _node.replace(
+            {FIELD_REFERENCE: handle_field_reference, MUL: handle_size},
+            order="pre_order",
+        )
+        return _node
+
+    def decode(node, body):
+        symbol = node[0]
+        if symbol == FIELD:
+            offset, size, field_id = node[3], node[4], node[5]
+            if (
+                payload_views
+                and node[1] == "bits"
+                and Expression(size).symbol == INTEGER
+                and Expression(size).value % 8 == 0
+            ):
+                view = _bind(namespace, "__view_", bitreader.view)
+                return call(Variable(view), bits, resolve(offset), size)
+
+            variable = Variable(f"__field_{field_id}")
+            body.append(
+                assign(
+                    variable,
+                    bit_extraction(
+                        bits,
+                        resolve(offset),
+                        size,
+                        bits_format=bits_format,
+                        length=length,
+                    ),
+                )
+            )
+            field_variables[field_id] = variable
+            return field_value(node, variable, namespace)
+        elif symbol == STRUCT:
+            _fields = node[2][1:]
+            values = [decode(_, body) for _ in _fields]
+            constructor = _bind(
+                namespace, "__record_", _record_constructor(struct_record_type(node))
+            )
+            return call(Variable(constructor), tuple_(*values))
+        elif symbol == VECTOR:
+            struct, _length, loop_variable, offset, size = node[1:]
+            elements = Variable(f"__vector_{next(counter)}")
+            element_body = []
+            element = decode(struct, element_body)
+            element_size = size[2]
+            element_body.extend(
+                [
+                    call(attribute(elements, "append"), element),
+                    assign(
+                        loop_variable,
+                        Expression(loop_variable) + resolve(element_size),
+                    ),
+                ]
+            )
+            body.extend(
+                [
+                    assign(elements, list_()),
+                    assign(loop_variable, Integer(0)),
+                    for_(
+                        Variable("__element"),
+                        call(Variable("range"), resolve(_length)),
+                        statements(*element_body),
+                    ),
+                ]
+            )
+            vector_sizes[id(element_size)] = (element_size, Expression(loop_variable))
+            return elements
+        raise ValueError(f"cannot decode node with symbol={symbol}")
+
+    body = []
+    if payload_views:
+        # slices of a memoryview do not copy
+        body.append(assign(bits, call(Variable("memoryview"), bits)))
+    record = decode(_datatype.expression[1], body)
+    end = _end(_datatype.expression[1])
+    if end is not None:
+        if bits_format == "bits":
+            length = call(Variable("len"), bits)
+        elif bits_format == "bytes":
+            length = Expression(
+                (MUL, call(Variable("len"), bits).expression, Integer(8).expression)
+            )
+        check = _bind(namespace, "__check_", bitreader.check)
+        body.append(call(Variable(check), length, resolve(end)))
+    body.append(assign(Variable(record_name), record))
+    return statements(*body)
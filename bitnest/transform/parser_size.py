@@ -0,0 +1,163 @@
+"""
+Transformation generating statements which measure the size of a
+realized datatype at the start of a partially received input
+
+"""
+import functools
+
+from bitnest.core import (
+    Expression,
+    Integer,
+    Variable,
+    assign,
+    call,
+    if_,
+    statements,
+    walk_nodes,
+    ADD,
+    DATATYPE,
+    FIELD,
+    FIELD_REFERENCE,
+    GT,
+    INTEGER,
+    LIST,
+    LOGICAL_AND,
+    STRUCT,
+    SUB,
+    VARIABLE,
+    VECTOR,
+)
+from bitnest.transform.parser_datatype import bit_extraction
+
+
+def _end(node):
+    """Offset one past the last bit of a node with offsets"""
+    if node[0] == FIELD:
+        return (ADD, node[3], node[4])
+    elif node[0] == VECTOR:
+        return (ADD, node[4], node[5])
+    elif node[0] == STRUCT:
+        for _node in reversed(node[2][1:]):
+            end = _end(_node)
+            if end is not None:
+                return end
+    return None
+
+
+def _simplify(node):
+    return Expression(node).transform("arithmetic_simplify").expression
+
+
+def _field_references(node):
+    return [_[2] for _ in walk_nodes(node) if _[0] == FIELD_REFERENCE]
+
+
+def parser_size(
+    datatype: Expression,
+    bits_name: str = "__bits",
+    size_name: str = "__size",
+    bits_format: str = "bits",
+    length_name: str = "__bits_length",
+) -> Expression:
+    """Generate statements assigning the size in bits of a datatype to
+    `size_name` given an input of `length_name` bits which may end
+    before the datatype does
+
+    The size is zero when the conditions of the datatype do not hold
+    and minus the number of bits required when the input is too short
+    to evaluate the conditions or the size. Fields referenced by both
+    must either have a fixed offset or an offset depending only on
+    fields with fixed offsets, e.g. a field following a vector of
+    fixed size elements, otherwise `ValueError` is raised.
+
+    """
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"parser_size expects a datatype not {_datatype.symbol}")
+
+    fields = {_[5]: _ for _ in walk_nodes(_datatype.expression) if _[0] == FIELD}
+    conditions = _datatype.analysis("inspect_datatypes")[0][2]
+    conditions = [Expression(_).expression for _ in conditions]
+    size = _simplify(_end(_datatype.expression[1]) or Integer(0).expression)
+
+    def stop(field_id):
+        field = fields[field_id]
+        _stop = _simplify((ADD, field[3], field[4]))
+        if any(_[0] == VARIABLE for _ in walk_nodes(_stop)):
+            raise ValueError(f"field={field[2]} is not at a fixed offset")
+        return _stop
+
+    # bits required to evaluate the conditions and size, reading
+    # fields within `minimum` bits to find the variable requirements
+    minimum = 0
+    requirements = []
+    stops = [stop(_) for _ in _field_references((LIST, *conditions, size))]
+    for _stop in stops:
+        if _stop[0] == INTEGER:
+            minimum = max(minimum, _stop[1])
+            continue
+        for field_id in _field_references(_stop):
+            _field_stop = stop(field_id)
+            if _field_stop[0] != INTEGER:
+                raise ValueError(
+                    f"offset of field={fields[field_id][2]} depends on fields "
+                    "without a fixed offset"
+                )
+            minimum = max(minimum, _field_stop[1])
+        if _stop not in requirements:
+            requirements.append(_stop)
+
+    def handle_field_reference(symbol, args):
+        field = fields[args[1]]
+        return bit_extraction(
+            Variable(bits_name),
+            field[3],
+            field[4],
+            bits_format=bits_format,
+            length=Variable(length_name),
+        ).expression
+
+    def resolve(node):
+        _node = Expression(node)
+        _node.replace({FIELD_REFERENCE: handle_field_reference}, order="pre_order")
+        return _node.expression
+
+    size_variable = Variable(size_name)
+    length = Variable(length_name).expression
+
+    def insufficient(required):
+        return assign(size_variable, Expression((SUB, Integer(0).expression, required)))
+
+    measure = assign(size_variable, Expression(resolve(size)))
+    if conditions:
+        measure = if_(
+            functools.reduce(
+                lambda left, right: (LOGICAL_AND, left, right),
+                [resolve(_) for _ in conditions],
+            ),
+            measure,
+            assign(size_variable, Integer(0)),
+        )
+
+    if requirements:
+        required = Variable(f"{size_name}_required")
+        measure = statements(
+            assign(
+                required,
+                call(
+                    Variable("max"),
+                    Integer(minimum),
+                    *[Expression(resolve(_)) for _ in requirements],
+                ),
+            ),
+            if_(
+                Expression((GT, required.expression, length)),
+                insufficient(required.expression),
+                measure,
+            ),
+        )
+
+    minimum = Integer(minimum).expression
+    return statements(
+        if_(Expression((GT, minimum, length)), insufficient(minimum), measure)
+    )
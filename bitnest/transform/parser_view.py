@@ -0,0 +1,99 @@
+"""
+Transformation generating statements which decode a single value of
+a realized datatype from bytes, the value of a field or the number of
+elements, the start or the end of an element of a vector, for lazily
+decoded views (see `bitnest.view`)
+
+"""
+from bitnest.core import (
+    Expression,
+    Variable,
+    assign,
+    statements,
+    walk_nodes,
+    DATATYPE,
+    FIELD,
+    FIELD_REFERENCE,
+    VARIABLE,
+)
+from bitnest.transform.parser_datatype import bit_extraction
+from bitnest.transform.parser_record import field_value
+
+
+def parser_view(
+    datatype: Expression,
+    kind: str,
+    key,
+    plan=None,
+    bits_name: str = "__bits",
+    result_name: str = "__value",
+    namespace=None,
+) -> Expression:
+    """Generate statements assigning a value of a datatype with offsets
+    to `result_name`
+
+    kind "field" decodes the value of the field with id key as
+    `parser_record` does, "length" and "start" the number of elements
+    and the offset of the vector whose loop variable is named key and
+    "end" the offset following the element of that vector at its loop
+    variable. Offsets are those of the `offset_plan` of the datatype.
+    The loop variables of the vectors enclosing the value (its scope)
+    and of the vectors within the same scope whose ends it depends on
+    are left free.
+
+    """
+    namespace = {} if namespace is None else namespace
+    _datatype = Expression(datatype)
+    if _datatype.symbol != DATATYPE:
+        raise ValueError(f"parser_view expects a datatype not {_datatype.symbol}")
+    plan = _datatype.analysis("offset_plan") if plan is None else plan
+
+    bits = Variable(bits_name)
+    fields = {_[5]: _ for _ in walk_nodes(_datatype.expression) if _[0] == FIELD}
+
+    if kind == "field":
+        scope = plan.fields[key].scope
+    elif kind in ("length", "start"):
+        scope = plan.vectors[key].scope
+    elif kind == "end":
+        scope = (*plan.vectors[key].scope, key)
+    else:
+        raise ValueError(f"cannot decode {kind} of {key}")
+
+    def handle_field_reference(symbol, args):
+        field = fields[args[1]]
+        return bit_extraction(
+            bits, plan.fields[args[1]].offset, field[4], bits_format="bytes"
+        ).expression
+
+    def handle_variable(symbol, args):
+        vector = plan.vectors.get(args[0])
+        # loop variables of enclosing vectors are element offsets
+        if vector is not None and args[0] not in scope and vector.scope != scope:
+            raise ValueError(
+                f"cannot decode {kind} of {key} from the end of vector "
+                f"{args[0]} outside of its scope"
+            )
+        return (symbol, *args)
+
+    def resolve(node):
+        _node = Expression(node)
+        _node.replace(
+            {FIELD_REFERENCE: handle_field_reference, VARIABLE: handle_variable},
+            order="pre_order",
+        )
+        return _node
+
+    body = []
+    result = Variable(result_name)
+    if kind == "field":
+        raw = Variable("__raw")
+        field = fields[key]
+        offset = resolve(plan.fields[key].offset)
+        body.append(assign(raw, bit_extraction(bits, offset, field[4], "bytes")))
+        body.append(assign(result, field_value(field, raw, namespace)))
+    else:
+        vector = plan.vectors[key]
+        value = {"length": vector.length, "start": vector.start, "end": vector.end}
+        body.append(assign(result, resolve(value[kind])))
+    return statements(*body)
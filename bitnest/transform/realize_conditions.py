@@ -1,7 +1,8 @@
 """Realize all conditions within a given datatype
 
 """
-from bitnest.core import Expression, Symbol
+from bitnest.core import Expression, is_stream, FIELD, FIELD_REFERENCE, STRUCT, VECTOR
+from bitnest.pipeline import Rule, fused_replace
 
 
 def identify_field_reference(root_struct, field_reference):
@@ -15,10 +16,10 @@ def identify_field_reference(root_struct, field_reference):
         )
 
     for section in field_reference.name.split("."):
-        if expression.symbol == Symbol("struct"):
+        if expression.symbol == STRUCT:
             for field in expression.fields[1:]:
                 field = Expression(field)
-                if field.symbol == Symbol("vector"):
+                if field.symbol == VECTOR:
                     struct = Expression(field.struct)
                     if struct.name == section:
                         stack.append(section)
@@ -30,9 +31,9 @@ def identify_field_reference(root_struct, field_reference):
                     break
             else:
                 raise_error(section, root_struct, stack, expression)
-        elif expression.symbol == Symbol("field"):
+        elif expression.symbol == FIELD:
             raise_error(section, root_struct, stack, expression)
-        elif expression.symbol == Symbol("vector"):
+        elif expression.symbol == VECTOR:
             struct = Expression(expression.struct)
             if struct.name == section:
                 expression = struct
@@ -40,7 +41,7 @@ def identify_field_reference(root_struct, field_reference):
             else:
                 raise_error(section, root_struct, stack, expression)
 
-    if expression.symbol != Symbol("field"):
+    if expression.symbol != FIELD:
         raise ValueError(
             f"field reference={field_reference} did not resolve to a field in struct={root_struct}"
         )
@@ -48,23 +49,31 @@ def identify_field_reference(root_struct, field_reference):
     return expression
 
 
-def realize_conditions(struct: Expression) -> Expression:
-    current_struct = []
-    _struct = Expression(struct)
+def realize_conditions_rule() -> Rule:
+    """Rule resolving field references to the id of the field within
+    the enclosing struct, see `bitnest.pipeline`
 
-    def replacement_function(symbol, args):
-        if symbol == Symbol("struct"):
-            current_struct.append((symbol, *args))
+    """
+    current_struct = []
 
+    def handle_struct(symbol, args):
+        current_struct.append((symbol, *args))
         symbol, args = yield (symbol, *args)
-
-        if symbol == Symbol("struct"):
-            current_struct.pop()
-        elif symbol == Symbol("field_reference"):
-            name, id = args
-            field = identify_field_reference(current_struct[-1], (symbol, *args))
-            args = name, field.id
+        current_struct.pop()
         yield (symbol, *args)
 
-    _struct.replace(replacement_function=replacement_function)
+    def handle_field_reference(symbol, args):
+        name, id = args
+        field = identify_field_reference(current_struct[-1], (symbol, *args))
+        return (symbol, name, field.id)
+
+    return Rule({STRUCT: handle_struct}, {FIELD_REFERENCE: handle_field_reference})
+
+
+def realize_conditions(struct: Expression) -> Expression:
+    if is_stream(struct):
+        return (realize_conditions(_) for _ in struct)
+
+    _struct = Expression(struct)
+    _struct.expression = fused_replace(_struct.expression, [realize_conditions_rule()])
     return _struct
@@ -1,49 +1,171 @@
 """Transformation to realize a given struct into all possible
-datatypes and uniquely label all fields
+datatypes and uniquely label all fields and vector loop variables
 
 """
 import itertools
+from typing import Iterator
 
-from bitnest.core import Expression, Symbol, list_
+from bitnest.core import (
+    Expression,
+    InternTable,
+    Variable,
+    list_,
+    DATATYPE,
+    FIELD,
+    FIELD_REFERENCE,
+    LIST,
+    STRUCT,
+    UNION,
+    VECTOR,
+)
+from bitnest.analysis.field_constraints import (
+    condition_constraints,
+    merge_constraints,
+    is_feasible,
+    field_domain,
+)
+from bitnest.transform.realize_conditions import identify_field_reference
 
 
-def realize_datatypes(struct: Expression) -> Expression:
+def _label_fields(struct: Expression) -> Expression:
+    """Uniquely label all fields and vector loop variables in order of
+    appearance
+
+    """
     _struct = Expression(struct)
     counter = itertools.count()
+    loop_counter = itertools.count()
 
     def handle_field(symbol, args):
         field_type, name, offset, size, id, additional = args
-        return [(symbol, field_type, name, offset, size, next(counter), additional)]
+        return (symbol, field_type, name, offset, size, next(counter), additional)
 
     def handle_vector(symbol, args):
-        paths = []
-        struct_paths, length, loop_variable = args
-        for struct in struct_paths:
-            paths.append((symbol, struct, length, loop_variable))
-        return paths
-
-    def handle_union(symbol, args):
-        paths = []
-        for struct_paths in args:
-            for struct in struct_paths:
-                paths.append(struct)
-        return paths
-
-    def handle_struct(symbol, args):
-        name, fields, conditions, additional = args
-        paths = []
-        for _fields in itertools.product(*fields[1:]):
-            paths.append(
-                (symbol, name, (Symbol("list"), *_fields), conditions, additional)
-            )
-        return paths
-
-    replacement_mapping = {
-        Symbol("field"): handle_field,
-        Symbol("vector"): handle_vector,
-        Symbol("union"): handle_union,
-        Symbol("struct"): handle_struct,
-    }
-
-    _struct.replace(replacement_mapping, order="post_order")
-    return list_(*[(Symbol("datatype"), _) for _ in _struct.expression])
+        struct, length, loop_variable, offset, size = args
+        loop_variable = Variable(f"__loop_{next(loop_counter)}").expression
+        return (symbol, struct, length, loop_variable, offset, size)
+
+    _struct.replace({FIELD: handle_field, VECTOR: handle_vector}, order="post_order")
+    return _struct
+
+
+def _resolve_condition(struct, condition):
+    """Resolve field references within condition relative to struct"""
+    if not isinstance(condition, tuple):
+        return condition
+    elif condition[0] == FIELD_REFERENCE:
+        field = identify_field_reference(struct, condition)
+        return (condition[0], condition[1], field.id)
+    return tuple(_resolve_condition(struct, _) for _ in condition)
+
+
+class _Realizer:
+    """Lazily realize all paths through unions
+
+    Each realization is paired with the constraints its conditions
+    impose on field values. When `domains` is given, realizations
+    whose constraints contradict are dropped as soon as the
+    contradiction is found.
+
+    """
+
+    def __init__(self, domains=None):
+        self.domains = domains
+
+    def realize(self, node, constraints):
+        symbol = node[0]
+        if symbol == VECTOR:
+            struct, *rest = node[1:]
+            for _struct, _constraints in self.realize(struct, constraints):
+                yield (symbol, _struct, *rest), _constraints
+        elif symbol == UNION:
+            for struct in node[1:]:
+                yield from self.realize(struct, constraints)
+        elif symbol == STRUCT:
+            name, fields, conditions, additional = node[1:]
+            for _fields, _constraints in self.product(fields[1:], constraints):
+                struct = (
+                    symbol,
+                    name,
+                    (LIST, *_fields),
+                    conditions,
+                    additional,
+                )
+                if self.domains is not None:
+                    for condition in conditions[1:]:
+                        _constraints = merge_constraints(
+                            _constraints,
+                            condition_constraints(
+                                _resolve_condition(struct, condition)
+                            ),
+                        )
+                    if not is_feasible(_constraints, self.domains):
+                        continue
+                yield struct, _constraints
+        else:
+            yield node, constraints
+
+    def product(self, nodes, constraints):
+        """Lazy `itertools.product` over the realizations of each node
+
+        Unlike `itertools.product` the realizations of later nodes are
+        regenerated for each prefix instead of being held in memory.
+        The realizations of the nodes in the prefix are held on a stack
+        rather than by recursion so that wide structs do not exhaust
+        the recursion limit.
+
+        """
+        if not nodes:
+            yield (), constraints
+            return
+
+        prefix = []
+        stack = [self.realize(nodes[0], constraints)]
+        while stack:
+            depth = len(stack) - 1
+            try:
+                node, _constraints = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            del prefix[depth:]
+            prefix.append(node)
+            if depth + 1 == len(nodes):
+                yield tuple(prefix), _constraints
+            else:
+                stack.append(self.realize(nodes[depth + 1], _constraints))
+
+
+def iter_realize_datatypes(
+    struct: Expression, prune: bool = False, table: InternTable = None
+) -> Iterator[Expression]:
+    """Lazily yield each `(datatype ...)` of the given struct
+
+    Only a single datatype is held in memory at a time. Datatypes
+    are yielded in the same order and with the same field ids as
+    `realize_datatypes`. With `prune` datatypes whose conditions can
+    never be satisfied (see `bitnest.analysis.field_constraints`) are
+    skipped. With `table` datatypes are interned so that identical
+    sub-structs are shared between them.
+
+    """
+    _struct = _label_fields(struct)
+    domains = None
+    if prune:
+        domains = {
+            Expression(_).id: field_domain(_) for _ in _struct.find_symbol(FIELD)
+        }
+
+    for path, _ in _Realizer(domains).realize(_struct.expression, {}):
+        datatype = Expression((DATATYPE, path))
+        yield datatype if table is None else datatype.intern(table)
+
+
+def realize_datatypes(struct: Expression, prune: bool = False) -> Expression:
+    table = InternTable()
+    return list_(
+        *[
+            _.expression
+            for _ in iter_realize_datatypes(struct, prune=prune, table=table)
+        ]
+    )
@@ -1,47 +1,74 @@
 """
 Transformation to add field offsets within a given datatype
 
+The loop variable of a vector is the offset of the current element
+relative to the start of the vector. Fields within a vector are
+offset by it while fields following a vector are offset by the size
+of the vector, `length * element_size`. When the size of elements
+varies `element_size` is that of the element at the loop variable,
+with unbound loop variables this is the first element.
+
 """
-from bitnest.core import Expression, Integer, Symbol
+from bitnest.core import Expression, Integer, is_stream, DATATYPE, FIELD, VECTOR
+from bitnest.pipeline import Rule, fused_replace
 
 
-def realize_offsets(path: Expression) -> Expression:
-    _path = Expression(path)
+def realize_offsets_rule() -> Rule:
+    """Rule adding the offset of every field and the offset and size of
+    every vector, see `bitnest.pipeline`
 
+    """
     current_offset = None
+    # size of the current element of each enclosing vector
+    element_sizes = []
+
+    def handle_datatype(symbol, args):
+        nonlocal current_offset
+        current_offset = Integer(0)
+        symbol, args = yield (symbol, *args)
+        current_offset = None
+        yield (symbol, *args)
+
+    def handle_field(symbol, args):
+        nonlocal current_offset
+        field_type, name, offset, size, id, additional = args
+        field = (
+            symbol,
+            field_type,
+            name,
+            current_offset.expression,
+            size,
+            id,
+            additional,
+        )
+        current_offset = current_offset + size
+        if element_sizes:
+            element_sizes[-1] = element_sizes[-1] + size
+        symbol, args = yield field
+        yield (symbol, *args)
 
-    def replacement_function(symbol, args):
+    def handle_vector(symbol, args):
         nonlocal current_offset
+        struct, length, loop_variable, offset, size = args
+        start = current_offset.expression
+        current_offset = Expression(start) + loop_variable
+        element_sizes.append(Integer(0))
+        symbol, args = yield (symbol, struct, length, loop_variable, start, size)
 
-        if symbol == Symbol("datatype"):
-            current_offset = Integer(0)
-            symbol, args = yield (symbol, *args)
-            current_offset = None
-            yield (symbol, *args)
-        elif symbol == Symbol("field"):
-            field_type, name, offset, size, id, additional = args
-            field = (
-                symbol,
-                field_type,
-                name,
-                current_offset.expression,
-                size,
-                id,
-                additional,
-            )
-            current_offset = current_offset + size
-            symbol, args = yield field
-            yield (symbol, *args)
-        elif symbol == Symbol("vector"):
-            struct, length, loop_variable = args
-            current_offset = current_offset + (
-                Expression(length) * Expression(loop_variable)
-            )
-            symbol, args = yield (symbol, *args)
-            yield (symbol, *args)
-        else:
-            symbol, args = yield (symbol, *args)
-            yield (symbol, *args)
-
-    _path.replace(replacement_function=replacement_function)
+        # length as replaced by the rules fused before this one
+        size = Expression(args[1]) * element_sizes.pop()
+        current_offset = Expression(start) + size
+        if element_sizes:
+            element_sizes[-1] = element_sizes[-1] + size
+        yield (symbol, *args[:4], size.expression)
+
+    return Rule({DATATYPE: handle_datatype, FIELD: handle_field, VECTOR: handle_vector})
+
+
+def realize_offsets(path: Expression) -> Expression:
+    if is_stream(path):
+        return (realize_offsets(_) for _ in path)
+
+    _path = Expression(path)
+    _path.expression = fused_replace(_path.expression, [realize_offsets_rule()])
     return _path
@@ -0,0 +1,285 @@
+"""
+Lazily decoded views of messages
+
+A view holds the buffer of a message and the offsets of the vector
+elements enclosing it. Each field is decoded from the buffer when its
+attribute is first read and cached on the view, nested structs are
+views themselves and vectors are sequences of element views created
+on access. Fields are located by the `offset_plan` of their datatype
+so elements of a fixed size and fields following them are found
+without reading any other element:
+
+    decoder = compile_decoder(MILSTD_1553_Message, "bytes", lazy=True)
+    message = decoder(data)
+    message.remote_terminal_address
+    message._datatype  # index within the datatype mask of the parser
+
+Attributes have the names of the fields of records, see
+`bitnest.record`. Views read the buffer whenever a field is first
+accessed so the buffer must not change while views of it are in use.
+
+"""
+import collections.abc
+import functools
+import operator
+from typing import Callable, Dict, Iterator, List
+
+from bitnest.analysis.offset_plan import fixed_size
+from bitnest.core import Expression, FIELD, STRUCT, VECTOR
+from bitnest.record import record_field_names
+from bitnest.transform.parser_record import _name, struct_record_type
+
+
+class _Scope:
+    """Buffer and offsets of the enclosing vector elements shared by
+    the views within an element, or a message outside of vectors,
+    along with the vectors within it
+
+    """
+
+    __slots__ = ("bits", "loops", "vectors", "cache")
+
+    def __init__(self, bits, loops: tuple, vectors: Dict):
+        self.bits = bits
+        self.loops = loops
+        # loop variable name -> arguments of `VectorView`
+        self.vectors = vectors
+        self.cache = {}
+
+    def vector(self, name: str) -> "VectorView":
+        vector = self.cache.get(name)
+        if vector is None:
+            vector = self.cache[name] = VectorView(self, *self.vectors[name])
+        return vector
+
+    def call(self, getter):
+        """Value of a getter, (function, names of the vectors whose ends
+        follow the loop variables within its arguments)
+
+        """
+        function, ends = getter
+        if ends:
+            return function(self.bits, *self.loops, *[self.vector(_).end for _ in ends])
+        return function(self.bits, *self.loops)
+
+
+class _Lazy:
+    """Attribute computed by `compute(view)` on first access and stored
+    within the view, which takes precedence over the descriptor
+
+    """
+
+    def __init__(self, compute: Callable):
+        self.compute = compute
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        value = view.__dict__[self.name] = self.compute(view)
+        return value
+
+
+def _field(getter, view):
+    return view._scope.call(getter)
+
+
+def _struct(view_type, view):
+    return view_type(view._scope.bits, view._scope)
+
+
+def _vector(name, view):
+    return view._scope.vector(name)
+
+
+def _asrecord(value):
+    if isinstance(value, View):
+        return value._asrecord()
+    elif isinstance(value, VectorView):
+        return [_asrecord(_) for _ in value]
+    return value
+
+
+class View:
+    """Base class of the view types of the structs of a datatype"""
+
+    # record type and attribute names, set by `view_type`
+    _record = None
+    _fields = ()
+    # vectors of the datatype, see `_Scope`
+    _vectors = None
+    # index within the datatype mask of `compile_parser`, set on datatype views
+    _datatype = None
+
+    def __init__(self, bits, scope: _Scope = None):
+        self._scope = _Scope(bits, (), self._vectors) if scope is None else scope
+
+    def _asrecord(self):
+        """Record of all fields as returned by `compile_decoder`"""
+        return self._record(*(_asrecord(getattr(self, _)) for _ in self._fields))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} view {self._asrecord()!r}>"
+
+
+class VectorView(collections.abc.Sequence):
+    """Sequence of the element views of a vector
+
+    Elements of a fixed size are located by their index. The offsets
+    of elements which vary in size are measured once for all elements
+    when the first element or the end of the vector is needed.
+
+    """
+
+    __slots__ = (
+        "_bits",
+        "_loops",
+        "_vectors",
+        "_length",
+        "_start",
+        "_stride",
+        "_end",
+        "_type",
+        "_offsets",
+        "_scopes",
+        "_elements",
+    )
+
+    def __init__(self, scope: _Scope, length, start, stride, end, element_type):
+        # the scope is not kept as it holds the vector
+        self._bits = scope.bits
+        self._loops = scope.loops
+        self._vectors = scope.vectors
+        self._length = scope.call(length)
+        self._start = scope.call(start)
+        self._stride = stride
+        self._end = end
+        self._type = element_type
+        # offsets and scopes of elements which vary in size once measured
+        self._offsets = self._scopes = None
+        # index -> element view
+        self._elements = {}
+
+    def __len__(self):
+        return self._length
+
+    def _scope(self, offset: int) -> _Scope:
+        return _Scope(self._bits, (*self._loops, offset), self._vectors)
+
+    def offsets(self) -> List[int]:
+        """Offset in bits of each element and of the end of the vector"""
+        if self._stride is not None:
+            return [self._start + _ * self._stride for _ in range(self._length + 1)]
+        if self._offsets is None:
+            offsets, scopes = [self._start], []
+            for _ in range(self._length):
+                scopes.append(self._scope(offsets[-1]))
+                offsets.append(scopes[-1].call(self._end))
+            self._offsets, self._scopes = offsets, scopes
+        return self._offsets
+
+    def offset(self, index: int) -> int:
+        """Offset in bits of an element"""
+        if self._stride is not None:
+            return self._start + index * self._stride
+        return self.offsets()[index]
+
+    @property
+    def end(self) -> int:
+        """Offset in bits following the vector"""
+        return self.offset(self._length)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[_] for _ in range(*index.indices(self._length))]
+        index = operator.index(index)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("vector index out of range")
+        element = self._elements.get(index)
+        if element is None:
+            if self._stride is None:
+                self.offsets()
+                scope = self._scopes[index]
+            else:
+                scope = self._scope(self._start + index * self._stride)
+            element = self._elements[index] = self._type(self._bits, scope)
+        return element
+
+    def __iter__(self) -> Iterator[View]:
+        for index in range(self._length):
+            yield self[index]
+
+    def __repr__(self):
+        return f"<vector view of {self._length} {self._type.__name__}>"
+
+
+def view_nodes(node, scope=()):
+    """(kind, key, scope) of the values decoded by the views of a struct
+    node of a realized datatype in the order `view_type` takes their
+    getters, see `parser_view`
+
+    """
+    for child in node[2][1:]:
+        symbol = child[0]
+        if symbol == FIELD:
+            yield "field", child[5], scope
+        elif symbol == STRUCT:
+            yield from view_nodes(child, scope)
+        elif symbol == VECTOR:
+            name = Expression(child[3]).name
+            yield "length", name, scope
+            yield "start", name, scope
+            if fixed_size(child[1]) is None:
+                yield "end", name, (*scope, name)
+            yield from view_nodes(child[1], (*scope, name))
+        else:
+            raise ValueError(f"cannot view node with symbol={symbol}")
+
+
+def _getter(function, scope):
+    code = function.__code__
+    # arguments following the loop variables are ends of vectors
+    return function, code.co_varnames[1 + len(scope) : code.co_argcount]
+
+
+def view_type(node, getters: Iterator[Callable], scope=(), vectors=None) -> type:
+    """View class of a struct node of a realized datatype taking the
+    functions compiled from `view_nodes` in order
+
+    """
+    names = record_field_names([_name(_) for _ in node[2][1:]])
+    attributes = {"_record": struct_record_type(node), "_fields": names}
+    if vectors is None:  # view of the datatype
+        vectors = attributes["_vectors"] = {}
+    for name, child in zip(names, node[2][1:]):
+        symbol = child[0]
+        if symbol == FIELD:
+            compute = functools.partial(_field, _getter(next(getters), scope))
+        elif symbol == STRUCT:
+            # nested structs share the scope of the struct
+            compute = functools.partial(
+                _struct, view_type(child, getters, scope, vectors)
+            )
+        else:
+            loop_variable = Expression(child[3]).name
+            element_scope = (*scope, loop_variable)
+            length = _getter(next(getters), scope)
+            start = _getter(next(getters), scope)
+            stride = fixed_size(child[1])
+            end = None
+            if stride is None:
+                end = _getter(next(getters), element_scope)
+            vectors[loop_variable] = (
+                length,
+                start,
+                stride,
+                end,
+                view_type(child[1], getters, element_scope, vectors),
+            )
+            compute = functools.partial(_vector, loop_variable)
+        attributes[name] = _Lazy(compute)
+    return type(attributes["_record"].__name__, (View,), attributes)
@@ -31,7 +31,9 @@ setup(
         'astor',
     ],
     extras_require={
+        "numpy": ["numpy"],
         "dev": [
+            "numpy",
             "pytest",
             "pytest-cov",
             "black==21.5b0",
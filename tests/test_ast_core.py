@@ -1,8 +1,22 @@
+import copy
 import operator
+import os
+import pickle
+import subprocess
+import sys
 
 import pytest
 
-from bitnest.core import Expression, Variable, UniqueVariable, Symbol
+from bitnest.core import (
+    Expression,
+    Variable,
+    Symbol,
+    InternTable,
+    FIELD,
+    Integer,
+    list_,
+    fingerprint,
+)
 
 
 def test_not_expression():
@@ -162,3 +176,106 @@ def test_find_symbol_nodes():
         (Symbol("variable"), "test_a"),
         (Symbol("variable"), "test_b"),
     ]
+
+
+def test_intern_table():
+    table = InternTable()
+    a = table.intern(((Variable("a") + 1) * Variable("a")).expression)
+    b = table.intern(((Variable("a") + 1) * Variable("a")).expression)
+    c = table.intern(((Variable("a") + 2) * Variable("a")).expression)
+
+    assert a is b
+    assert a[1][1] is a[2]
+    assert table.equal(a, ((Variable("a") + 1) * Variable("a")).expression)
+    assert not table.equal(a, c)
+    assert table.structural_hash(a) == InternTable().structural_hash(b)
+    assert table.structural_hash(a) != table.structural_hash(c)
+
+
+def test_intern_expression():
+    expression = Variable("a") + Variable("a")
+    expression.intern()
+    assert expression.expression[1] is expression.expression[2]
+
+
+def test_fingerprint():
+    a = ((Variable("a") + 1) * Variable("a")).expression
+    b = ((Variable("a") + 1) * Variable("a")).expression
+    c = ((Variable("a") + 2) * Variable("a")).expression
+    assert fingerprint(a) == fingerprint(b) == Expression(b).fingerprint()
+    assert fingerprint(a) != fingerprint(c)
+    assert fingerprint((FIELD, {"a": 1, "b": 2})) == fingerprint(
+        (FIELD, {"b": 2, "a": 1})
+    )
+
+    # independent of the hash seed of the process
+    source = (
+        "from bitnest.core import Variable;"
+        "print(((Variable('a') + 1) * Variable('a')).fingerprint())"
+    )
+    for seed in ["1", "2"]:
+        output = subprocess.run(
+            [sys.executable, "-c", source],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        assert output.strip() == fingerprint(a)
+
+
+def test_symbol_interned():
+    symbol = Symbol("test_symbol")
+    assert symbol is Symbol("test_symbol")
+    assert symbol is not Symbol("other_symbol")
+    assert copy.copy(symbol) is symbol
+    assert copy.deepcopy((symbol,))[0] is symbol
+    assert pickle.loads(pickle.dumps(symbol)) is symbol
+    assert not hasattr(symbol, "__dict__")
+    assert Symbol("field") is FIELD
+
+
+def test_deep_and_wide_expressions():
+    depth = sys.getrecursionlimit() * 5
+    expression = Variable("a")
+    for _ in range(depth):
+        expression = expression + 1
+
+    assert len(expression.find_symbol(Symbol("integer"))) == depth
+    assert expression.transform("arithmetic_simplify").expression == (
+        Symbol("add"),
+        (Symbol("variable"), "a"),
+        (Symbol("integer"), depth),
+    )
+
+    expression = list_(*[Integer(_).expression for _ in range(depth)])
+    assert len(expression.find_symbol(Symbol("integer"))) == depth
+
+
+@pytest.mark.parametrize("order", ["pre_order", "post_order"])
+def test_copy_on_write_replacement(order):
+    expression = (Variable("a") + 1) * (Variable("b") - 2)
+    original = expression.expression
+
+    expression.replace({Symbol("truediv"): lambda symbol, args: (symbol, *args)})
+    assert expression.expression is original
+
+    expression.replace(
+        {Symbol("sub"): lambda symbol, args: (Symbol("add"), *args)}, order=order
+    )
+    assert expression.expression is not original
+    assert expression.expression[1] is original[1]
+    assert expression.expression[2][0] == Symbol("add")
+    assert expression.expression[2][1] is original[2][1]
+
+
+def test_copy_on_write_replacement_function():
+    expression = (Variable("a") + 1) * (Variable("b") - 2)
+    original = expression.expression
+
+    def replacement_function(symbol, args):
+        symbol, args = yield (symbol, *args)
+        yield (symbol, *args)
+
+    expression.replace(replacement_function=replacement_function)
+    assert expression.expression is original
@@ -3,6 +3,7 @@ import enum
 import pytest
 
 from bitnest import field
+from bitnest.core import Symbol
 
 
 class AnEnum(enum.Enum):
@@ -46,3 +47,38 @@ def test_union():
 
 def test_vector():
     field.Vector(AStruct, field.FieldReference("somebits") * 2)
+
+
+def test_struct_expression_cached():
+    class BStruct(field.Struct):
+        name = "BStruct"
+        fields = [AStruct, field.Boolean("flag")]
+
+    expression = BStruct.expression()
+    assert BStruct.expression().expression is expression.expression
+    assert BStruct.expression() is not expression
+
+    BStruct.conditions = [field.FieldReference("flag") == 1]
+    assert BStruct.expression().expression[3] == (
+        Symbol("list"),
+        (
+            Symbol("eq"),
+            (Symbol("field_reference"), "flag", None),
+            (Symbol("integer"), 1),
+        ),
+    )
+
+
+def test_struct_expression_child_invalidated():
+    class CStruct(field.Struct):
+        name = "CStruct"
+        fields = [field.Bits("somebits", 2)]
+
+    class DStruct(field.Struct):
+        name = "DStruct"
+        fields = [CStruct]
+
+    expression = DStruct.expression()
+    CStruct.fields = [field.Bits("otherbits", 2)]
+    assert DStruct.expression().expression is not expression.expression
+    assert DStruct.expression().expression[2][1][2][1][2] == "otherbits"
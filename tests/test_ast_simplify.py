@@ -16,7 +16,35 @@ from bitnest.core import Symbol, Expression, Variable
                     (Symbol("integer"), 4),
                 )
             ),
-        )
+        ),
+        (
+            Expression(
+                (
+                    Symbol("rshift"),
+                    (Symbol("variable"), "a"),
+                    (
+                        Symbol("sub"),
+                        (Symbol("integer"), 7),
+                        (
+                            Symbol("mod"),
+                            (Symbol("integer"), 23),
+                            (Symbol("integer"), 8),
+                        ),
+                    ),
+                )
+            ),
+            Expression((Symbol("variable"), "a")),
+        ),
+        (
+            Expression(
+                (
+                    Symbol("floordiv"),
+                    (Symbol("add"), (Symbol("integer"), 140), (Symbol("integer"), 7)),
+                    (Symbol("integer"), 8),
+                )
+            ),
+            Expression((Symbol("integer"), 18)),
+        ),
     ],
 )
 def test_ast_simplify(expression, result):
@@ -0,0 +1,62 @@
+import pytest
+
+from bitnest.backend.python import compile_decoder, compile_parser
+from bitnest.core import DATATYPE
+from benchmarks.compile_time import PASSES, measure
+from benchmarks.corpus import generate_corpus
+from benchmarks.specs import synthetic_struct
+from benchmarks.throughput import measure as measure_throughput
+from models.simple import MILSTD_1553_Message
+from models.test import StructA
+
+
+@pytest.mark.parametrize(
+    "union_width,nesting_depth,vector_count", [(1, 1, 0), (3, 1, 2), (2, 3, 1)]
+)
+def test_synthetic_struct(union_width, nesting_depth, vector_count):
+    struct = synthetic_struct(union_width, nesting_depth, vector_count)
+    datatypes = struct.expression().transform("realize_datatypes").find_symbol(DATATYPE)
+    assert len(datatypes) == union_width ** nesting_depth
+
+
+def test_measure_compile_time():
+    results = measure(synthetic_struct(2, 2, 1), repeat=1)
+    assert [_["pass"] for _ in results] == [name for name, _ in PASSES]
+    assert all(_["seconds"] > 0 and _["peak_bytes"] > 0 for _ in results)
+    assert all(_["nodes"] > 0 for _ in results[:-1])
+
+
+def test_generate_corpus():
+    corpus, datatypes = generate_corpus(MILSTD_1553_Message, 200, seed=1)
+    assert set(datatypes) == {0, 1}
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format="bytes")
+    parser = compile_parser(MILSTD_1553_Message, bits_format="bytes")
+    for message, datatype in zip(corpus, datatypes):
+        decoder(message)
+        assert parser(message) & (1 << datatype)
+
+    assert generate_corpus(MILSTD_1553_Message, 200, seed=1)[0] == corpus
+    assert set(generate_corpus(MILSTD_1553_Message, 50, weights=[0, 1])[1]) == {1}
+    with pytest.raises(ValueError):
+        generate_corpus(MILSTD_1553_Message, 10, weights=[1])
+
+
+def test_generate_corpus_synthetic():
+    struct = synthetic_struct(3, 2, 2)
+    corpus, datatypes = generate_corpus(struct, 100)
+    assert len(set(datatypes)) == 9
+
+
+def test_measure_throughput():
+    corpus, _ = generate_corpus(MILSTD_1553_Message, 100)
+    results = measure_throughput(MILSTD_1553_Message, corpus, batch_size=10)
+    assert [_["mode"] for _ in results] == ["single", "loop", "stream"]
+    assert all(_["messages_per_second"] > 0 for _ in results)
+
+
+def test_measure_throughput_batch():
+    pytest.importorskip("numpy")
+    corpus, datatypes = generate_corpus(StructA, 100)
+    results = measure_throughput(StructA, corpus, batch_size=10, datatypes=datatypes)
+    assert [_["mode"] for _ in results] == ["single", "loop", "batch", "stream"]
+    assert all(_["messages_per_second"] > 0 for _ in results)
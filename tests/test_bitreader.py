@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from models.simple import MILSTD_1553_Message
+
+from bitnest.field import Struct, UnsignedInteger, Bits, Vector, FieldReference
+from bitnest.backend.bitreader import BitReader
+from bitnest.backend.python import compile_parser, compile_decoder
+
+
+def test_bit_reader():
+    rng = random.Random(0)
+    data = bytes(rng.randrange(256) for _ in range(16))
+    bits = "".join(f"{_:08b}" for _ in data)
+    reader = BitReader(data)
+    assert len(reader) == 128
+
+    for _ in range(1000):
+        start = rng.randrange(128)
+        stop = rng.randrange(start, 129)
+        assert reader[start:stop] == int(bits[start:stop] or "0", 2)
+
+    view = reader.view(16, 32)
+    assert view.obj is data
+    assert view.tobytes() == data[2:6]
+    assert reader.view(13, 16).tobytes() == int(bits[13:29], 2).to_bytes(2, "big")
+
+    with pytest.raises(ValueError):
+        reader.view(8, 12)
+
+
+def test_bit_reader_truncated():
+    reader = BitReader(b"\xff")
+    assert reader[4:20] == 0xF000
+    assert reader[8:16] == 0
+    assert reader[4:] == 0xF
+
+    decoder = compile_decoder(MILSTD_1553_Message)
+    data = bytes.fromhex("01fa01020304")
+    assert decoder(BitReader(data)) == compile_decoder(
+        MILSTD_1553_Message, bits_format="bytes"
+    )(data)
+    with pytest.raises(ValueError):
+        decoder(BitReader(data[:4]))
+
+
+def test_bit_reader_parser():
+    rng = random.Random(0)
+    bits_parser = compile_parser(MILSTD_1553_Message)
+    bytes_parser = compile_parser(MILSTD_1553_Message, bits_format="bytes")
+    for _ in range(100):
+        data = bytes(rng.randrange(256) for _ in range(8))
+        assert bits_parser(BitReader(data)) == bytes_parser(data)
+
+
+class Word(Struct):
+    name = "Word"
+    fields = [Bits("data", 16)]
+
+
+class Payload(Struct):
+    name = "Payload"
+    fields = [
+        UnsignedInteger("count", 4),
+        Bits("unaligned", 8),
+        UnsignedInteger("padding", 4),
+        Vector(Word, length=FieldReference("count")),
+    ]
+
+
+def test_payload_views():
+    decoder = compile_decoder(Payload, bits_format="bytes", payload_views=True)
+    data = bytes([0x2A, 0xBF, 0x01, 0x02, 0x03, 0x04])
+    record = decoder(data)
+
+    assert record.count == 2
+    assert record.unaligned.tobytes() == b"\xab"
+    assert record.padding == 0xF
+    assert [_.data.tobytes() for _ in record.Word] == [b"\x01\x02", b"\x03\x04"]
+    assert all(_.data.obj is data for _ in record.Word)
+
+    with pytest.raises(ValueError):
+        compile_decoder(Payload, bits_format="int", payload_views=True)
@@ -0,0 +1,117 @@
+import enum
+import os
+
+import pytest
+
+from bitnest import cache
+from bitnest.backend import python
+from bitnest.backend.python import compile_decoder, compile_encoder, compile_sizers
+from bitnest.core import Integer
+from bitnest.field import (
+    Struct,
+    UnsignedInteger,
+    BitsEnum,
+    Vector,
+    FieldReference,
+)
+
+
+class Kind(enum.Enum):
+    A = 1
+    B = 2
+
+
+def make_struct():
+    class Word(Struct):
+        name = "Word"
+        fields = [UnsignedInteger("value", 8)]
+
+    class Pair(Struct):
+        name = "Pair"
+        fields = [UnsignedInteger("left", 4), UnsignedInteger("right", 4)]
+
+    class Message(Struct):
+        name = "Message"
+        fields = [
+            BitsEnum("kind", 8, Kind),
+            UnsignedInteger("count", 8),
+            Vector(Word, length=FieldReference("count")),
+            Vector(Pair, length=Integer(2)),
+        ]
+
+    return Message
+
+
+DATA = bytes.fromhex("010211223344")
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "directory", str(tmp_path))
+    return tmp_path
+
+
+def test_fingerprint_independent_of_build_order():
+    # vectors built in between do not change the expression
+    first = make_struct().expression()
+    second = make_struct().expression()
+    assert first.expression is not second.expression
+    assert first.fingerprint() == second.fingerprint()
+
+
+def test_cache_loads_compiled_functions(directory, monkeypatch):
+    struct = make_struct()
+    record = compile_decoder(struct, bits_format="bytes")(DATA)
+    buffer = bytearray(6)
+    assert compile_encoder(struct)(record, buffer) == 6
+    assert compile_sizers(struct, bits_format="bytes")[0](DATA, 48) == 48
+    assert len(os.listdir(directory)) == 4
+
+    def compile_function(*args, **kwargs):
+        raise AssertionError("compiled functions are loaded from the cache")
+
+    monkeypatch.setattr(python, "compile_function", compile_function)
+    struct = make_struct()
+    decoded = compile_decoder(struct, bits_format="bytes")(DATA)
+    assert decoded == record
+    assert decoded.kind is Kind.A
+    assert type(decoded) is type(record)
+    buffer = bytearray(6)
+    assert compile_encoder(struct)(decoded, buffer) == 6
+    assert buffer == DATA
+    assert compile_sizers(struct, bits_format="bytes")[0](DATA, 48) == 48
+
+
+def test_cache_invalid_entry(directory):
+    compile_decoder(make_struct(), bits_format="bytes")
+    for path in directory.iterdir():
+        path.write_bytes(b"invalid")
+
+    record = compile_decoder(make_struct(), bits_format="bytes")(DATA)
+    assert record.count == 2
+    assert cache.load(path.stem) is not None
+
+
+def test_cache_unpicklable_namespace(directory):
+    class LocalKind(enum.Enum):
+        A = 1
+
+    class Message(Struct):
+        name = "Message"
+        fields = [BitsEnum("kind", 8, LocalKind)]
+
+    assert compile_decoder(Message, bits_format="bytes")(b"\x01").kind is LocalKind.A
+    # the parser has no namespace, the extractors are not cached
+    assert len(os.listdir(directory)) == 1
+
+
+def test_memoized_until_expression_changes():
+    struct = make_struct()
+    decoder = compile_decoder(struct, bits_format="bytes")
+    assert compile_decoder(struct, bits_format="bytes") is decoder
+    assert decoder(DATA).count == 2
+
+    struct.fields = [UnsignedInteger("count", 8)]
+    record = compile_decoder(struct, bits_format="bytes")(DATA)
+    assert record == (1,)
+    assert compile_encoder(struct)(record, bytearray(1)) == 1
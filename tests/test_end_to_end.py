@@ -1,8 +1,60 @@
+import enum
+import random
+
 import pytest
 
 from models.test import StructA
 from models.simple import MILSTD_1553_Message
-from models.chapter10 import MILSTD_1553_Data_Packet_Format_1
+from models.chapter10 import (
+    MILSTD_1553_Data_Packet_Format_1,
+    MILSTD_1553_Intra_Packet_Header,
+    RTToRTTransfer,
+)
+
+from bitnest.core import (
+    Symbol,
+    walk_nodes,
+    DATATYPE,
+    EQ,
+    FIELD_REFERENCE,
+    FLOAT,
+    GE,
+    GT,
+    INTEGER,
+    LE,
+    LOGICAL_AND,
+    LT,
+    VARIABLE,
+)
+from bitnest.field import (
+    Struct,
+    UnsignedInteger,
+    SignedInteger,
+    Boolean,
+    Bits,
+    BitsEnum,
+    Union,
+    Vector,
+    FieldReference,
+)
+from bitnest.backend.python import (
+    compile_parser,
+    compile_decoder,
+    compile_encoder,
+    compile_extractors,
+    compile_views,
+)
+from benchmarks.corpus import generate_corpus
+from bitnest.analysis.field_constraints import (
+    condition_constraints,
+    field_domain,
+    is_feasible,
+)
+from bitnest.record import record_field_names
+from bitnest.transform.realize_datatypes import iter_realize_datatypes
+from bitnest.transform.realize_conditions import realize_conditions
+from bitnest.transform.realize_offsets import realize_offsets
+from bitnest.transform.parser_datatype import parser_datatype
 
 
 @pytest.mark.parametrize(
@@ -18,3 +70,530 @@ def test_realize_paths(struct):
         .transform("arithmetic_simplify")
         .backend("python")
     )
+
+
+@pytest.mark.parametrize(
+    "struct", [StructA, MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_realize_paths_stream(struct):
+    expression = struct.expression()
+    datatypes = iter_realize_datatypes(expression)
+    assert next(iter_realize_datatypes(expression)).symbol == Symbol("datatype")
+
+    stream = parser_datatype(realize_offsets(realize_conditions(datatypes)))
+    expected = (
+        expression.transform("realize_datatypes")
+        .transform("realize_conditions")
+        .transform("realize_offsets")
+        .transform("parser_datatype")
+    )
+    assert stream.expression == expected.expression
+
+
+class BitString:
+    """bit sequence where slices evaluate to unsigned integers"""
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __getitem__(self, index):
+        return int(self.bits[index], 2)
+
+
+@pytest.mark.parametrize(
+    "bits,datatype_mask",
+    [
+        ("00000001" + "11111" + "010" + "0" * 32, 0b01),
+        ("00000001" + "00001" + "000", 0b10),
+        ("00000001" + "11111" + "000", 0b11),
+        ("00000001" + "00001" + "010", 0b00),
+    ],
+)
+def test_compile_parser(bits, datatype_mask):
+    parser = compile_parser(MILSTD_1553_Message)
+    assert parser is compile_parser(MILSTD_1553_Message)
+    assert parser(BitString(bits)) == datatype_mask
+
+
+@pytest.mark.parametrize(
+    "struct", [StructA, MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_parser_models(struct):
+    assert callable(compile_parser(struct))
+    assert callable(compile_decoder(struct, bits_format="bytes"))
+
+
+@pytest.mark.parametrize(
+    "struct", [MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_parser_decision_tree(struct):
+    rng = random.Random(0)
+    sequential = compile_parser(struct)
+    decision_tree = compile_parser(struct, strategy="decision_tree")
+
+    for _ in range(1000):
+        bits = BitString("".join(rng.choice("01") for _ in range(1024)))
+        assert sequential(bits) == decision_tree(bits)
+
+
+def flag_members(count):
+    """Struct with a union of count members each conditioned on a flag"""
+    members = [
+        type(
+            f"Member{i}",
+            (Struct,),
+            {
+                "name": f"Member{i}",
+                "fields": [UnsignedInteger(f"flag_{j}", 1) for j in range(count)],
+                "conditions": [FieldReference(f"flag_{i}") == 1],
+            },
+        )
+        for i in range(count)
+    ]
+    return type("Flags", (Struct,), {"name": "Flags", "fields": [Union(*members)]})
+
+
+@pytest.mark.parametrize(
+    "struct",
+    [MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1, flag_members(14)],
+)
+def test_parser_datatype_decision_tree_size(struct):
+    expression = (
+        struct.expression()
+        .transform("realize_datatypes")
+        .transform("realize_conditions")
+        .transform("realize_offsets")
+    )
+    sizes = {
+        strategy: len(
+            list(
+                walk_nodes(
+                    expression.transform(
+                        "parser_datatype", strategy=strategy
+                    ).expression
+                )
+            )
+        )
+        for strategy in ["sequential", "decision_tree"]
+    }
+    assert sizes["decision_tree"] <= 1.1 * sizes["sequential"]
+
+
+@pytest.mark.parametrize(
+    "struct", [MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_parser_bits_format(struct):
+    rng = random.Random(0)
+    bits_parser = compile_parser(struct)
+    int_parser = compile_parser(struct, bits_format="int")
+    bytes_parser = compile_parser(struct, bits_format="bytes")
+
+    for _ in range(1000):
+        bits = "".join(rng.choice("01") for _ in range(1024))
+        data = int(bits, 2).to_bytes(128, "big")
+        datatype_mask = bits_parser(BitString(bits))
+        assert int_parser(int(bits, 2), len(bits)) == datatype_mask
+        assert bytes_parser(data) == datatype_mask
+        assert bytes_parser(memoryview(data)) == datatype_mask
+
+
+def test_compile_parser_bits_format_invalid():
+    with pytest.raises(ValueError):
+        compile_parser(MILSTD_1553_Message, bits_format="bitarray")
+
+
+class Command(Struct):
+    name = "Command"
+    fields = [
+        UnsignedInteger("remote_terminal_address", 5),
+        UnsignedInteger("recieve_transmit", 1),
+    ]
+
+
+class RecieveCommand(Command):
+    conditions = [FieldReference("recieve_transmit") == 0]
+
+
+class TransmitCommand(Command):
+    conditions = [FieldReference("recieve_transmit") == 1]
+
+
+class BroadcastCommand(Command):
+    conditions = [FieldReference("remote_terminal_address") == 0x1F]
+
+
+class TransmitMessage(Struct):
+    name = "TransmitMessage"
+    fields = [Union(RecieveCommand, TransmitCommand, BroadcastCommand)]
+    conditions = [
+        FieldReference("Command.recieve_transmit") == 1,
+        FieldReference("Command.remote_terminal_address") < 0x10,
+    ]
+
+
+@pytest.mark.parametrize(
+    "struct,num_datatypes,num_pruned_datatypes",
+    [
+        (StructA, 8, 8),
+        (MILSTD_1553_Message, 2, 2),
+        (MILSTD_1553_Data_Packet_Format_1, 10, 7),
+        (TransmitMessage, 3, 1),
+    ],
+)
+def test_realize_datatypes_prune(struct, num_datatypes, num_pruned_datatypes):
+    expression = struct.expression()
+    assert len(expression.transform("realize_datatypes")) - 1 == num_datatypes
+    assert (
+        len(expression.transform("realize_datatypes", prune=True)) - 1
+        == num_pruned_datatypes
+    )
+
+
+def test_condition_constraints_float():
+    field = (FIELD_REFERENCE, "value", 0)
+    domains = {0: field_domain(UnsignedInteger("value", 2))}
+    for condition, feasible in [
+        ((LOGICAL_AND, (LT, field, (FLOAT, 2.5)), (EQ, field, (INTEGER, 2))), True),
+        ((LOGICAL_AND, (GT, (FLOAT, 1.5), field), (EQ, field, (INTEGER, 1))), True),
+        ((LOGICAL_AND, (LT, field, (FLOAT, 2.0)), (EQ, field, (FLOAT, 2.0))), False),
+        ((LOGICAL_AND, (LT, field, (INTEGER, 2)), (EQ, field, (INTEGER, 2))), False),
+        ((LOGICAL_AND, (GT, field, (FLOAT, 0.5)), (LT, field, (FLOAT, 1.5))), True),
+        ((LOGICAL_AND, (GT, field, (FLOAT, 0.5)), (LT, field, (FLOAT, 0.9))), False),
+        ((LOGICAL_AND, (GE, field, (FLOAT, 1.2)), (LE, field, (FLOAT, 1.8))), False),
+        ((LOGICAL_AND, (GE, field, (FLOAT, 0.8)), (LE, field, (FLOAT, 1.2))), True),
+    ]:
+        constraints = condition_constraints(condition)
+        assert is_feasible(constraints, domains) is feasible
+
+
+@pytest.mark.parametrize("prune", [False, True])
+def test_realize_datatypes_wide(prune):
+    Wide = type(
+        "Wide",
+        (Struct,),
+        {
+            "name": "Wide",
+            "fields": [UnsignedInteger(f"field_{i}", 8) for i in range(3000)],
+        },
+    )
+    datatypes = Wide.expression().transform("realize_datatypes", prune=prune)
+    assert len(datatypes) - 1 == 1
+    assert len(datatypes.expression[1][1][2]) - 1 == 3000
+
+
+class Mode(enum.Enum):
+    A = 0x1
+    B = 0x2
+
+
+class Word(Struct):
+    name = "Word"
+    fields = [UnsignedInteger("value", 8)]
+
+
+class Block(Struct):
+    name = "Block"
+    fields = [
+        UnsignedInteger("count", 4),
+        SignedInteger("offset", 4),
+        Vector(Word, length=FieldReference("count")),
+    ]
+
+
+class Frame(Struct):
+    name = "Frame"
+    fields = [
+        UnsignedInteger("num_blocks", 8),
+        Vector(Block, length=FieldReference("num_blocks")),
+        Boolean("last"),
+        BitsEnum("mode", 2, Mode),
+        Bits("reserved", 5),
+    ]
+
+
+def decoder_arguments(bits, bits_format):
+    if bits_format == "bits":
+        return (BitString(bits),)
+    elif bits_format == "int":
+        return (int(bits, 2), len(bits))
+    return (int(bits, 2).to_bytes(len(bits) // 8, "big"),)
+
+
+@pytest.mark.parametrize("bits_format", ["bits", "int", "bytes"])
+def test_compile_decoder(bits_format):
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format=bits_format)
+    bits = "00000001" + "11111" + "010" + "0000000100000010" + "1111111111111111"
+    record = decoder(*decoder_arguments(bits, bits_format))
+    assert record.bus_id == 1
+    message = record.Remote_Terminal_to_Controller
+    assert message.CommandWord == (31, 2)
+    assert message.DataWord == [(0x0102,), (0xFFFF,)]
+
+    bits = "00000010" + "00001" + "000"
+    record = decoder(*decoder_arguments(bits, bits_format))
+    assert record == (2, ((1, 0),))
+    assert type(record.Controller_to_Remote_Terminal).__name__ == (
+        "Controller_to_Remote_Terminal"
+    )
+
+
+@pytest.mark.parametrize("bits_format", ["bits", "int", "bytes"])
+def test_compile_decoder_variable_size_vector(bits_format):
+    decoder = compile_decoder(Frame, bits_format=bits_format)
+    bits = (
+        "00000010"
+        + ("0001" + "1111" + "00010010")
+        + ("0010" + "0011" + "00110100" + "01010110")
+        + ("1" + "10" + "00000")
+    )
+    record = decoder(*decoder_arguments(bits, bits_format))
+    assert record == (
+        2,
+        [(1, -1, [(0x12,)]), (2, 3, [(0x34,), (0x56,)])],
+        True,
+        Mode.B,
+        0,
+    )
+    assert record.Block[1].Word[1].value == 0x56
+    assert record.last is True
+
+
+@pytest.mark.parametrize("payload_views", [False, True])
+def test_compile_extractors_truncated(payload_views):
+    (extractor,) = compile_extractors(
+        Frame, bits_format="bytes", payload_views=payload_views
+    )
+    data = bytes.fromhex("021f12233456c0")
+    assert extractor(data) == extractor(data + b"\xff")
+    # the end follows the elements of the vector
+    for stop in range(len(data)):
+        with pytest.raises(ValueError):
+            extractor(data[:stop])
+
+
+def test_compile_decoder_lazy():
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format="bytes", lazy=True)
+    bits = "00000001" + "11111" + "010" + "0000000100000010" + "1111111111111111"
+    view = decoder(*decoder_arguments(bits, "bytes"))
+    assert view._datatype == 0
+    message = view.Remote_Terminal_to_Controller
+    assert message.CommandWord.remote_terminal_address == 31
+    assert "number_of_words" not in vars(message.CommandWord)
+    assert "bus_id" not in vars(view)
+    assert len(message.DataWord) == 2
+    assert message.DataWord[-1].data == 0xFFFF
+    assert [_.data for _ in message.DataWord] == [0x0102, 0xFFFF]
+    assert view._asrecord() == compile_decoder(MILSTD_1553_Message, "bytes")(
+        *decoder_arguments(bits, "bytes")
+    )
+
+    with pytest.raises(IndexError):
+        message.DataWord[2]
+    with pytest.raises(ValueError):
+        compile_decoder(MILSTD_1553_Message, bits_format="bits", lazy=True)
+
+
+def test_compile_decoder_lazy_variable_size_vector():
+    decoder = compile_decoder(Frame, bits_format="bytes", lazy=True)
+    bits = (
+        "00000010"
+        + ("0001" + "1111" + "00010010")
+        + ("0010" + "0011" + "00110100" + "01010110")
+        + ("1" + "10" + "00000")
+    )
+    view = decoder(*decoder_arguments(bits, "bytes"))
+    # fields after the vector are read without decoding its elements
+    assert view.mode == Mode.B
+    assert vars(view).keys() == {"_scope", "mode"}
+    assert view.Block[1].Word[1].value == 0x56
+    assert view.Block[0].offset == -1
+    assert view._asrecord() == (
+        2,
+        [(1, -1, [(0x12,)]), (2, 3, [(0x34,), (0x56,)])],
+        True,
+        Mode.B,
+        0,
+    )
+
+
+@pytest.mark.parametrize(
+    "struct", [StructA, MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_decoder_lazy_models(struct):
+    corpus, _ = generate_corpus(struct, 50, seed=3)
+    decoder = compile_decoder(struct, bits_format="bytes")
+    lazy_decoder = compile_decoder(struct, bits_format="bytes", lazy=True)
+    for data in corpus:
+        assert lazy_decoder(data)._asrecord() == decoder(data)
+
+
+def offset_plan(struct):
+    datatype = (
+        struct.expression()
+        .transform("realize_datatypes")
+        .transform("realize_conditions")
+        .transform("realize_offsets")
+        .find_symbol(DATATYPE)[0]
+    )
+    return datatype.analysis("offset_plan")
+
+
+def test_offset_plan():
+    plan = offset_plan(RTToRTTransfer)
+    ((name, vector),) = plan.vectors.items()
+    assert vector.scope == ()
+    assert vector.start.expression == (INTEGER, 48)
+    assert vector.stride == 16
+    assert vector.end is None
+    data, *status = sorted(plan.fields.items())[-11:]
+    assert data[1].scope == (name,)
+    assert data[1].offset.expression == (VARIABLE, name)
+    # the trailing status word is located by the number of words alone
+    for _, field in status:
+        assert field.scope == ()
+        assert not field.offset.find_symbol(VARIABLE)
+
+    plan = offset_plan(Frame)
+    (block_name, block), (word_name, word) = plan.vectors.items()
+    assert (block.stride, word.stride) == (None, 8)
+    assert word.scope == (block_name,)
+    # fields following the blocks are located by the end of the blocks
+    last = sorted(plan.fields.items())[-3][1]
+    assert last.offset.expression == (VARIABLE, block_name)
+
+
+def test_compile_views_random_access():
+    rng = random.Random(0)
+    data = bytes(rng.getrandbits(8) for _ in range(80))
+    record = compile_extractors(RTToRTTransfer, bits_format="bytes")[0](data)
+    view = compile_views(RTToRTTransfer)[0](data)
+    words = len(record.Data_Word)
+    assert view.Data_Word[words - 1].data == record.Data_Word[-1].data
+    assert view.Data_Word.offset(words - 1) == 48 + 16 * (words - 1)
+    assert view.Status_Word_1._asrecord() == record.Status_Word_1
+    assert view.Data_Word.end == 48 + 16 * words
+    assert view._asrecord() == record
+
+    view = compile_views(Frame)[0](
+        bytes.fromhex("02" + "1f12" + "233456" + "c0"),
+    )
+    assert view.Block.offsets() == [8, 24, 48]
+    assert view.Block[1].Word.offset(1) == 40
+
+
+def test_compile_decoder_no_match():
+    decoder = compile_decoder(MILSTD_1553_Message)
+    with pytest.raises(ValueError):
+        decoder(BitString("00000001" + "00001" + "010"))
+
+
+@pytest.mark.parametrize(
+    "struct", [MILSTD_1553_Intra_Packet_Header, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_decoder_int_matches_bytes(struct):
+    # conditions of other datatypes read fields ending past the input
+    decoder = compile_decoder(struct, bits_format="bytes")
+    int_decoder = compile_decoder(struct, bits_format="int")
+    corpus, _ = generate_corpus(struct, 200, seed=1)
+    for data in corpus:
+        assert int_decoder(int.from_bytes(data, "big"), len(data) * 8) == decoder(data)
+
+
+@pytest.mark.parametrize("bits_format", ["bits", "int", "bytes"])
+def test_compile_decoder_truncated(bits_format):
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format=bits_format)
+    bits = "00000001" + "11111" + "010" + "0000000100000010"
+    with pytest.raises(ValueError):
+        decoder(*decoder_arguments(bits, bits_format))
+
+
+def test_compile_encoder():
+    decoder = compile_decoder(Frame, bits_format="bytes")
+    encoder = compile_encoder(Frame)
+    data = bytes.fromhex("021f12233456c0")
+    record = decoder(data)
+
+    buffer = bytearray(16)
+    assert encoder(record, buffer, 2) == 9
+    assert buffer[2:9] == data
+    assert decoder(bytes(buffer[2:9])) == record
+
+    # vector lengths are taken from the vectors
+    Block = type(record.Block[0])
+    record = record._replace(
+        num_blocks=0, Block=[Block(0, -8, [(0x12,), (0x34,), (0xFF,)])]
+    )
+    assert encoder(record, buffer) == 6
+    assert decoder(bytes(buffer[:6])) == (
+        1,
+        [(3, -8, [(0x12,), (0x34,), (0xFF,)])],
+        True,
+        Mode.B,
+        0,
+    )
+
+
+def test_compile_encoder_union():
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format="bytes")
+    encoder = compile_encoder(MILSTD_1553_Message)
+    buffer = bytearray(6)
+    for data in [bytes.fromhex("01fa01020304"), bytes.fromhex("0208")]:
+        assert encoder(decoder(data), buffer) == len(data)
+        assert buffer[: len(data)] == data
+
+    with pytest.raises(ValueError):
+        encoder(decoder(bytes.fromhex("01fa01020304")), bytearray(5))
+    with pytest.raises(ValueError):
+        encoder((1, ((31, 0),)), buffer)
+
+
+@pytest.mark.parametrize(
+    "struct", [StructA, MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+def test_compile_encoder_corpus(struct):
+    decoder = compile_decoder(struct, bits_format="bytes")
+    encoder = compile_encoder(struct)
+    corpus, _ = generate_corpus(struct, 60, seed=1)
+    for data in corpus:
+        buffer = bytearray(len(data))
+        assert encoder(decoder(data), buffer) == len(data)
+        assert buffer == data
+
+
+class ShortValue(Struct):
+    name = "Value"
+    fields = [UnsignedInteger("kind", 4), UnsignedInteger("value", 4)]
+    conditions = [FieldReference("kind") == 0]
+
+
+class LongValue(Struct):
+    name = "Value"
+    fields = [UnsignedInteger("kind", 4), UnsignedInteger("value", 12)]
+    conditions = [FieldReference("kind") == 1]
+
+
+class Entry(Struct):
+    name = "Entry"
+    fields = [Union(ShortValue, LongValue)]
+
+
+class Values(Struct):
+    name = "Values"
+    fields = [UnsignedInteger("count", 8), Vector(Entry, FieldReference("count"))]
+
+
+def test_compile_encoder_ambiguous():
+    with pytest.raises(ValueError):
+        compile_encoder(Values)
+
+
+def test_record_field_names():
+    assert record_field_names(["reserved", "bus id", "reserved", "class"]) == (
+        "reserved",
+        "bus_id",
+        "reserved_1",
+        "field_class",
+    )
@@ -0,0 +1,299 @@
+import asyncio
+import pickle
+
+import pytest
+
+from bitnest.backend.python import compile_decoder, compile_sizers
+from bitnest.io import chapter10
+from bitnest.io.aio import decode_stream
+from bitnest.io.chapter10 import (
+    Chapter10Reader,
+    PACKET_HEADER,
+    PACKET_SYNC_PATTERN,
+    SECONDARY_HEADER_FLAG,
+)
+from bitnest.io.parallel import decode_file, scan_chunks
+from bitnest.io.push import PushParser
+from benchmarks.corpus import generate_corpus
+from models.chapter10 import MILSTD_1553_Data_Packet_Format_1
+from models.simple import MILSTD_1553_Message
+
+
+def chapter10_packet(data, data_type=0x19, channel_id=1, sequence_number=0, flags=0):
+    secondary_header = bytes(12) if flags & SECONDARY_HEADER_FLAG else b""
+    filler = bytes(-len(data) % 4)
+    header = PACKET_HEADER.pack(
+        PACKET_SYNC_PATTERN,
+        channel_id,
+        PACKET_HEADER.size + len(secondary_header) + len(data) + len(filler),
+        len(data),
+        0,
+        sequence_number,
+        flags,
+        data_type,
+        (1234).to_bytes(6, "little"),
+        0,
+    )
+    return header + secondary_header + data + filler
+
+
+def milstd_1553_packet(messages):
+    # time tag bits, reserved, message count followed by messages
+    return ((len(messages)).to_bytes(4, "big")) + b"".join(messages)
+
+
+def format_1_packets(count):
+    """Data of packets holding between zero and three messages"""
+    packets, _ = generate_corpus(
+        MILSTD_1553_Data_Packet_Format_1, count, seed=1, max_vector_length=3
+    )
+    return packets
+
+
+@pytest.fixture
+def chapter10_file(tmp_path):
+    path = tmp_path / "recording.ch10"
+    path.write_bytes(
+        chapter10_packet(milstd_1553_packet([]), sequence_number=0)
+        + chapter10_packet(b"\x01\x02\x03", data_type=0x01, sequence_number=1)
+        + chapter10_packet(
+            milstd_1553_packet([]),
+            sequence_number=2,
+            flags=SECONDARY_HEADER_FLAG,
+        )
+    )
+    return path
+
+
+def test_chapter10_reader(chapter10_file):
+    with Chapter10Reader(chapter10_file) as reader:
+        packets = list(reader)
+        assert [_.sequence_number for _ in packets] == [0, 1, 2]
+        assert [_.data_type for _ in packets] == [0x19, 0x01, 0x19]
+        assert packets[1].data.tobytes() == b"\x01\x02\x03"
+        assert packets[2].data.tobytes() == bytes(4)
+        assert packets[0].relative_time == 1234
+        assert all(isinstance(_.data, memoryview) for _ in packets)
+
+        packets = list(reader.packets(data_types={0x19}))
+        assert [_.offset for _ in packets] == [0, 56]
+
+
+def test_chapter10_reader_decode(chapter10_file):
+    with Chapter10Reader(chapter10_file) as reader:
+        decoded = list(reader.decode(MILSTD_1553_Data_Packet_Format_1))
+        assert [packet.sequence_number for packet, record in decoded] == [0, 2]
+        assert all(record.message_count == 0 for packet, record in decoded)
+
+
+@pytest.mark.parametrize("payload_views", [False, True])
+def test_chapter10_reader_decode_messages(tmp_path, payload_views):
+    struct = MILSTD_1553_Data_Packet_Format_1
+    packets = format_1_packets(20)
+    decoder = compile_decoder(struct, bits_format="bytes", payload_views=payload_views)
+    expected = [decoder(_) for _ in packets]
+    assert sum(_.message_count for _ in expected) > len(packets)
+
+    # the message count exceeds the messages within the packet
+    truncated = next(_ for _ in packets if decoder(_).message_count)[:-2]
+    path = tmp_path / "messages.ch10"
+    path.write_bytes(
+        b"".join(
+            chapter10_packet(data, sequence_number=i)
+            for i, data in enumerate(packets + [truncated])
+        )
+    )
+
+    with Chapter10Reader(path) as reader:
+        decoded = list(reader.decode(struct, payload_views=payload_views))
+        assert [packet.sequence_number for packet, record in decoded] == list(
+            range(len(packets))
+        )
+        assert [record for packet, record in decoded] == expected
+        assert reader.skipped == 1
+
+
+def test_chapter10_reader_decode_errors(chapter10_file, monkeypatch):
+    def decoder(data):
+        raise ValueError("not a decoding error")
+
+    monkeypatch.setattr(chapter10, "compile_decoder", lambda *args, **kwargs: decoder)
+    with Chapter10Reader(chapter10_file) as reader:
+        with pytest.raises(ValueError, match="not a decoding error"):
+            list(reader.decode(MILSTD_1553_Data_Packet_Format_1))
+
+
+def test_chapter10_reader_invalid(tmp_path):
+    path = tmp_path / "invalid.ch10"
+    path.write_bytes(bytes(PACKET_HEADER.size))
+    with Chapter10Reader(path) as reader:
+        with pytest.raises(ValueError):
+            list(reader)
+
+    path.write_bytes(b"")
+    with Chapter10Reader(path) as reader:
+        assert list(reader) == []
+
+
+def packet_sequence_number(packet, record):
+    return packet.sequence_number, record.message_count
+
+
+@pytest.fixture
+def large_chapter10_file(tmp_path):
+    path = tmp_path / "large.ch10"
+    path.write_bytes(
+        b"".join(
+            chapter10_packet(
+                data,
+                data_type=0x19 if i % 3 else 0x01,
+                sequence_number=i % 256,
+            )
+            for i, data in enumerate(format_1_packets(300))
+        )
+    )
+    return path
+
+
+def test_scan_chunks(large_chapter10_file):
+    chunks = scan_chunks(large_chapter10_file, chunk_size=1000)
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == large_chapter10_file.stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(stop - start >= 1000 for start, stop in chunks[:-1])
+    with Chapter10Reader(large_chapter10_file) as reader:
+        offsets = {packet.offset for packet in reader.packets()}
+    assert all(start in offsets for start, stop in chunks)
+
+
+def test_decode_file(large_chapter10_file):
+    struct = MILSTD_1553_Data_Packet_Format_1
+    with Chapter10Reader(large_chapter10_file) as reader:
+        expected = [(packet.offset, record) for packet, record in reader.decode(struct)]
+
+    results = list(
+        decode_file(large_chapter10_file, struct, max_workers=2, chunk_size=1000)
+    )
+    assert results == expected
+    assert len(results) == 200
+    assert sum(record.message_count for offset, record in results) > 200
+
+    results = list(
+        decode_file(
+            large_chapter10_file,
+            struct,
+            function=packet_sequence_number,
+            max_workers=2,
+            chunk_size=1000,
+        )
+    )
+    assert results == [
+        (i % 256, record.message_count)
+        for i, (offset, record) in zip([_ for _ in range(300) if _ % 3], expected)
+    ]
+
+
+def test_decode_file_skipped(tmp_path):
+    packets = format_1_packets(10)
+    path = tmp_path / "skipped.ch10"
+    path.write_bytes(
+        b"".join(chapter10_packet(_) for _ in packets + [packets[0][:2]] * 3)
+    )
+    counts = []
+    results = list(
+        decode_file(
+            path,
+            MILSTD_1553_Data_Packet_Format_1,
+            max_workers=2,
+            chunk_size=100,
+            skipped=counts.append,
+        )
+    )
+    assert len(results) == len(packets)
+    assert sum(counts) == 3
+
+
+def test_record_pickle(chapter10_file):
+    with Chapter10Reader(chapter10_file) as reader:
+        packet, record = next(reader.decode(MILSTD_1553_Data_Packet_Format_1))
+    assert pickle.loads(pickle.dumps(record)) == record
+    assert type(pickle.loads(pickle.dumps(record))) is type(record)
+
+
+def milstd_1553_messages():
+    # bus id, remote terminal address 31 with number of words, data words
+    return [
+        b"\x01" + bytes([0xF8 | 2]) + b"\x01\x02\xff\xff",
+        b"\x02" + bytes([0x08]),
+        b"\x03" + bytes([0xF8 | 7]) + bytes(range(14)),
+        b"\x04" + bytes([0xF8]),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_push_parser(chunk_size):
+    messages = milstd_1553_messages()
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format="bytes")
+    expected = [decoder(_) for _ in messages]
+
+    stream = b"".join(messages)
+    parser = PushParser(MILSTD_1553_Message)
+    records = []
+    for i in range(0, len(stream), chunk_size):
+        records.extend(parser.feed(stream[i : i + chunk_size]))
+        assert parser.pending < len(messages[2])
+    records.extend(parser.close())
+    assert records == expected
+    assert parser.pending == 0
+
+
+def test_push_parser_payload_views():
+    message = milstd_1553_messages()[0]
+    parser = PushParser(MILSTD_1553_Message, payload_views=True)
+    (record,) = parser.feed(message + message[:3])
+    assert isinstance(record.Remote_Terminal_to_Controller.DataWord[0].data, memoryview)
+    (record,) = parser.feed(message[3:])
+    assert (
+        record.Remote_Terminal_to_Controller.DataWord[1].data.tobytes() == b"\xff\xff"
+    )
+
+
+def test_push_parser_truncated():
+    parser = PushParser(MILSTD_1553_Message)
+    assert parser.feed(milstd_1553_messages()[2][:-1]) == []
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_compile_sizers():
+    sizers = compile_sizers(MILSTD_1553_Message, bits_format="bytes")
+    message = milstd_1553_messages()[2]
+    assert sizers[0](message[:1], 8) == -16
+    assert sizers[0](message, len(message) * 8) == 16 * 8
+    assert sizers[0](b"\x02\x08", 16) == 0
+    assert sizers[1](b"\x02\x08", 16) == 16
+
+
+async def collect_records(chunks, **kwargs):
+    reader = asyncio.StreamReader()
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    return [_ async for _ in decode_stream(reader, MILSTD_1553_Message, **kwargs)]
+
+
+@pytest.mark.parametrize("executor_threshold", [0, 2 ** 14])
+def test_decode_stream(executor_threshold):
+    messages = milstd_1553_messages()
+    decoder = compile_decoder(MILSTD_1553_Message, bits_format="bytes")
+    records = asyncio.run(
+        collect_records(
+            messages * 3, read_size=5, executor_threshold=executor_threshold
+        )
+    )
+    assert records == [decoder(_) for _ in messages] * 3
+
+
+def test_decode_stream_truncated():
+    with pytest.raises(ValueError):
+        asyncio.run(collect_records([milstd_1553_messages()[0][:-1]]))
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from models.chapter10 import MILSTD_1553_Intra_Packet_Data_Header
+from models.simple import MILSTD_1553_Message
+
+from bitnest.field import (
+    Struct,
+    UnsignedInteger,
+    SignedInteger,
+    Boolean,
+    Bits,
+)
+from bitnest.backend.python import compile_decoder
+
+np = pytest.importorskip("numpy")
+from bitnest.backend.numpy import compile_batch_decoder  # noqa: E402
+
+
+class Header(Struct):
+    name = "Header"
+    fields = [
+        Bits("reserved", 3),
+        UnsignedInteger("time", 64),
+        SignedInteger("temperature", 12),
+        Boolean("valid"),
+        SignedInteger("offset", 8),
+        Boolean("last"),
+        UnsignedInteger("sequence", 7),
+    ]
+
+
+def flatten(record):
+    if isinstance(record, tuple):
+        return [value for _ in record for value in flatten(_)]
+    return [record.value if hasattr(record, "value") else record]
+
+
+@pytest.mark.parametrize(
+    "struct,record_bytes",
+    [(Header, 12), (MILSTD_1553_Intra_Packet_Data_Header, 6)],
+)
+def test_batch_decoder(struct, record_bytes):
+    rng = random.Random(0)
+    batch_decoder = compile_batch_decoder(struct)
+    decoder = compile_decoder(struct, bits_format="bytes")
+    assert batch_decoder.record_bytes == record_bytes
+
+    buffer = bytes(rng.randrange(256) for _ in range(record_bytes * 100))
+    records = batch_decoder(buffer)
+    assert len(records) == 100
+    for i, record in enumerate(records):
+        data = buffer[i * record_bytes : (i + 1) * record_bytes]
+        assert list(record.tolist()) == flatten(decoder(data))
+
+
+def test_batch_decoder_invalid():
+    with pytest.raises(ValueError):
+        compile_batch_decoder(MILSTD_1553_Message)
+
+    with pytest.raises(ValueError):
+        compile_batch_decoder(MILSTD_1553_Message, datatype=0)
+
+    with pytest.raises(ValueError):
+        compile_batch_decoder(Header)(bytes(13))
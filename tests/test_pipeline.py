@@ -0,0 +1,110 @@
+import pytest
+
+from models.test import StructA
+from models.simple import MILSTD_1553_Message
+from models.chapter10 import MILSTD_1553_Data_Packet_Format_1
+
+from bitnest.core import Variable, ADD, VARIABLE
+from bitnest.pipeline import BARRIER, Pipeline, Rule, fused_replace
+from bitnest.profile import Profiler
+from bitnest.transform.realize_datatypes import iter_realize_datatypes
+
+PASSES = [
+    ["realize_conditions", "realize_offsets"],
+    ["realize_conditions", "realize_offsets", "arithmetic_simplify"],
+    ["realize_conditions", BARRIER, "realize_offsets", "arithmetic_simplify"],
+]
+
+
+@pytest.mark.parametrize(
+    "struct", [StructA, MILSTD_1553_Message, MILSTD_1553_Data_Packet_Format_1]
+)
+@pytest.mark.parametrize("passes", PASSES)
+def test_pipeline_matches_transforms(struct, passes):
+    datatypes = struct.expression().transform("realize_datatypes")
+    expected = datatypes
+    for name in passes:
+        if name is not BARRIER:
+            expected = expected.transform(name)
+    assert Pipeline(passes)(datatypes).expression == expected.expression
+
+    stream = Pipeline(passes)(iter_realize_datatypes(struct.expression()))
+    assert [_.expression for _ in stream] == list(expected.expression[1:])
+
+
+def test_pipeline_stages():
+    pipeline = Pipeline(
+        [
+            "realize_datatypes",
+            "realize_conditions",
+            "realize_offsets",
+            "parser_datatype",
+            ("arithmetic_simplify", {}),
+        ]
+    )
+    assert pipeline.names == [
+        "realize_datatypes",
+        "realize_conditions+realize_offsets",
+        "parser_datatype",
+        "arithmetic_simplify",
+    ]
+    assert Pipeline(PASSES[2]).names == [
+        "realize_conditions",
+        "realize_offsets+arithmetic_simplify",
+    ]
+
+    with Profiler() as profiler:
+        pipeline(MILSTD_1553_Message.expression())
+    assert [_.name for _ in profiler.profiles if _.depth == 0] == pipeline.names
+
+
+def seen_rule(seen):
+    def handle_variable(symbol, args):
+        seen.append(args[0])
+        return (symbol, *args)
+
+    return Rule(replacement_mapping={VARIABLE: handle_variable})
+
+
+def add_rule(symbol, args):
+    symbol, args = yield (symbol, *args, Variable("before").expression)
+    yield (symbol, *args, Variable("after").expression)
+
+
+def test_fused_replace_added_children():
+    expression = (Variable("a") + Variable("b")).expression
+    rules = [Rule(replacement_functions={ADD: add_rule})]
+
+    seen = []
+    result = fused_replace(expression, [seen_rule(seen), *rules])
+    assert result == (
+        ADD,
+        (VARIABLE, "a"),
+        (VARIABLE, "b"),
+        (VARIABLE, "before"),
+        (VARIABLE, "after"),
+    )
+    assert seen == ["a", "b"]
+
+    seen = []
+    fused_replace(expression, [*rules, seen_rule(seen)])
+    assert seen == ["a", "b", "before", "after"]
+
+
+def test_fused_replace_shared_nodes():
+    shared = (Variable("a") + 1).expression
+    expression = (ADD, shared, shared)
+    seen = []
+    result = fused_replace(expression, [seen_rule(seen)])
+    assert result is expression
+    assert seen == ["a"]
+
+
+def test_fused_replace_replaced_symbol():
+    def replace_add(symbol, args):
+        symbol, args = yield Variable("sum").expression
+        yield (symbol, *args)
+
+    expression = (Variable("a") + Variable("b")).expression
+    result = fused_replace(expression, [Rule({ADD: replace_add})])
+    assert result == (VARIABLE, "sum")
@@ -0,0 +1,93 @@
+from bitnest import core
+from bitnest.core import Integer
+from bitnest.profile import Profiler, add_hook, remove_hook
+
+from models.simple import MILSTD_1553_Message
+
+
+def compile_chain():
+    return (
+        MILSTD_1553_Message.expression()
+        .transform("realize_datatypes")
+        .transform("realize_conditions")
+        .transform("realize_offsets")
+        .transform("parser_datatype")
+        .transform("arithmetic_simplify")
+        .backend("python")
+    )
+
+
+def test_profiler():
+    with Profiler() as profiler:
+        source = compile_chain()
+    assert core.pass_runner is None
+    assert source == compile_chain()
+
+    names = [(_.kind, _.name, _.depth) for _ in profiler.profiles]
+    assert names == [
+        ("transform", "realize_datatypes", 0),
+        ("transform", "realize_conditions", 0),
+        ("transform", "realize_offsets", 0),
+        ("analysis", "inspect_datatypes", 1),
+        ("transform", "parser_datatype", 0),
+        ("transform", "arithmetic_simplify", 0),
+        ("backend", "python", 0),
+    ]
+
+    realize_datatypes = profiler.profiles[0]
+    assert (realize_datatypes.input_datatypes, realize_datatypes.output_datatypes) == (
+        0,
+        2,
+    )
+    assert realize_datatypes.nodes_visited > 0
+    assert realize_datatypes.nodes_allocated > 0
+    assert realize_datatypes.peak_memory is None
+    assert profiler.profiles[-1].nodes_allocated is None
+
+    parser_datatype, inspect_datatypes = profiler.profiles[4], profiler.profiles[3]
+    assert parser_datatype.seconds >= inspect_datatypes.seconds
+    assert parser_datatype.nodes_visited >= inspect_datatypes.nodes_visited
+
+    report = profiler.report()
+    assert report[0]["name"] == "realize_datatypes"
+    lines = profiler.format().splitlines()
+    assert lines[4].startswith("transform.parser_datatype")
+    assert lines[5].startswith("  analysis.inspect_datatypes")
+
+
+def test_profiler_memory():
+    with Profiler(memory=True) as profiler:
+        compile_chain()
+    assert all(_.peak_memory > 0 for _ in profiler.profiles)
+    assert profiler.profiles[4].peak_memory >= profiler.profiles[3].peak_memory
+
+
+def test_profiler_memory_nested():
+    size = 2 ** 22
+
+    def nested(expression):
+        return expression
+
+    def allocating(expression):
+        data = bytearray(size)
+        del data
+        return core.pass_runner("analysis", "nested", nested, expression, (), {})
+
+    with Profiler(memory=True) as profiler:
+        core.pass_runner("analysis", "allocating", allocating, Integer(1), (), {})
+    nested, allocating = profiler.profiles
+    assert nested.depth == 1
+    # the peak before the nested pass started is kept
+    assert allocating.peak_memory >= size > nested.peak_memory
+
+
+def test_hooks():
+    profiles = []
+    add_hook(profiles.append)
+    try:
+        MILSTD_1553_Message.expression().transform("realize_datatypes")
+    finally:
+        remove_hook(profiles.append)
+    assert core.pass_runner is None
+    MILSTD_1553_Message.expression().transform("realize_datatypes")
+    assert [_.name for _ in profiles] == ["realize_datatypes"]